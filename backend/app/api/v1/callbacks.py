@@ -5,6 +5,7 @@ These endpoints are called by n8n workflows to report:
 - Progress updates
 - Completion with QC results
 - Failures
+- Any mix of the above in one request (/callbacks/n8n/batch)
 
 Supports both:
 1. Structured format (recommended): { comments: [...], summary: {...} }
@@ -12,15 +13,28 @@ Supports both:
 """
 
 import re
+from uuid import UUID
 from fastapi import APIRouter, HTTPException, status, Header
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List, Union
-from app.core.supabase import supabase
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, Dict, Any, List, Literal, Union
+from app.core.supabase import supabase, with_retry
 from app.services.n8n import n8n_service
+from app.services.job_events import on_job_completed, on_job_failed, on_job_updated
+from app.services.progress import job_progress
+from app.core.logger import get_logger
+from app.core import tracing
+
+logger = get_logger(__name__)
 
 
 router = APIRouter()
 
+# Columns the final-state side effects (app.services.job_events) need
+JOB_EVENT_COLUMNS = (
+    "id, status, team_id, qc_mode, duration_sec, video_url, created_at, started_at, "
+    "content_fingerprint, trace_id, parent_job_id"
+)
+
 
 # ============================================
 # Pydantic Models
@@ -30,12 +44,14 @@ class ProgressUpdate(BaseModel):
     job_id: str
     progress: int  # 0-100
     message: Optional[str] = None
+    trace_id: Optional[str] = None  # Echoed back from the dispatch payload
 
 
 class CompletionPayload(BaseModel):
     job_id: str
     qc_result: Union[Dict[str, Any], List[Dict[str, Any]]]  # Supports both formats
     artifacts: Optional[Dict[str, str]] = None  # URLs to PDF, XML, EDL files
+    trace_id: Optional[str] = None  # Echoed back from the dispatch payload
 
 
 class LegacyCompletionPayload(BaseModel):
@@ -43,12 +59,37 @@ class LegacyCompletionPayload(BaseModel):
     job_id: str
     results: List[Dict[str, str]]  # [{ timestamp, text }, ...]
     artifacts: Optional[Dict[str, str]] = None
+    trace_id: Optional[str] = None  # Echoed back from the dispatch payload
 
 
 class FailurePayload(BaseModel):
     job_id: str
     error: str
     error_code: Optional[str] = None
+    trace_id: Optional[str] = None  # Echoed back from the dispatch payload
+
+
+class BatchProgressEvent(ProgressUpdate):
+    type: Literal["progress"]
+
+
+class BatchCompleteEvent(CompletionPayload):
+    type: Literal["complete"]
+
+
+class BatchFailedEvent(FailurePayload):
+    type: Literal["failed"]
+
+
+# Events per /callbacks/n8n/batch request
+MAX_BATCH_EVENTS = 500
+
+
+class CallbackBatch(BaseModel):
+    events: List[Annotated[
+        Union[BatchProgressEvent, BatchCompleteEvent, BatchFailedEvent],
+        Field(discriminator="type")
+    ]] = Field(min_length=1, max_length=MAX_BATCH_EVENTS)
 
 
 # ============================================
@@ -280,31 +321,52 @@ def update_job_progress(
     x_api_key: Optional[str] = Header(None)
 ):
     """
-    Called by n8n to report job progress.
-    Updates the job's progress field (if you have one) or just confirms receipt.
+    Called by n8n to report job progress (0-100, optional message).
+
+    Reports are coalesced in memory and written in bulk (see
+    app.services.progress). Only a job's first report reads the row, to
+    check it exists and is active and to move it to processing if it was
+    still pending.
     """
     validate_n8n_auth(x_api_key)
     
-    # Verify job exists
-    job_res = (
-        supabase
-        .table("qc_jobs")
-        .select("id, status")
-        .eq("id", payload.job_id)
-        .execute()
-    )
-    
-    if not job_res.data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Job not found"
+    if job_progress.tracking(payload.job_id):
+        tracing.join_trace(payload.trace_id)
+    else:
+        # Verify job exists
+        job_res = (
+            supabase
+            .table("qc_jobs")
+            .select("id, status, team_id, trace_id")
+            .eq("id", payload.job_id)
+            .execute()
         )
+        
+        if not job_res.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        
+        # Join the job's trace (traceparent header, payload trace_id or the row)
+        tracing.join_trace(payload.trace_id or job_res.data[0].get("trace_id"))
+        
+        job = job_res.data[0]
+        
+        # A late report must not move a finished job back to processing
+        if job["status"] in ["completed", "failed"]:
+            return {
+                "status": "already_completed",
+                "job_id": payload.job_id,
+                "message": f"Job already has status: {job['status']}"
+            }
+        
+        if job["status"] == "pending":
+            supabase.table("qc_jobs").update({"status": "processing"}).eq("id", payload.job_id).eq("status", "pending").execute()
+            on_job_updated(job)
     
-    # Update job progress (optional: add a progress column to qc_jobs)
-    # For now, we just acknowledge and ensure status is "processing"
-    update_data = {"status": "processing"}
-    
-    supabase.table("qc_jobs").update(update_data).eq("id", payload.job_id).execute()
+    if job_progress.report(payload.job_id, payload.progress, payload.message):
+        job_progress.flush()
     
     return {
         "status": "ok",
@@ -313,6 +375,35 @@ def update_job_progress(
     }
 
 
+def _finish_job(job_id: str, update_data: dict):
+    """
+    Move one active (pending/processing) job to a final state. No rows when
+    it was already final, e.g. a duplicate callback or a job the worker
+    failed meanwhile: the caller then skips the side effects.
+    """
+    return (
+        supabase
+        .table("qc_jobs")
+        .update(update_data)
+        .eq("id", job_id)
+        .in_("status", ["pending", "processing"])
+        .execute()
+    )
+
+
+def _run_side_effects(job: dict, final_status: str, qc_result: dict, artifacts: Optional[dict]) -> None:
+    # The job is already final: raising here would make n8n retry into
+    # "already completed" (and cost the rest of a batch theirs) with the
+    # refund, webhooks and parent settlement lost
+    try:
+        if final_status == "completed":
+            on_job_completed(job, qc_result, artifacts)
+        else:
+            on_job_failed(job, qc_result)
+    except Exception:
+        logger.exception("Side effects failed for job %s", job["id"])
+
+
 @router.post("/callbacks/n8n/complete")
 def complete_job(
     payload: CompletionPayload,
@@ -328,21 +419,16 @@ def complete_job(
     """
     validate_n8n_auth(x_api_key)
     
-    # Debug: log incoming payload to understand n8n format
-    print(f"[callback] Received complete callback for job: {payload.job_id}")
-    print(f"[callback] qc_result type: {type(payload.qc_result)}")
-    if isinstance(payload.qc_result, list):
-        print(f"[callback] qc_result is list with {len(payload.qc_result)} items")
-        if payload.qc_result:
-            print(f"[callback] First item keys: {payload.qc_result[0].keys() if isinstance(payload.qc_result[0], dict) else 'not a dict'}")
-    elif isinstance(payload.qc_result, dict):
-        print(f"[callback] qc_result keys: {payload.qc_result.keys()}")
+    logger.info(
+        "Received complete callback",
+        extra={"job_id": payload.job_id, "qc_result_type": type(payload.qc_result).__name__}
+    )
     
     # Verify job exists and is in a valid state
     job_res = (
         supabase
         .table("qc_jobs")
-        .select("id, status")
+        .select(JOB_EVENT_COLUMNS)
         .eq("id", payload.job_id)
         .execute()
     )
@@ -353,6 +439,9 @@ def complete_job(
             detail="Job not found"
         )
     
+    # Join the job's trace (traceparent header, payload trace_id or the row)
+    tracing.join_trace(payload.trace_id or job_res.data[0].get("trace_id"))
+    
     job = job_res.data[0]
     
     # Prevent updating already completed/failed jobs (idempotency)
@@ -376,7 +465,13 @@ def complete_job(
     if payload.artifacts:
         update_data["artifacts"] = payload.artifacts
     
-    supabase.table("qc_jobs").update(update_data).eq("id", payload.job_id).execute()
+    if not _finish_job(payload.job_id, update_data).data:
+        return {
+            "status": "already_completed",
+            "job_id": payload.job_id,
+            "message": "Job already finished"
+        }
+    _run_side_effects(job, "completed", normalized_result, payload.artifacts)
     
     return {
         "status": "ok",
@@ -401,7 +496,7 @@ def complete_job_legacy(
     job_res = (
         supabase
         .table("qc_jobs")
-        .select("id, status")
+        .select(JOB_EVENT_COLUMNS)
         .eq("id", payload.job_id)
         .execute()
     )
@@ -412,6 +507,9 @@ def complete_job_legacy(
             detail="Job not found"
         )
     
+    # Join the job's trace (traceparent header, payload trace_id or the row)
+    tracing.join_trace(payload.trace_id or job_res.data[0].get("trace_id"))
+    
     job = job_res.data[0]
     
     if job["status"] in ["completed", "failed"]:
@@ -432,7 +530,13 @@ def complete_job_legacy(
     if payload.artifacts:
         update_data["artifacts"] = payload.artifacts
     
-    supabase.table("qc_jobs").update(update_data).eq("id", payload.job_id).execute()
+    if not _finish_job(payload.job_id, update_data).data:
+        return {
+            "status": "already_completed",
+            "job_id": payload.job_id,
+            "message": "Job already finished"
+        }
+    _run_side_effects(job, "completed", normalized_result, payload.artifacts)
     
     return {
         "status": "ok",
@@ -457,7 +561,7 @@ def fail_job(
     job_res = (
         supabase
         .table("qc_jobs")
-        .select("id, status")
+        .select(JOB_EVENT_COLUMNS)
         .eq("id", payload.job_id)
         .execute()
     )
@@ -468,14 +572,17 @@ def fail_job(
             detail="Job not found"
         )
     
+    # Join the job's trace (traceparent header, payload trace_id or the row)
+    tracing.join_trace(payload.trace_id or job_res.data[0].get("trace_id"))
+    
     job = job_res.data[0]
     
-    # Prevent updating already completed jobs
-    if job["status"] == "completed":
+    # Prevent updating already finished jobs
+    if job["status"] in ["completed", "failed"]:
         return {
             "status": "already_completed",
             "job_id": payload.job_id,
-            "message": "Job already completed, cannot mark as failed"
+            "message": f"Job already has status: {job['status']}"
         }
     
     # Update job as failed
@@ -487,7 +594,13 @@ def fail_job(
         }
     }
     
-    supabase.table("qc_jobs").update(update_data).eq("id", payload.job_id).execute()
+    if not _finish_job(payload.job_id, update_data).data:
+        return {
+            "status": "already_completed",
+            "job_id": payload.job_id,
+            "message": "Job already finished"
+        }
+    _run_side_effects(job, "failed", update_data["qc_result"], None)
     
     return {
         "status": "ok",
@@ -496,6 +609,125 @@ def fail_job(
     }
 
 
+@with_retry()
+def _query_event_jobs(job_ids: List[str]):
+    """Get the jobs a callback batch refers to with retry on transient failures."""
+    return supabase.table("qc_jobs").select(JOB_EVENT_COLUMNS).in_("id", job_ids).execute()
+
+
+# The batch writes are not retried, like the single-event updates: a retry
+# after a lost response would find the jobs already final and skip their
+# side effects. n8n retries the request instead.
+
+def _start_jobs(job_ids: List[str]):
+    """Move pending jobs that reported progress to processing."""
+    return supabase.table("qc_jobs").update({"status": "processing"}).in_("id", job_ids).eq("status", "pending").execute()
+
+
+def _finish_jobs(final_status: str, rows: List[dict]):
+    """Move jobs to a final state with their results; returns the ids updated."""
+    return supabase.rpc("qc_jobs_finish", {"p_status": final_status, "p_jobs": rows}).execute()
+
+
+@router.post("/callbacks/n8n/batch")
+def apply_callback_batch(
+    payload: CallbackBatch,
+    x_api_key: Optional[str] = Header(None)
+):
+    """
+    Called by n8n to report many job events at once:
+    { events: [{ type: "progress" | "complete" | "failed", job_id, ... }] }
+    with the fields of the single-event endpoints.
+
+    The jobs are read with one query and the events applied with one bulk
+    conditional update per transition (pending -> processing for progress,
+    completed, failed). Progress values go through the progress coalescer.
+    Events for the same job apply in order and the first final one wins.
+
+    Returns one outcome per event, in request order:
+    - ok: applied
+    - not_found: unknown job (or not a job id)
+    - already_final: the job was already completed or failed, or an earlier
+      event in the batch finished it
+    """
+    validate_n8n_auth(x_api_key)
+    events = payload.events
+
+    job_ids: List[Optional[str]] = []
+    for event in events:
+        try:
+            job_ids.append(str(UUID(event.job_id)))
+        except ValueError:
+            job_ids.append(None)
+    known = sorted({job_id for job_id in job_ids if job_id})
+    jobs = {row["id"]: row for row in (_query_event_jobs(known).data if known else [])}
+
+    outcomes: List[str] = [""] * len(events)
+    to_start = set()
+    flush_progress = False
+    # final status -> job_id -> (event index, qc_result, artifacts)
+    finishing: Dict[str, Dict[str, tuple]] = {"completed": {}, "failed": {}}
+    finished = set()
+
+    for i, (event, job_id) in enumerate(zip(events, job_ids)):
+        job = jobs.get(job_id)
+        if job is None:
+            outcomes[i] = "not_found"
+        elif job["status"] in ("completed", "failed") or job_id in finished:
+            outcomes[i] = "already_final"
+        elif event.type == "progress":
+            outcomes[i] = "ok"
+            flush_progress = job_progress.report(job_id, event.progress, event.message) or flush_progress
+            if job["status"] == "pending":
+                to_start.add(job_id)
+        else:
+            finished.add(job_id)
+            if event.type == "complete":
+                finishing["completed"][job_id] = (i, normalize_qc_result(event.qc_result), event.artifacts)
+            else:
+                qc_result = {"error": event.error, "error_code": event.error_code}
+                finishing["failed"][job_id] = (i, qc_result, None)
+
+    # Progress only changes the row for jobs still pending (and not finished below)
+    to_start -= finished
+    if to_start:
+        _start_jobs(sorted(to_start))
+        for job_id in to_start:
+            on_job_updated(jobs[job_id])
+
+    for final_status, by_job in finishing.items():
+        if not by_job:
+            continue
+        rows = [
+            {"id": job_id, "qc_result": qc_result, "artifacts": artifacts}
+            for job_id, (_, qc_result, artifacts) in by_job.items()
+        ]
+        applied = {str(job_id) for job_id in _finish_jobs(final_status, rows).data or []}
+        for job_id, (i, qc_result, artifacts) in by_job.items():
+            if job_id not in applied:
+                outcomes[i] = "already_final"
+                continue
+            outcomes[i] = "ok"
+            _run_side_effects(jobs[job_id], final_status, qc_result, artifacts)
+
+    # After the side effects: jobs the batch finished are no longer pending a write
+    if flush_progress:
+        job_progress.flush()
+
+    logger.info(
+        "Applied callback batch",
+        extra={"events": len(events), "applied": outcomes.count("ok")}
+    )
+    return {
+        "status": "ok",
+        "applied": outcomes.count("ok"),
+        "results": [
+            {"job_id": event.job_id, "type": event.type, "outcome": outcome}
+            for event, outcome in zip(events, outcomes)
+        ]
+    }
+
+
 @router.get("/callbacks/n8n/health")
 def n8n_health_check():
     """Health check endpoint for n8n to verify connectivity."""
@@ -1,5 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from datetime import datetime
+from app.services.result_cache import result_cache
+from app.services.n8n import n8n_service
+from app.core.db_router import db_router
 
 router = APIRouter()
 
@@ -11,3 +14,31 @@ async def health_check():
         "timestamp": datetime.utcnow().isoformat(),
         "service": "QC Lobby API"
     }
+
+
+@router.get("/health/result-cache")
+async def result_cache_stats():
+    """Hit-rate and size of the QC result cache."""
+    return result_cache.stats()
+
+
+@router.get("/health/n8n")
+async def n8n_pool_status():
+    """Circuit breaker state and per-endpoint health of the n8n pool (hosts only, no webhook paths)."""
+    return {
+        "circuit": n8n_service.breaker.state,
+        "endpoints": n8n_service.pool.snapshot()
+    }
+
+
+@router.get("/health/replicas")
+def read_replicas():
+    """Read replicas and their last measured lag (empty: every read uses the primary)."""
+    return {"replicas": db_router.snapshot()}
+
+
+@router.get("/health/tasks")
+async def background_tasks(request: Request):
+    """Supervised background tasks (job processor, health checks) and their restarts."""
+    supervisor = getattr(request.app.state, "supervisor", None)
+    return {"tasks": supervisor.snapshot() if supervisor else []}
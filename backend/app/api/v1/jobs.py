@@ -1,8 +1,15 @@
-from uuid import UUID
+from uuid import UUID, uuid4
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
 from app.core.supabase import supabase, with_retry
+from app.core.db_router import db_router
 from app.core.auth import get_current_user
+from app.core.responses import FastJSONResponse
+from app.core import tracing
+from app.services import credits, job_reads
+from app.services.archive import job_archive
+from app.services.eta import queue_eta
+from app.services.progress import job_progress
 from enum import Enum
 from typing import Literal, Optional
 
@@ -30,20 +37,22 @@ class JobStatusUpdate(BaseModel):
 
 @with_retry()
 def _query_user_team(user_id: str):
-    """Get user's team_id with retry on transient failures."""
-    return supabase.table("users").select("team_id").eq("id", user_id).execute()
-
-
-@with_retry()
-def _query_team_credits(team_id: str):
-    """Get team credits with retry on transient failures."""
-    return supabase.table("teams").select("credits").eq("id", team_id).execute()
+    """Get user's team_id (from a read replica) with retry on transient failures."""
+    return db_router.reader(user_id).table("users").select("team_id").eq("id", user_id).execute()
 
 
 @with_retry()
 def _query_jobs_by_team(team_id: str):
-    """List all jobs for a team with retry on transient failures."""
-    return supabase.table("qc_jobs").select("*").eq("team_id", team_id).order("created_at", desc=True).execute()
+    """List all jobs for a team (not segments, from a read replica) with retry on transient failures."""
+    return (
+        db_router.reader(team_id)
+        .table("qc_jobs")
+        .select("*")
+        .eq("team_id", team_id)
+        .is_("parent_job_id", "null")
+        .order("created_at", desc=True)
+        .execute()
+    )
 
 
 @with_retry()
@@ -55,10 +64,24 @@ def _query_job_by_id(job_id: UUID, team_id: str = None):
     return query.limit(1).execute()
 
 
+@with_retry()
+def _read_job_by_id(job_id: UUID, team_id: str):
+    """Get a specific job from a read replica with retry on transient failures."""
+    return db_router.reader(team_id).table("qc_jobs").select("*").eq("id", job_id).limit(1).execute()
+
+
 @with_retry()
 def _count_jobs_by_status(team_id: str, status_val: str):
     """Count jobs by status with retry on transient failures."""
-    return supabase.table("qc_jobs").select("id", count="exact").eq("team_id", team_id).eq("status", status_val).execute()
+    return (
+        supabase
+        .table("qc_jobs")
+        .select("id", count="exact")
+        .eq("team_id", team_id)
+        .eq("status", status_val)
+        .is_("parent_job_id", "null")
+        .execute()
+    )
 
 
 @with_retry()
@@ -68,20 +91,23 @@ def _insert_job(job_data: dict):
 
 
 @with_retry()
-def _update_team_credits(team_id: str, new_credits: int):
-    """Update team credits with retry on transient failures."""
-    return supabase.table("teams").update({"credits": new_credits}).eq("id", team_id).execute()
+def _update_job_status(job_id: UUID, new_status: str, from_status: Optional[str] = None):
+    """Update job status (only from `from_status` if given) with retry on transient failures."""
+    query = supabase.table("qc_jobs").update({"status": new_status}).eq("id", job_id)
+    if from_status:
+        query = query.eq("status", from_status)
+    return query.execute()
 
 
-@with_retry()
-def _update_job_status(job_id: UUID, new_status: str):
-    """Update job status with retry on transient failures."""
-    return supabase.table("qc_jobs").update({"status": new_status}).eq("id", job_id).execute()
+def _read_job(job_id: UUID, team_id: str) -> list:
+    """A team's job as a 0/1-row list, from qc_jobs or else the cold archive."""
+    rows = job_reads.job(str(job_id), lambda: _read_job_by_id(job_id, team_id).data, team_id)
+    return rows or job_archive.job(team_id, str(job_id))
 
 
-@router.get("/jobs")
+@router.get("/jobs", response_class=FastJSONResponse)
 def list_jobs(user=Depends(get_current_user)):
-    """List all jobs for the current user's team only."""
+    """List all jobs for the current user's team only (recent, then archived)."""
     user_profile = _query_user_team(user.id)
     
     if not user_profile.data:
@@ -91,12 +117,22 @@ def list_jobs(user=Depends(get_current_user)):
         )
     
     team_id = user_profile.data[0]["team_id"]
-    response = _query_jobs_by_team(team_id)
-    return response.data
+    # Dashboard tabs poll this together: coalesce into one query per burst
+    jobs = job_reads.team_jobs(team_id, lambda: _query_jobs_by_team(team_id).data)
+    jobs = queue_eta.annotate(job_progress.overlay(jobs))
+    archived = job_archive.team_jobs(team_id)
+    if archived:
+        jobs = jobs + archived
+    # Rows are already plain JSON; skip jsonable_encoder for large qc_result blobs
+    return FastJSONResponse(jobs)
 
 
-@router.get("/jobs/{job_id}")
+@router.get("/jobs/{job_id}", response_class=FastJSONResponse)
 def get_job(job_id: UUID, user=Depends(get_current_user)):
+    """
+    A job. Pending and processing jobs carry their latest progress and
+    estimated_start_at / estimated_completion_at.
+    """
     user_profile = _query_user_team(user.id)
     
     if not user_profile.data:
@@ -106,40 +142,68 @@ def get_job(job_id: UUID, user=Depends(get_current_user)):
         )
     
     team_id = user_profile.data[0]["team_id"]
-    job_res = _query_job_by_id(job_id, team_id)
+    job_rows = _read_job(job_id, team_id)
     
-    if not job_res.data:
+    if not job_rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job not found"
         )
     
-    return job_res.data[0]
+    return FastJSONResponse(queue_eta.annotate(job_progress.overlay(job_rows))[0])
 
 
-@router.post("/jobs")
-def create_job(job: JobCreate, user=Depends(get_current_user)):
-    # Get user's team_id
+@router.get("/jobs/{job_id}/timeline")
+def get_job_timeline(job_id: UUID, user=Depends(get_current_user)):
+    """
+    Span timeline of a job's trace (API, worker, n8n dispatch, callbacks),
+    ordered by start time with offsets from the first span. Only recent
+    traces are held in memory: older jobs have no spans.
+    """
     user_profile = _query_user_team(user.id)
-
+    
     if not user_profile.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User profile not found"
         )
-
+    
     team_id = user_profile.data[0]["team_id"]
+    job_rows = _read_job(job_id, team_id)
+    
+    if not job_rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    trace_id = job_rows[0].get("trace_id")
+    spans = sorted(tracing.get_trace(trace_id), key=lambda s: s["start"]) if trace_id else []
+    origin = spans[0]["start"] if spans else 0
+    
+    return {
+        "job_id": str(job_id),
+        "trace_id": trace_id,
+        "total_ms": round(max((s["start"] - origin) * 1000 + s["duration_ms"] for s in spans), 3) if spans else 0,
+        "spans": [
+            {**s, "offset_ms": round((s["start"] - origin) * 1000, 3)}
+            for s in spans
+        ]
+    }
+
 
-    # Fetch team credits
-    team_res = _query_team_credits(team_id)
+@router.post("/jobs")
+def create_job(job: JobCreate, user=Depends(get_current_user)):
+    # Get user's team_id
+    user_profile = _query_user_team(user.id)
 
-    if not team_res.data:
+    if not user_profile.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
+            detail="User profile not found"
         )
 
-    team_credits = team_res.data[0]["credits"] or 0
+    team_id = user_profile.data[0]["team_id"]
 
     # Count active jobs (pending or processing)
     pending_res = _count_jobs_by_status(team_id, JobStatus.pending.value)
@@ -158,38 +222,51 @@ def create_job(job: JobCreate, user=Depends(get_current_user)):
     credits_per_second = 1 if job.qc_mode == "polisher" else 2
     credits_used = job.duration_sec * credits_per_second
 
-    # Check if team has enough credits
-    if team_credits < credits_used:
+    # Reserve the credits atomically (captured on completion, refunded on failure).
+    # The id is generated here so the reserve can be written before the job row.
+    job_id = str(uuid4())
+    try:
+        credits.reserve(team_id, job_id, credits_used)
+    except credits.InsufficientCredits as e:
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail=f"Insufficient credits. Required: {credits_used}, Available: {team_credits}"
+            detail=str(e)
         )
 
-    # Insert the job
+    # The reserve and the insert write the team's rows: its next reads go to the primary
+    db_router.wrote(team_id)
+
+    # Insert the job (its trace follows it through the worker, n8n and callbacks)
     job_data = {
+        "id": job_id,
         "team_id": team_id,
         "video_url": job.video_url,
         "status": JobStatus.pending.value,
         "qc_mode": job.qc_mode,
         "duration_sec": job.duration_sec,
-        "credits_used": credits_used
+        "credits_used": credits_used,
+        "trace_id": tracing.new_job_trace()
     }
     
     # Add thumbnail if provided
     if job.thumbnail_url:
         job_data["thumbnail_url"] = job.thumbnail_url
 
-    job_response = _insert_job(job_data)
+    try:
+        job_response = _insert_job(job_data)
+    except Exception:
+        credits.release(job_id, "job insert failed", team_id)
+        raise
 
     if not job_response.data:
+        credits.release(job_id, "job insert failed", team_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create job"
         )
 
-    # Deduct credits from team
-    new_credits = team_credits - credits_used
-    _update_team_credits(team_id, new_credits)
+    job_reads.invalidate(team_id=team_id)
+    queue_eta.job_created(job_response.data[0])
 
     # Job is now pending - the background worker will pick it up
     return job_response.data[0]
@@ -233,11 +310,29 @@ def update_job_status(
             detail="Not authorized to modify this job"
         )
 
-    # Update the job status
-    update_res = _update_job_status(job_id, new_status.value)
+    # Failing a job refunds it, so users can only cancel jobs not yet
+    # dispatched; a running job is failed by its backend
+    if new_status == JobStatus.failed:
+        update_res = _update_job_status(job_id, new_status.value, from_status=JobStatus.pending.value)
+        if not update_res.data:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Only pending jobs can be marked failed"
+            )
+    else:
+        update_res = _update_job_status(job_id, new_status.value)
     if not update_res.data:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to update the job status"
         )
+    job_reads.invalidate(str(job_id), team_id)
+    db_router.wrote(team_id)
+    queue_eta.invalidate()
+
+    # Settle the job's credit reserve on manual final states
+    if new_status == JobStatus.completed:
+        credits.capture(job_id)
+    elif new_status == JobStatus.failed:
+        credits.release(job_id, "marked failed by user", team_id)
     return update_res.data[0]
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.core.db_router import db_router
+from app.core.metrics import QueueDepthCollector
+
+router = APIRouter()
+
+
+def _count_jobs(status_val: str):
+    res = db_router.reader().table("qc_jobs").select("id", count="exact").eq("status", status_val).limit(1).execute()
+    return res.count
+
+
+queue_depth = QueueDepthCollector(_count_jobs)
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    queue_depth.refresh()
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
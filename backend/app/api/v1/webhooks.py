@@ -0,0 +1,224 @@
+import secrets
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import AnyHttpUrl, BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+from app.core.supabase import supabase, with_retry
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.outbound import UnsafeURL, check_url
+from app.services import webhooks
+
+router = APIRouter()
+
+WebhookEvent = Literal["job.completed", "job.failed"]
+
+# Returned by the API; the secret only on creation
+SUBSCRIPTION_COLUMNS = "id, url, events, batch_size, active, created_at"
+DELIVERY_COLUMNS = "id, event, status, attempts, next_attempt_at, last_error, created_at, delivered_at"
+
+
+def _check_url(url: Optional[AnyHttpUrl]) -> Optional[str]:
+    if url is None:
+        return None
+    if url.scheme != "https" and not settings.WEBHOOK_ALLOW_HTTP:
+        raise ValueError("Webhook URLs must use https")
+    return str(url)
+
+
+class WebhookCreate(BaseModel):
+    url: AnyHttpUrl
+    events: List[WebhookEvent] = Field(default=list(webhooks.EVENTS), min_length=1)
+    batch_size: int = Field(default=1, ge=1, le=100, description="Max events per request")
+
+    @field_validator("url")
+    @classmethod
+    def check_url(cls, url: AnyHttpUrl) -> str:
+        return _check_url(url)
+
+
+class WebhookUpdate(BaseModel):
+    url: Optional[AnyHttpUrl] = None
+    events: Optional[List[WebhookEvent]] = Field(default=None, min_length=1)
+    batch_size: Optional[int] = Field(default=None, ge=1, le=100)
+    active: Optional[bool] = None
+
+    @field_validator("url")
+    @classmethod
+    def check_url(cls, url: Optional[AnyHttpUrl]) -> Optional[str]:
+        return _check_url(url)
+
+
+@with_retry()
+def _query_user_team(user_id: str):
+    """Get user's team_id with retry on transient failures."""
+    return supabase.table("users").select("team_id").eq("id", user_id).execute()
+
+
+@with_retry()
+def _query_subscriptions(team_id: str):
+    """List a team's webhook subscriptions with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_subscriptions")
+        .select(SUBSCRIPTION_COLUMNS)
+        .eq("team_id", team_id)
+        .order("created_at", desc=False)
+        .execute()
+    )
+
+
+@with_retry()
+def _insert_subscription(subscription: dict):
+    """Insert a webhook subscription with retry on transient failures."""
+    return supabase.table("webhook_subscriptions").insert(subscription).execute()
+
+
+@with_retry()
+def _update_subscription(subscription_id: UUID, team_id: str, update_data: dict):
+    """Update a team's webhook subscription with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_subscriptions")
+        .update(update_data)
+        .eq("id", subscription_id)
+        .eq("team_id", team_id)
+        .execute()
+    )
+
+
+@with_retry()
+def _delete_subscription(subscription_id: UUID, team_id: str):
+    """Delete a team's webhook subscription with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_subscriptions")
+        .delete()
+        .eq("id", subscription_id)
+        .eq("team_id", team_id)
+        .execute()
+    )
+
+
+@with_retry()
+def _query_deliveries(subscription_id: UUID, team_id: str, limit: int):
+    """List a subscription's recent deliveries with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_outbox")
+        .select(DELIVERY_COLUMNS)
+        .eq("subscription_id", subscription_id)
+        .eq("team_id", team_id)
+        .order("created_at", desc=True)
+        .limit(limit)
+        .execute()
+    )
+
+
+def _team_id(user) -> str:
+    user_profile = _query_user_team(user.id)
+    if not user_profile.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User profile not found"
+        )
+    return user_profile.data[0]["team_id"]
+
+
+def _check_destination(url: str) -> None:
+    """Refuse URLs that resolve to private, loopback or link-local addresses."""
+    try:
+        check_url(url)
+    except UnsafeURL as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+
+def _public(subscription: dict) -> dict:
+    return {column: subscription.get(column) for column in SUBSCRIPTION_COLUMNS.split(", ")}
+
+
+@router.get("/webhooks")
+def list_webhooks(user=Depends(get_current_user)):
+    """List the team's webhook subscriptions (without secrets)."""
+    return _query_subscriptions(_team_id(user)).data
+
+
+@router.post("/webhooks", status_code=status.HTTP_201_CREATED)
+def create_webhook(webhook: WebhookCreate, user=Depends(get_current_user)):
+    """
+    Subscribe a URL to job events. The response includes the signing
+    secret; it is not shown again.
+    """
+    _check_destination(webhook.url)
+    team_id = _team_id(user)
+    response = _insert_subscription({
+        "team_id": team_id,
+        "url": webhook.url,
+        "secret": secrets.token_hex(32),
+        "events": webhook.events,
+        "batch_size": webhook.batch_size,
+    })
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create the webhook"
+        )
+    webhooks.invalidate_subscriptions(team_id)
+    subscription = response.data[0]
+    return {**_public(subscription), "secret": subscription["secret"]}
+
+
+@router.patch("/webhooks/{webhook_id}")
+def update_webhook(webhook_id: UUID, webhook: WebhookUpdate, user=Depends(get_current_user)):
+    team_id = _team_id(user)
+    update_data = webhook.model_dump(exclude_none=True)
+    if not update_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing to update"
+        )
+    if "url" in update_data:
+        _check_destination(update_data["url"])
+    response = _update_subscription(webhook_id, team_id, update_data)
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook not found"
+        )
+    webhooks.invalidate_subscriptions(team_id)
+    return _public(response.data[0])
+
+
+@router.post("/webhooks/{webhook_id}/rotate-secret")
+def rotate_webhook_secret(webhook_id: UUID, user=Depends(get_current_user)):
+    """Replace the signing secret; deliveries from now on use the new one."""
+    team_id = _team_id(user)
+    response = _update_subscription(webhook_id, team_id, {"secret": secrets.token_hex(32)})
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook not found"
+        )
+    subscription = response.data[0]
+    return {**_public(subscription), "secret": subscription["secret"]}
+
+
+@router.delete("/webhooks/{webhook_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_webhook(webhook_id: UUID, user=Depends(get_current_user)):
+    """Delete a subscription and its queued deliveries."""
+    team_id = _team_id(user)
+    if not _delete_subscription(webhook_id, team_id).data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook not found"
+        )
+    webhooks.invalidate_subscriptions(team_id)
+
+
+@router.get("/webhooks/{webhook_id}/deliveries")
+def list_webhook_deliveries(webhook_id: UUID, limit: int = 50, user=Depends(get_current_user)):
+    """Recent deliveries of a subscription, newest first (for debugging a receiver)."""
+    return _query_deliveries(webhook_id, _team_id(user), min(max(limit, 1), 200)).data
@@ -0,0 +1,420 @@
+"""
+Caching
+
+One interface for every cache in the service (results, probes, job reads):
+- LocalCache: in-process LRU with per-entry TTL (cachetools)
+- RedisCache: shared by every process through a Redis-protocol server
+- InvalidationBus: Redis pub/sub channel that drops keys from the local
+  caches of every process when one of them invalidates
+- SingleFlight / AsyncSingleFlight: concurrent callers of the same key
+  share one in-flight computation (stampede protection)
+
+create_cache() picks the implementation from settings:
+- CACHE_BACKEND=local (default): LocalCache, plus pub/sub invalidation when
+  CACHE_REDIS_URL is set
+- CACHE_BACKEND=redis: RedisCache on CACHE_REDIS_URL
+
+Values must be JSON-serializable so both implementations behave the same.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol, TypeVar
+from cachetools import TLRUCache
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class CacheBackend(Protocol):
+    """Interface every cache implementation provides."""
+
+    namespace: str
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None on a miss."""
+        ...
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value; ttl in seconds (None: the cache's default)."""
+        ...
+
+    def delete(self, *keys: str) -> None:
+        ...
+
+    def clear(self) -> None:
+        ...
+
+    def stats(self) -> dict:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class _Entry:
+    __slots__ = ("value", "ttl")
+
+    def __init__(self, value: Any, ttl: float):
+        self.value = value
+        self.ttl = ttl
+
+
+class LocalCache:
+    """Thread-safe in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float):
+        self.namespace = namespace
+        self.default_ttl = ttl
+        self.maxsize = maxsize
+        self._data: TLRUCache = TLRUCache(maxsize=maxsize, ttu=lambda _key, entry, now: now + entry.ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+        return entry.value if entry is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = _Entry(value, self.default_ttl if ttl is None else ttl)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._data.expire()
+            size = len(self._data)
+        return {"backend": "local", "size": size, "maxsize": self.maxsize, "ttl_sec": self.default_ttl}
+
+    def close(self) -> None:
+        self.clear()
+
+
+def _redis_client(url: str):
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("CACHE_REDIS_URL is set but the `redis` package is not installed") from e
+    return redis.Redis.from_url(url)
+
+
+class RedisCache:
+    """
+    Cache stored in Redis, shared by all processes. Values are JSON.
+    Redis errors are logged and treated as misses so a cache outage
+    degrades to the uncached path instead of failing requests.
+    """
+
+    def __init__(self, namespace: str, ttl: float, client=None, url: Optional[str] = None, prefix: str = "qc:cache:"):
+        self.namespace = namespace
+        self.default_ttl = ttl
+        self._client = client if client is not None else _redis_client(url)
+        self._prefix = f"{prefix}{namespace}:"
+        self._last_error_log = 0.0
+
+    def _log_error(self, action: str, error: Exception) -> None:
+        now = time.monotonic()
+        if now - self._last_error_log > 60:
+            self._last_error_log = now
+            logger.warning("Redis cache %s %s failed: %s", self.namespace, action, error)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._client.get(self._prefix + key)
+        except Exception as e:
+            self._log_error("get", e)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            self._client.set(self._prefix + key, json.dumps(value, default=str), px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            self._log_error("set", e)
+
+    def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            self._client.delete(*(self._prefix + key for key in keys))
+        except Exception as e:
+            self._log_error("delete", e)
+
+    def clear(self) -> None:
+        try:
+            keys = list(self._client.scan_iter(match=self._prefix + "*", count=500))
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            self._log_error("clear", e)
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "size": None, "ttl_sec": self.default_ttl}
+
+    def close(self) -> None:
+        pass  # The client may be shared with other caches
+
+
+# ============================================
+# Cross-process invalidation
+# ============================================
+
+class InvalidationBus:
+    """
+    Pub/sub channel carrying cache invalidations between processes.
+
+    Local caches attached to the bus publish their delete()/clear() calls;
+    a listener thread applies other processes' invalidations locally.
+    """
+
+    def __init__(self, client, channel: str):
+        self._client = client
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._caches: Dict[str, LocalCache] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def attach(self, cache: LocalCache) -> "InvalidatingCache":
+        with self._lock:
+            self._caches[cache.namespace] = cache
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+                self._thread.start()
+        return InvalidatingCache(cache, self)
+
+    def publish(self, namespace: str, keys: Optional[List[str]] = None) -> None:
+        message = {"origin": self.origin, "ns": namespace, "keys": keys}
+        try:
+            self._client.publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.warning("Could not publish cache invalidation for %s: %s", namespace, e)
+
+    def _apply(self, data: Any) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") == self.origin:
+            return
+        cache = self._caches.get(message.get("ns"))
+        if cache is None:
+            return
+        if message.get("keys") is None:
+            cache.clear()
+        else:
+            cache.delete(*message["keys"])
+
+    def _listen(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                backoff = 1.0
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._apply(message["data"])
+            except Exception as e:
+                # Missed invalidations are bounded by the local TTLs
+                logger.warning("Cache invalidation listener error, reconnecting in %.0fs: %s", backoff, e)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+class InvalidatingCache:
+    """A LocalCache whose deletes and clears are broadcast on an InvalidationBus."""
+
+    def __init__(self, local: LocalCache, bus: InvalidationBus):
+        self.local = local
+        self.bus = bus
+        self.namespace = local.namespace
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.local.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.local.set(key, value, ttl)
+
+    def delete(self, *keys: str) -> None:
+        self.local.delete(*keys)
+        self.bus.publish(self.namespace, list(keys))
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.bus.publish(self.namespace)
+
+    def stats(self) -> dict:
+        return {**self.local.stats(), "invalidation": "pubsub"}
+
+    def close(self) -> None:
+        self.local.close()
+
+
+_redis = None
+_bus: Optional[InvalidationBus] = None
+_factory_lock = threading.Lock()
+
+
+def _shared_redis():
+    global _redis
+    with _factory_lock:
+        if _redis is None:
+            _redis = _redis_client(settings.CACHE_REDIS_URL)
+        return _redis
+
+
+def _shared_bus() -> InvalidationBus:
+    global _bus
+    client = _shared_redis()
+    with _factory_lock:
+        if _bus is None:
+            _bus = InvalidationBus(client, settings.CACHE_INVALIDATION_CHANNEL)
+        return _bus
+
+
+def set_cache_redis_client(client) -> None:
+    """Use `client` (e.g. an in-memory stand-in) for Redis-backed caches."""
+    global _redis, _bus
+    with _factory_lock:
+        if _bus is not None:
+            _bus.close()
+        _redis, _bus = client, None
+
+
+def create_cache(namespace: str, maxsize: int, ttl: float) -> CacheBackend:
+    """Cache for `namespace` using the implementation configured in settings."""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(namespace, ttl, client=_shared_redis())
+    local = LocalCache(namespace, maxsize, ttl)
+    if settings.CACHE_REDIS_URL or _redis is not None:
+        return _shared_bus().attach(local)
+    return local
+
+
+def close_caches() -> None:
+    """Stop the invalidation listener (on shutdown)."""
+    global _bus
+    with _factory_lock:
+        if _bus is not None:
+            _bus.close()
+            _bus = None
+
+
+# ============================================
+# Stampede protection
+# ============================================
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls (threads) for the same key: the first caller
+    runs fn(), the others wait for and share its result or exception.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Any, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop."""
+
+    def __init__(self):
+        self._calls: Dict[Any, asyncio.Future] = {}
+
+    async def do(self, key: Any, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a leader-only failure doesn't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+def cache_key(*parts: Any) -> str:
+    """Join key parts into a cache key string."""
+    return ":".join(str(part) for part in parts)
@@ -1,6 +1,7 @@
+from functools import lru_cache
 from pathlib import Path
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -12,10 +13,31 @@ class Settings(BaseSettings):
     app_version: str = "1.0.0"
     debug: bool = False
 
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: Dict[str, str] = {}  # Per-module overrides, e.g. {"app.workers": "DEBUG"}
+
+    # Tracing
+    TRACING_ENABLED: bool = True
+    TRACE_EXPORT_PATH: str = str(BASE_DIR / "traces" / "spans.jsonl")
+    TRACE_SAMPLE_RATE: float = 0.0  # Fraction of non-job requests to export
+    TRACE_BUFFER_TRACES: int = 1000  # Recent traces kept in memory for the timeline endpoint
+    TRACE_EXPORT_MAX_BYTES: int = 100 * 1024 * 1024  # Rotate the export file past this size (0: never)
+    TRACE_EXPORT_BACKUPS: int = 3  # Rotated export files kept
+
     # Supabase
     SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_KEY: str
+    SUPABASE_JWT_SECRET: Optional[str] = None  # Verifies JWTs for per-user rate limits (else keyed by IP)
+
+    # Read replicas (same service key). Dashboard reads go to a replica unless
+    # the team/user wrote within READ_REPLICA_STICKY_SEC or every replica is
+    # more than READ_REPLICA_MAX_LAG_SEC behind. Empty: primary only.
+    SUPABASE_READ_REPLICA_URLS: List[str] = []
+    READ_REPLICA_STICKY_SEC: float = 5.0  # Keep above MAX_LAG + LAG_CHECK
+    READ_REPLICA_MAX_LAG_SEC: float = 1.0
+    READ_REPLICA_LAG_CHECK_SEC: float = 1.0
 
     # n8n Integration
     N8N_WEBHOOK_URL: str
@@ -23,6 +45,151 @@ class Settings(BaseSettings):
     N8N_CALLBACK_BASE_URL: Optional[str] = None  # Your backend's public URL for n8n callbacks
     USE_N8N_PROCESSING: bool = True  # Set to False to use mock processing
 
+    # n8n endpoint pool, e.g. [{"url": "...", "weight": 2, "qc_modes": ["guardian"]}]
+    # Falls back to N8N_WEBHOOK_URL when empty
+    N8N_ENDPOINTS: List[Dict[str, Any]] = []
+    N8N_EJECT_AFTER_FAILURES: int = 3  # Consecutive errors before an endpoint is ejected
+    N8N_EJECT_SEC: float = 30.0
+    N8N_HEALTH_CHECK_INTERVAL_SEC: float = 15.0  # 0 disables active health checks
+
+    # n8n dispatch policy
+    N8N_RETRY_ATTEMPTS: int = 3  # Attempts per dispatch (jittered exponential backoff)
+    N8N_RETRY_MAX_WAIT_SEC: float = 10.0
+    N8N_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures before the circuit opens
+    N8N_BREAKER_RESET_SEC: float = 30.0  # Open time before a trial request is let through
+    DISPATCH_MAX_JOB_ATTEMPTS: int = 5  # Dispatches per job before it is marked failed (outages don't count)
+
+    # QC backends
+    QC_DEFAULT_BACKEND: Optional[str] = None  # 'n8n', 'mock' or 'local'; derived from USE_N8N_PROCESSING if unset
+    QC_BACKEND_ROUTES: Dict[str, str] = {}  # Per qc_mode override, e.g. {"polisher": "local"}
+    LOCAL_QC_WORKERS: int = 2  # Process pool size for the local backend
+
+    # Video probe (runs before dispatch)
+    PROBE_ENABLED: bool = True
+    PROBE_TIMEOUT_SEC: float = 10.0
+    PROBE_DURATION_TOLERANCE_SEC: int = 2  # Allowed drift between declared and probed duration
+
+    # Outbound requests to user-supplied URLs (video probes, webhooks) refuse
+    # hosts that resolve to private, loopback or link-local addresses. Hosts
+    # listed here skip the check (local development only).
+    OUTBOUND_ALLOWED_HOSTS: List[str] = []
+
+    # QC result cache (videos a team re-submits skip the workflow). Stored by
+    # the callback handlers and read by the worker: with the worker in its
+    # own process (RUN_WORKER_IN_API=false) it only hits with CACHE_BACKEND=redis.
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL_SEC: int = 7 * 24 * 3600
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    QC_WORKFLOW_VERSION: str = "1"  # Bump when the n8n workflow changes to invalidate cached results
+
+    # Job read coalescing: concurrent identical job list/detail reads share one
+    # query, and results are kept this long to absorb dashboard polling bursts
+    # (job state changes invalidate them). 0 disables the micro-cache.
+    JOB_READ_CACHE_TTL_SEC: float = 1.0
+    JOB_READ_CACHE_MAX_ENTRIES: int = 5000
+
+    # Profile cache (GET /v1/profile): per user and per team, dropped on plan
+    # and credit changes. 0 disables it.
+    PROFILE_CACHE_TTL_SEC: float = 300.0
+    PROFILE_CACHE_MAX_ENTRIES: int = 10000
+
+    # Rate limiting (token buckets per user/team, per callback API key, else per IP)
+    # Rules match by method and path prefix (longest first); rate is tokens/sec,
+    # burst is the bucket size. Unmatched routes use RATE_LIMIT_DEFAULT. The
+    # n8n result callbacks are exempt: a rejected result would be lost.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_RULES: List[Dict[str, Any]] = [
+        {"name": "jobs_create", "method": "POST", "path": "/v1/jobs", "rate": 0.2, "burst": 5},
+        {"name": "jobs_read", "method": "GET", "path": "/v1/jobs", "rate": 5, "burst": 20},
+        {"name": "callbacks", "path": "/v1/callbacks/", "rate": 50, "burst": 200},
+    ]
+    RATE_LIMIT_DEFAULT: Dict[str, float] = {"rate": 10, "burst": 40}
+    RATE_LIMIT_EXEMPT_PATHS: List[str] = [
+        "/metrics", "/v1/health", "/docs", "/openapi.json",
+        "/v1/callbacks/n8n/complete", "/v1/callbacks/n8n/failed", "/v1/callbacks/n8n/batch",
+    ]
+    # Proxies (IPs or CIDRs) whose X-Forwarded-For is believed; empty: use the peer address
+    RATE_LIMIT_TRUSTED_PROXIES: List[str] = []
+    RATE_LIMIT_REDIS_URL: Optional[str] = None  # Shared buckets across instances (needs `redis`)
+
+    # Response compression (gzip, or brotli when installed)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # Bytes; smaller responses are sent as is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Caches: 'local' (per process) or 'redis' (shared). With CACHE_REDIS_URL
+    # set, local caches also receive invalidations from other processes.
+    CACHE_BACKEND: str = "local"
+    CACHE_REDIS_URL: Optional[str] = None  # Needs the `redis` package
+    CACHE_INVALIDATION_CHANNEL: str = "qc:cache:invalidate"
+
+    # Segmented dispatch: n8n jobs longer than the threshold run as parallel
+    # time-range segments (the workflow must honour start_sec/end_sec)
+    SEGMENT_ENABLED: bool = False
+    SEGMENT_THRESHOLD_SEC: int = 900
+    SEGMENT_LENGTH_SEC: int = 300
+    SEGMENT_OVERLAP_SEC: int = 5  # Segments start this early so issues at a cut aren't missed
+    SEGMENT_MAX_COUNT: int = 12  # Segments get longer rather than exceed this
+    SEGMENT_DEDUP_WINDOW_SEC: int = 3  # Same issue from neighbouring segments within this is merged
+
+    # Queue ETAs on job reads: processing rate (seconds per second of video)
+    # per qc_mode as an EWMA over completed jobs, plus the job's place in the
+    # FIFO queue. The queue is tracked in process and re-read from the
+    # database by a background task of the API every ETA_RESYNC_SEC (other
+    # API processes and the worker change it too); rates are rebuilt from
+    # history every ETA_HISTORY_REFRESH_SEC.
+    ETA_ENABLED: bool = True
+    ETA_EWMA_ALPHA: float = 0.2  # Weight of the newest completed job
+    ETA_DEFAULT_RATE: float = 0.5  # Seconds of processing per second of video until jobs complete
+    ETA_HISTORY_JOBS: int = 50  # Completed jobs per qc_mode the rates are warmed from
+    ETA_RESYNC_SEC: float = 10.0
+    ETA_HISTORY_REFRESH_SEC: float = 600.0
+
+    # Job progress from n8n: coalesced in memory per job and written in bulk
+    # every PROGRESS_FLUSH_INTERVAL_MS, or right away when it moves by
+    # PROGRESS_FLUSH_DELTA points
+    PROGRESS_FLUSH_INTERVAL_MS: int = 2000
+    PROGRESS_FLUSH_DELTA: int = 20
+
+    # Customer webhooks: job events go through an outbox and are POSTed by the
+    # webhook dispatcher (runs with the job processor), signed with the
+    # subscription's secret and retried with backoff
+    WEBHOOKS_ENABLED: bool = True
+    WEBHOOK_TIMEOUT_SEC: float = 10.0
+    WEBHOOK_MAX_ATTEMPTS: int = 10  # Then the delivery is marked dead
+    WEBHOOK_RETRY_BASE_SEC: float = 15.0  # Doubles per attempt (jittered)
+    WEBHOOK_RETRY_MAX_SEC: float = 3600.0
+    WEBHOOK_ENDPOINT_CONCURRENCY: int = 4  # Requests in flight per endpoint URL
+    WEBHOOK_CLAIM_BATCH: int = 200  # Deliveries claimed per dispatcher pass
+    WEBHOOK_LEASE_SEC: int = 120  # Claimed deliveries are retried after this if the dispatcher dies
+    WEBHOOK_POLL_INTERVAL_SEC: float = 1.0
+    WEBHOOK_SUBSCRIPTION_CACHE_TTL_SEC: float = 30.0
+    WEBHOOK_ALLOW_HTTP: bool = False  # Accept http:// subscription URLs (local development)
+
+    # Cold archive: final jobs older than ARCHIVE_AFTER_DAYS move from qc_jobs to
+    # Iceberg tables (needs pyiceberg[pyarrow,sql-sqlite]). The worker writes
+    # and the API reads them, so jobs are only archived into a shared catalog
+    # (catalog database URI plus object store warehouse such as s3://...), or
+    # a local one with ARCHIVE_ALLOW_LOCAL_CATALOG when both run on one host.
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_AFTER_DAYS: int = 30
+    ARCHIVE_INTERVAL_SEC: float = 3600.0
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_WAREHOUSE_PATH: str = str(BASE_DIR / "archive")  # Local path or object store URI
+    ARCHIVE_CATALOG_URI: Optional[str] = None  # Default: sqlite catalog.db in a local warehouse
+    ARCHIVE_ALLOW_LOCAL_CATALOG: bool = False
+    ARCHIVE_READ_CACHE_TTL_SEC: float = 300.0  # Cached per jobs table snapshot: runs show up at once
+
+    # Lifecycle
+    # False when the worker runs as its own process (python -m app.workers);
+    # the Procfile's web process sets it so the job processor doesn't run twice
+    RUN_WORKER_IN_API: bool = True
+    SHUTDOWN_DRAIN_TIMEOUT_SEC: float = 25.0  # Time to finish in-flight dispatches on shutdown
+    TASK_RESTART_MAX_BACKOFF_SEC: float = 60.0  # Max delay before restarting a crashed background task
+    WORKER_METRICS_PORT: Optional[int] = None  # Prometheus port for the standalone worker
+    WORKER_MAX_PROCESSING_JOBS: int = 2  # Top-level jobs dispatched at once
+
     class Config:
         env_file = BASE_DIR / ".env"
         env_file_encoding = "utf-8"
@@ -38,4 +205,20 @@ class Settings(BaseSettings):
             )
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Load settings once, on first use (usable as a FastAPI dependency).
+    Call get_settings.cache_clear() to reload after changing the environment.
+    """
+    return Settings()
+
+
+class _LazySettings:
+    """Module-level `settings` that defers loading until an attribute is read."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+
+settings = _LazySettings()
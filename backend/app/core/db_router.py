@@ -0,0 +1,177 @@
+"""
+Read Replica Routing
+
+Dashboard reads (job lists and details, profiles, queue depth metrics) can
+go to Supabase read replicas (SUPABASE_READ_REPLICA_URLS) while writes stay
+on the primary (app.core.supabase). Read helpers pick their client with
+db_router.reader(*sessions):
+
+- sessions are the team / user ids a read belongs to. A write to a
+  session's qc_jobs or teams rows (db_router.wrote) pins its reads to the
+  primary for READ_REPLICA_STICKY_SEC, so users read their own writes.
+  The marks live in a cache namespace: per process with CACHE_BACKEND=local,
+  shared with CACHE_BACKEND=redis.
+- each replica's lag comes from replica_lag_seconds(primary LSN), given
+  the primary's current WAL position from primary_wal_lsn() (see
+  migrations/versions/0011_replica_lag_primary_lsn.sql), so a replica that
+  stopped receiving WAL falls behind as soon as the primary writes. It is
+  checked every READ_REPLICA_LAG_CHECK_SEC by whichever read finds it due.
+  Replicas more than READ_REPLICA_MAX_LAG_SEC behind, or whose check
+  failed, get no reads; with none left reads fall back to the primary.
+- the remaining replicas take reads in turn.
+
+A replica in use can be up to READ_REPLICA_MAX_LAG_SEC +
+READ_REPLICA_LAG_CHECK_SEC behind (it may fall behind right after a
+check), so READ_REPLICA_STICKY_SEC must stay above that sum.
+"""
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+from urllib.parse import urlsplit
+from app.core.cache import CacheBackend, cache_key, create_cache
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import DB_READS
+from app.core.supabase import get_supabase
+from app.core import tracing
+
+logger = get_logger(__name__)
+
+
+def _create_replica_client(url: str):
+    from supabase import create_client, ClientOptions
+
+    client = create_client(
+        url,
+        settings.SUPABASE_SERVICE_KEY,
+        options=ClientOptions(postgrest_client_timeout=30)
+    )
+    tracing.instrument_httpx_client(client.postgrest.session, "supabase-replica")
+    return client
+
+
+@dataclass
+class Replica:
+    name: str
+    client: Any
+    lag_sec: Optional[float] = None  # None: not checked yet, or the check failed
+
+
+class DbRouter:
+    """Chooses the client of each read (see module docstring)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._replicas: Optional[List[Replica]] = None
+        self._turn = itertools.count()
+        self._checked_at: Optional[float] = None
+        self._sessions: Optional[CacheBackend] = None
+
+    def _get_replicas(self) -> List[Replica]:
+        if self._replicas is None:
+            with self._lock:
+                if self._replicas is None:
+                    urls = settings.SUPABASE_READ_REPLICA_URLS
+                    self._replicas = [
+                        Replica(urlsplit(url).hostname or f"replica-{i}", _create_replica_client(url))
+                        for i, url in enumerate(urls)
+                    ]
+        return self._replicas
+
+    def set_replica_clients(self, clients: Optional[List[Any]]) -> None:
+        """Use `clients` as the replicas (tests, benchmarks); None resets to the settings."""
+        with self._lock:
+            self._replicas = None if clients is None else [
+                Replica(f"replica-{i}", client) for i, client in enumerate(clients)
+            ]
+            self._checked_at = None
+            self._sessions = None
+
+    def _get_sessions(self) -> CacheBackend:
+        if self._sessions is None:
+            self._sessions = create_cache(
+                "db_sessions", maxsize=100000, ttl=settings.READ_REPLICA_STICKY_SEC
+            )
+        return self._sessions
+
+    # ---- read-your-writes -------------------------------------------------
+
+    def wrote(self, *sessions: Optional[str]) -> None:
+        """Pin the sessions' reads to the primary for READ_REPLICA_STICKY_SEC."""
+        if not self._get_replicas() or settings.READ_REPLICA_STICKY_SEC <= 0:
+            return
+        cache = self._get_sessions()
+        for session in sessions:
+            if session:
+                cache.set(cache_key("wrote", str(session)), 1)
+
+    def sticky(self, *sessions: Optional[str]) -> bool:
+        """Whether any of the sessions wrote within READ_REPLICA_STICKY_SEC."""
+        if not self._get_replicas() or settings.READ_REPLICA_STICKY_SEC <= 0:
+            return False
+        cache = self._get_sessions()
+        return any(session and cache.get(cache_key("wrote", str(session))) for session in sessions)
+
+    # ---- routing ----------------------------------------------------------
+
+    def reader(self, *sessions: Optional[str]):
+        """The client for a read on behalf of `sessions` (a replica or the primary)."""
+        replicas = self._get_replicas()
+        if not replicas:
+            return get_supabase()
+        if self.sticky(*sessions):
+            DB_READS.labels(route="sticky").inc()
+            return get_supabase()
+
+        self._maybe_check_lag()
+        max_lag = settings.READ_REPLICA_MAX_LAG_SEC
+        usable = [r for r in replicas if r.lag_sec is not None and r.lag_sec <= max_lag]
+        if not usable:
+            DB_READS.labels(route="lagging").inc()
+            return get_supabase()
+        DB_READS.labels(route="replica").inc()
+        return usable[next(self._turn) % len(usable)].client
+
+    def _maybe_check_lag(self) -> None:
+        interval = settings.READ_REPLICA_LAG_CHECK_SEC
+        if self._checked_at is not None and time.monotonic() - self._checked_at < interval:
+            return
+        # One read checks; concurrent ones use the last known lag
+        if not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self.check_lag()
+        finally:
+            self._check_lock.release()
+
+    def check_lag(self) -> None:
+        """Refresh every replica's lag (unknown for all if the primary can't be asked)."""
+        try:
+            primary_lsn = get_supabase().rpc("primary_wal_lsn", {}).execute().data
+        except Exception as e:
+            logger.warning("Could not read the primary WAL position: %s", type(e).__name__)
+            primary_lsn = None
+        for replica in self._get_replicas():
+            if primary_lsn is None:
+                replica.lag_sec = None
+                continue
+            try:
+                lag = replica.client.rpc("replica_lag_seconds", {"p_primary_lsn": primary_lsn}).execute().data
+                # None: behind, and it never replayed a transaction
+                replica.lag_sec = None if lag is None else float(lag)
+            except Exception as e:
+                if replica.lag_sec is not None:
+                    logger.warning("Read replica %s is unavailable: %s", replica.name, type(e).__name__)
+                replica.lag_sec = None
+        self._checked_at = time.monotonic()
+
+    def snapshot(self) -> List[dict]:
+        """Replicas and their last known lag (for the health endpoint)."""
+        return [{"name": r.name, "lag_sec": r.lag_sec} for r in self._get_replicas()]
+
+
+db_router = DbRouter()
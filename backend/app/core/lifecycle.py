@@ -0,0 +1,126 @@
+"""
+Application Lifecycle
+
+TaskSupervisor owns the long-running background tasks (job processor,
+n8n health checks):
+- crashed tasks are restarted with exponential backoff
+- stop() sets a stop event so cooperative loops finish their current
+  dispatch, waits up to a drain deadline, then cancels what is left
+
+Used by the API lifespan (app.main) and the standalone worker process
+(python -m app.workers).
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class SupervisedTask:
+    name: str
+    factory: Callable[[], Awaitable[None]]
+    restart: bool = True
+    task: Optional[asyncio.Task] = None
+    restarts: int = 0
+    last_error: Optional[str] = None
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class TaskSupervisor:
+    """Starts, restarts and drains background tasks."""
+
+    def __init__(self, initial_backoff: float = 1.0, max_backoff: float = 60.0, stable_after: float = 60.0):
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        # A task that ran this long before crashing starts over at initial_backoff
+        self.stable_after = stable_after
+        self.stop_event = asyncio.Event()
+        self._tasks: Dict[str, SupervisedTask] = {}
+
+    def start(self, name: str, factory: Callable[[], Awaitable[None]], restart: bool = True) -> None:
+        """
+        Run factory() as a supervised task.
+
+        Args:
+            name: unique task name (logs, status)
+            factory: called to (re)create the coroutine
+            restart: restart the task if it raises
+        """
+        if name in self._tasks:
+            raise ValueError(f"Task {name} is already supervised")
+        supervised = SupervisedTask(name, factory, restart)
+        supervised.task = asyncio.create_task(self._supervise(supervised), name=name)
+        self._tasks[name] = supervised
+
+    async def _supervise(self, supervised: SupervisedTask) -> None:
+        backoff = self.initial_backoff
+        while not self.stop_event.is_set():
+            supervised.started_at = time.monotonic()
+            try:
+                await supervised.factory()
+                return  # Finished on its own (e.g. stop requested)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                supervised.last_error = f"{type(e).__name__}: {e}"[:500]
+                if not supervised.restart:
+                    logger.exception("Task %s crashed", supervised.name)
+                    return
+                if time.monotonic() - supervised.started_at >= self.stable_after:
+                    backoff = self.initial_backoff
+                logger.exception("Task %s crashed, restarting in %.1fs", supervised.name, backoff)
+
+            supervised.restarts += 1
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), timeout=backoff)
+                return
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def stop(self, timeout: float) -> None:
+        """Ask tasks to finish, wait up to `timeout` seconds, then cancel the rest."""
+        self.stop_event.set()
+        tasks = [s.task for s in self._tasks.values() if s.task and not s.task.done()]
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            logger.warning("Task %s did not drain in %.0fs, cancelling", task.get_name(), timeout)
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def snapshot(self) -> List[dict]:
+        """State of every supervised task (for the health endpoint)."""
+        return [
+            {
+                "name": s.name,
+                "running": bool(s.task and not s.task.done()),
+                "restarts": s.restarts,
+                "last_error": s.last_error,
+            }
+            for s in self._tasks.values()
+        ]
+
+
+async def wait_or_stop(stop_event: Optional[asyncio.Event], seconds: float) -> bool:
+    """
+    Sleep for `seconds`, waking early if stop_event is set.
+
+    Returns:
+        True if a stop was requested
+    """
+    if stop_event is None:
+        await asyncio.sleep(seconds)
+        return False
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout=seconds)
+        return True
+    except asyncio.TimeoutError:
+        return False
@@ -0,0 +1,183 @@
+"""
+Structured Logging
+
+JSON log lines written off the event loop:
+- loggers put records on a queue (QueueHandler); a background thread
+  (QueueListener) formats and writes them to stdout
+- per-module levels via settings.LOG_LEVEL / settings.LOG_LEVELS
+- correlation ids (request_id, job_id) carried in contextvars
+- secrets are redacted and long values (base64 thumbnails, payloads) truncated
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+job_id_var: ContextVar[Optional[str]] = ContextVar("job_id", default=None)
+
+REDACTED_KEYS = {"x-api-key", "authorization", "api_key", "apikey", "secret", "password", "token"}
+# Chatty third-party loggers (httpx logs every Supabase query at INFO)
+DEFAULT_LEVELS = {"httpx": "WARNING", "httpcore": "WARNING", "hpack": "WARNING"}
+
+MAX_STRING_LENGTH = 256
+MAX_COLLECTION_ITEMS = 20
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def redact(value: Any, depth: int = 0) -> Any:
+    """Return a log-safe copy of value: secrets masked, big values truncated."""
+    if depth > 4:
+        return "..."
+    if isinstance(value, dict):
+        items = list(value.items())
+        result = {
+            str(k): "***" if str(k).lower() in REDACTED_KEYS else redact(v, depth + 1)
+            for k, v in items[:MAX_COLLECTION_ITEMS]
+        }
+        if len(items) > MAX_COLLECTION_ITEMS:
+            result["..."] = f"{len(items) - MAX_COLLECTION_ITEMS} more keys"
+        return result
+    if isinstance(value, (list, tuple)):
+        result = [redact(v, depth + 1) for v in value[:MAX_COLLECTION_ITEMS]]
+        if len(value) > MAX_COLLECTION_ITEMS:
+            result.append(f"... {len(value) - MAX_COLLECTION_ITEMS} more items")
+        return result
+    if isinstance(value, str):
+        if value.startswith("data:"):
+            return f"<data-uri {len(value)} chars>"
+        if len(value) > MAX_STRING_LENGTH:
+            return f"{value[:MAX_STRING_LENGTH]}...<{len(value)} chars>"
+        return value
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return redact(str(value), depth + 1)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with correlation ids and redacted extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = redact(value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the current request_id/job_id on records in the calling task."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            request_id = request_id_var.get()
+            if request_id:
+                record.request_id = request_id
+        if not hasattr(record, "job_id"):
+            job_id = job_id_var.get()
+            if job_id:
+                record.job_id = job_id
+        return True
+
+
+def setup_logging(level: str = "INFO", levels: Optional[dict] = None) -> None:
+    """
+    Install the queue-based JSON handler on the root logger (idempotent).
+
+    Args:
+        level: default level for everything
+        levels: per-logger overrides, e.g. {"app.workers": "DEBUG"}
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+    for name, module_level in {**DEFAULT_LEVELS, **(levels or {})}.items():
+        logging.getLogger(name).setLevel(str(module_level).upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+@contextmanager
+def bind_job(job_id: Optional[str]):
+    """Attach job_id to every log record emitted inside the block."""
+    token = job_id_var.set(str(job_id) if job_id else None)
+    try:
+        yield
+    finally:
+        job_id_var.reset(token)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware that assigns a request id (from X-Request-ID or a new
+    uuid4) to every request, exposes it to loggers and echoes it back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).append((b"x-request-id", request_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,170 @@
+"""
+Prometheus Metrics
+
+Process-wide metrics for the API, the Supabase helpers, the dispatcher and
+the worker, exposed in the Prometheus text format at GET /metrics.
+
+Recording is a lock + a couple of float additions per observation, so it is
+cheap enough to leave on in production.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+from prometheus_client import Counter, Gauge, Histogram
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Latency buckets tuned for API/DB calls (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# End-to-end job durations range from seconds to hours
+JOB_DURATION_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400)
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+SUPABASE_QUERY_DURATION = Histogram(
+    "supabase_query_duration_seconds",
+    "Supabase query latency by helper (including retries)",
+    ["helper"],
+    buckets=LATENCY_BUCKETS,
+)
+SUPABASE_RETRIES = Counter(
+    "supabase_retries_total",
+    "Transient Supabase errors retried by with_retry",
+    ["helper"],
+)
+N8N_DISPATCH_DURATION = Histogram(
+    "n8n_dispatch_duration_seconds",
+    "Latency of a single n8n webhook call",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+N8N_DISPATCHES = Counter(
+    "n8n_dispatch_total",
+    "n8n webhook calls by outcome",
+    ["outcome"],
+)
+QUEUE_DEPTH = Gauge(
+    "qc_queue_depth",
+    "Number of QC jobs by status",
+    ["status"],
+)
+JOB_DURATION = Histogram(
+    "qc_job_duration_seconds",
+    "Job end-to-end duration (created to completed/failed) by qc_mode",
+    ["qc_mode", "status"],
+    buckets=JOB_DURATION_BUCKETS,
+)
+RESULT_CACHE_LOOKUPS = Counter(
+    "qc_result_cache_lookups_total",
+    "QC result cache lookups by result",
+    ["result"],
+)
+RATE_LIMITED = Counter(
+    "http_rate_limited_total",
+    "Requests rejected by the rate limiter by rule",
+    ["rule"],
+)
+CREDIT_LEDGER_ENTRIES = Counter(
+    "credit_ledger_entries_total",
+    "Credit ledger operations by kind and result (applied, rejected, noop)",
+    ["kind", "result"],
+)
+DB_READS = Counter(
+    "supabase_routed_reads_total",
+    "Reads routed by the replica router (replica, sticky or lagging: primary)",
+    ["route"],
+)
+WEBHOOK_DELIVERIES = Counter(
+    "qc_webhook_deliveries_total",
+    "Customer webhook events by delivery result (delivered, retried, dead)",
+    ["result"],
+)
+
+
+def observe_job_finished(job: dict, final_status: str) -> None:
+    """Record a job's end-to-end duration from its created_at timestamp."""
+    created_at = job.get("created_at")
+    if not created_at:
+        return
+    try:
+        created = datetime.fromisoformat(str(created_at).replace("Z", "+00:00"))
+    except ValueError:
+        return
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    elapsed = (datetime.now(timezone.utc) - created).total_seconds()
+    JOB_DURATION.labels(qc_mode=job.get("qc_mode") or "unknown", status=final_status).observe(max(elapsed, 0.0))
+
+
+class QueueDepthCollector:
+    """Refreshes the qc_queue_depth gauge at most every `min_interval` seconds."""
+
+    STATUSES = ("pending", "processing")
+
+    def __init__(self, count_fn: Callable[[str], Optional[int]], min_interval: float = 10.0):
+        self._count_fn = count_fn
+        self._min_interval = min_interval
+        self._last_refresh = 0.0
+
+    def refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._last_refresh < self._min_interval:
+            return
+        self._last_refresh = now
+        for status in self.STATUSES:
+            try:
+                QUEUE_DEPTH.labels(status=status).set(self._count_fn(status) or 0)
+            except Exception as e:
+                logger.warning("Queue depth refresh failed for %s: %s", status, e)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template.
+
+    Uses the matched endpoint (set in the scope by the router) to label by
+    template ("/v1/jobs/{job_id}") instead of the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[Callable, str]] = None
+
+    def _route_for(self, scope) -> str:
+        if self._route_paths is None:
+            routes = getattr(scope.get("app"), "routes", [])
+            self._route_paths = {
+                route.endpoint: route.path for route in routes if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=self._route_for(scope),
+                status=str(status_code),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,69 @@
+"""
+Outbound URL checks
+
+The server fetches URLs that users supply (video probes, customer webhooks).
+Before each request, and again on every redirect hop, the host is resolved
+and the request is refused when any address it resolves to is not public:
+private, loopback, link-local (cloud metadata), shared, reserved or
+multicast ranges, IPv4-mapped IPv6 included.
+
+Hosts in OUTBOUND_ALLOWED_HOSTS skip the check (local development).
+"""
+
+import asyncio
+import ipaddress
+import socket
+from typing import List
+from urllib.parse import urlsplit
+from app.core.config import settings
+
+
+class UnsafeURL(ValueError):
+    """The URL is malformed or points at a non-public address."""
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])  # Drop an IPv6 zone id
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _split(url: str):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeURL(f"Unsupported URL: {url}")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return parts.hostname, port
+
+
+def _check_addresses(host: str, addresses: List[str]) -> None:
+    if not addresses:
+        raise UnsafeURL(f"Host {host} does not resolve")
+    blocked = [a for a in addresses if not _is_public(a)]
+    if blocked:
+        raise UnsafeURL(f"Host {host} resolves to a non-public address ({blocked[0]})")
+
+
+def check_url(url: str) -> None:
+    """Raise UnsafeURL unless every address of the URL's host is public (blocking DNS)."""
+    host, port = _split(url)
+    if host in settings.OUTBOUND_ALLOWED_HOSTS:
+        return
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise UnsafeURL(f"Host {host} does not resolve")
+    _check_addresses(host, [info[4][0] for info in infos])
+
+
+async def check_url_async(url: str) -> None:
+    """check_url without blocking the event loop."""
+    host, port = _split(url)
+    if host in settings.OUTBOUND_ALLOWED_HOSTS:
+        return
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise UnsafeURL(f"Host {host} does not resolve")
+    _check_addresses(host, [info[4][0] for info in infos])
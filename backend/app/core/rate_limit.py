@@ -0,0 +1,335 @@
+"""
+Rate Limiting
+
+Token-bucket limiter in front of the API, so one polling tab or script
+cannot use up the Supabase connection budget for everyone.
+
+- Buckets are keyed by the caller: the team (when the JWT carries
+  app_metadata.team_id) or user (JWT sub), n8n (a matching N8N_API_KEY),
+  and the client IP otherwise. X-Forwarded-For is only read when the
+  connection comes from RATE_LIMIT_TRUSTED_PROXIES.
+- Each route rule (settings.RATE_LIMIT_RULES) has its own budget
+- Buckets live in process memory, or in Redis when RATE_LIMIT_REDIS_URL is
+  set so several API instances share them
+- Responses carry RateLimit-Limit/-Remaining/-Reset; 429s add Retry-After
+
+A JWT picks the bucket only once its signature checks out against
+SUPABASE_JWT_SECRET; without the secret, or with a token that fails, the
+caller is keyed by IP, so minting tokens doesn't buy fresh buckets. The
+same goes for X-API-Key: any key other than N8N_API_KEY is ignored.
+"""
+
+import hmac
+import ipaddress
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Protocol, Sequence, Tuple, Union
+
+import jwt
+from cachetools import TTLCache
+
+from app.core.logger import get_logger
+from app.core.metrics import RATE_LIMITED
+
+logger = get_logger(__name__)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    rate: float  # Tokens added per second
+    burst: int  # Bucket capacity
+    method: Optional[str] = None  # None matches every method
+    path: str = "/"
+
+    def matches(self, method: str, path: str) -> bool:
+        return (self.method is None or self.method == method) and path.startswith(self.path)
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # Seconds until the bucket is full again
+    retry_after: float = 0.0  # Seconds until the next request would be allowed
+
+
+class RateLimitStore(Protocol):
+    """Backing store for token buckets."""
+
+    async def consume(self, key: str, rule: Rule, cost: float = 1.0) -> Decision:
+        ...
+
+    async def close(self) -> None:
+        ...
+
+
+def _decide(tokens: float, allowed: bool, rule: Rule, cost: float) -> Decision:
+    return Decision(
+        allowed=allowed,
+        limit=rule.burst,
+        remaining=max(0, int(tokens)),
+        reset_after=(rule.burst - tokens) / rule.rate,
+        retry_after=0.0 if allowed else (cost - tokens) / rule.rate,
+    )
+
+
+class MemoryStore:
+    """Per-process buckets; idle buckets expire once they would be full again."""
+
+    def __init__(self, max_keys: int = 100_000, ttl: float = 3600):
+        self._buckets: TTLCache = TTLCache(maxsize=max_keys, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def consume_sync(self, key: str, rule: Rule, cost: float = 1.0) -> Decision:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (rule.burst, now))
+            tokens = min(rule.burst, tokens + (now - updated) * rule.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return _decide(tokens, allowed, rule, cost)
+
+    async def consume(self, key: str, rule: Rule, cost: float = 1.0) -> Decision:
+        return self.consume_sync(key, rule, cost)
+
+    async def close(self) -> None:
+        self._buckets.clear()
+
+
+# Refill + take in one round trip, using the Redis clock so instances agree
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStore:
+    """
+    Buckets shared by every API instance. If Redis is unreachable requests
+    are let through (fail open) rather than taking the API down with it.
+    """
+
+    def __init__(self, url: str, prefix: str = "qc:ratelimit:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the `redis` package is not installed") from e
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+        self._prefix = prefix
+        self._last_error_log = 0.0
+
+    async def consume(self, key: str, rule: Rule, cost: float = 1.0) -> Decision:
+        try:
+            allowed, tokens = await self._script(keys=[self._prefix + key], args=[rule.rate, rule.burst, cost])
+        except Exception as e:
+            now = time.monotonic()
+            if now - self._last_error_log > 60:
+                self._last_error_log = now
+                logger.warning("Rate limit store unavailable, allowing requests: %s", e)
+            return Decision(True, rule.burst, rule.burst, 0.0)
+        return _decide(float(tokens), bool(allowed), rule, cost)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+# ============================================
+# Caller identity
+# ============================================
+
+@lru_cache(maxsize=8192)
+def _principal_for_token(token: str, secret: str) -> Optional[str]:
+    try:
+        # Audience is left to get_current_user; expiry and signature are checked
+        claims = jwt.decode(token, secret, algorithms=["HS256"], options={"verify_aud": False})
+    except jwt.PyJWTError:
+        return None
+    team_id = (claims.get("app_metadata") or {}).get("team_id")
+    if team_id:
+        return f"team:{team_id}"
+    return f"user:{claims['sub']}" if claims.get("sub") else None
+
+
+def _is_trusted(address: str, trusted_proxies: Sequence[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def _client_ip(scope, forwarded_for: Optional[str], trusted_proxies: Sequence[Network]) -> str:
+    client = scope.get("client")
+    ip = client[0] if client else None
+    if forwarded_for and ip and _is_trusted(ip, trusted_proxies):
+        # Walk back past our own proxies; the first other hop is the client
+        for hop in reversed(forwarded_for.split(",")):
+            ip = hop.strip()
+            if not _is_trusted(ip, trusted_proxies):
+                break
+    return ip or "unknown"
+
+
+def principal_for(scope, jwt_secret: Optional[str] = None,
+                  trusted_proxies: Sequence[Network] = (), n8n_api_key: Optional[str] = None) -> str:
+    """Bucket owner for a request: team/user (verified JWT), n8n (its API key), or client IP."""
+    authorization = api_key = forwarded_for = None
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            authorization = value.decode("latin-1")
+        elif name == b"x-api-key":
+            api_key = value.decode("latin-1")
+        elif name == b"x-forwarded-for":
+            forwarded_for = value.decode("latin-1")
+
+    if jwt_secret and authorization and authorization[:7].lower() == "bearer ":
+        principal = _principal_for_token(authorization[7:].strip(), jwt_secret)
+        if principal:
+            return principal
+    if n8n_api_key and api_key and hmac.compare_digest(api_key.encode(), n8n_api_key.encode()):
+        return "key:n8n"
+    return "ip:" + _client_ip(scope, forwarded_for, trusted_proxies)
+
+
+# ============================================
+# Middleware
+# ============================================
+
+class RateLimiter:
+    """Matches a request to its rule and takes a token from its bucket."""
+
+    def __init__(self, rules: List[Rule], default: Rule, store: RateLimitStore, exempt_paths: Tuple[str, ...] = (),
+                 jwt_secret: Optional[str] = None, trusted_proxies: Sequence[str] = (),
+                 n8n_api_key: Optional[str] = None):
+        # Longest path first so "/v1/jobs/" wins over "/v1/"
+        self.rules = sorted(rules, key=lambda r: (len(r.path), r.method is not None), reverse=True)
+        self.default = default
+        self.store = store
+        self.exempt_paths = tuple(exempt_paths)
+        self.jwt_secret = jwt_secret
+        self.trusted_proxies = tuple(ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies)
+        self.n8n_api_key = n8n_api_key
+
+    @classmethod
+    def from_settings(cls, settings) -> "RateLimiter":
+        rules = [
+            Rule(
+                name=config.get("name") or f"{config.get('method', '*')} {config['path']}",
+                rate=float(config["rate"]),
+                burst=int(config["burst"]),
+                method=(config.get("method") or "").upper() or None,
+                path=config["path"],
+            )
+            for config in settings.RATE_LIMIT_RULES
+        ]
+        default = Rule(
+            name="default",
+            rate=float(settings.RATE_LIMIT_DEFAULT["rate"]),
+            burst=int(settings.RATE_LIMIT_DEFAULT["burst"]),
+        )
+        store = RedisStore(settings.RATE_LIMIT_REDIS_URL) if settings.RATE_LIMIT_REDIS_URL else MemoryStore()
+        return cls(
+            rules, default, store, tuple(settings.RATE_LIMIT_EXEMPT_PATHS),
+            jwt_secret=settings.SUPABASE_JWT_SECRET,
+            trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
+            n8n_api_key=settings.N8N_API_KEY,
+        )
+
+    def rule_for(self, method: str, path: str) -> Optional[Rule]:
+        if path.startswith(self.exempt_paths):
+            return None
+        for rule in self.rules:
+            if rule.matches(method, path):
+                return rule
+        return self.default
+
+    async def check(self, scope) -> Optional[Tuple[Rule, Decision]]:
+        """Rule and decision for a request, or None if it is exempt."""
+        rule = self.rule_for(scope["method"], scope["path"])
+        if rule is None:
+            return None
+        principal = principal_for(scope, self.jwt_secret, self.trusted_proxies, self.n8n_api_key)
+        decision = await self.store.consume(f"{rule.name}:{principal}", rule)
+        return rule, decision
+
+
+def _headers(decision: Decision) -> List[Tuple[bytes, bytes]]:
+    headers = [
+        (b"ratelimit-limit", str(decision.limit).encode()),
+        (b"ratelimit-remaining", str(decision.remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(decision.reset_after)).encode()),
+    ]
+    if not decision.allowed:
+        headers.append((b"retry-after", str(max(1, math.ceil(decision.retry_after))).encode()))
+    return headers
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a RateLimiter to every HTTP request."""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        result = await self.limiter.check(scope)
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        rule, decision = result
+        if not decision.allowed:
+            RATE_LIMITED.labels(rule=rule.name).inc()
+            body = json.dumps({
+                "detail": f"Rate limit exceeded. Retry in {max(1, math.ceil(decision.retry_after))}s."
+            }).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    *_headers(decision),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        headers = _headers(decision)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).extend(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
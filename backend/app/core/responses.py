@@ -0,0 +1,167 @@
+"""
+Responses
+
+- FastJSONResponse: serializes plain dicts/lists (e.g. Supabase rows)
+  with orjson when installed, skipping FastAPI's jsonable_encoder pass.
+  Routes return it directly to get that benefit.
+- CompressionMiddleware: gzip or brotli (when the `brotli` package is
+  installed), negotiated from Accept-Encoding, for complete responses
+  above a size threshold. Streaming responses are passed through.
+"""
+
+import gzip
+import json
+from typing import Any, List, Optional, Tuple
+
+import anyio
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib fallback
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON-encode plain data; UUIDs and datetimes become strings."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse for data that is already JSON-shaped (no jsonable_encoder)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ============================================
+# Compression
+# ============================================
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"application/xml")
+# Bigger bodies are compressed in a worker thread to keep the event loop free
+THREAD_THRESHOLD = 256 * 1024
+
+
+def _accepted_encodings(header: str) -> dict:
+    """Parse Accept-Encoding into {encoding: q}."""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str]) -> Optional[str]:
+    """Preferred supported encoding for an Accept-Encoding header ('br', 'gzip' or None)."""
+    if not header:
+        return None
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing complete responses of at least
+    `minimum_size` bytes whose content type is textual.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = None
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers: List[Tuple[bytes, bytes]] = list(start_message.get("headers", []))
+            if message.get("more_body") or not self._should_compress(headers, body):
+                # Streaming or not worth it: send as is
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_THRESHOLD:
+                compressed = await anyio.to_thread.run_sync(self.compress, body, encoding)
+            else:
+                compressed = self.compress(body, encoding)
+
+            headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(self, headers: List[Tuple[bytes, bytes]], body: bytes) -> bool:
+        if len(body) < self.minimum_size:
+            return False
+        content_type = b""
+        for name, value in headers:
+            name = name.lower()
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
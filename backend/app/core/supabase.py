@@ -1,10 +1,15 @@
 import time
 import functools
-from typing import TypeVar, Callable
-from supabase import create_client, ClientOptions
-from app.core.config import settings
+import threading
+from typing import Any, TypeVar, Callable
+from app.core.config import get_settings
+from app.core.metrics import SUPABASE_QUERY_DURATION, SUPABASE_RETRIES
+from app.core.logger import get_logger
+from app.core import tracing
 import httpx
 
+logger = get_logger(__name__)
+
 T = TypeVar('T')
 
 
@@ -12,10 +17,18 @@ def with_retry(max_retries: int = 3, base_delay: float = 0.5):
     """
     Retry decorator for transient Supabase/network errors.
     Uses exponential backoff: 0.5s, 1s, 2s
+    Records per-helper latency and retry counts in the metrics registry.
     """
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        latency = SUPABASE_QUERY_DURATION.labels(helper=func.__name__)
+        retries = SUPABASE_RETRIES.labels(helper=func.__name__)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> T:
+            with latency.time(), tracing.span(f"db.{func.__name__}"):
+                return _call(*args, **kwargs)
+
+        def _call(*args, **kwargs) -> T:
             last_exception = None
             for attempt in range(max_retries):
                 try:
@@ -23,18 +36,57 @@ def with_retry(max_retries: int = 3, base_delay: float = 0.5):
                 except (httpx.ReadError, httpx.ConnectError, httpx.TimeoutException) as e:
                     last_exception = e
                     if attempt < max_retries - 1:
+                        retries.inc()
                         delay = base_delay * (2 ** attempt)
-                        print(f"[supabase] Retry {attempt + 1}/{max_retries} after {delay}s: {type(e).__name__}")
+                        logger.warning("Retry %d/%d of %s after %ss: %s", attempt + 1, max_retries, func.__name__, delay, type(e).__name__)
                         time.sleep(delay)
             raise last_exception
         return wrapper
     return decorator
 
 
-supabase = create_client(
-    settings.SUPABASE_URL,
-    settings.SUPABASE_SERVICE_KEY,
-    options=ClientOptions(
-        postgrest_client_timeout=30,  # Increased from 20
-    )
-)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_supabase():
+    """
+    The shared Supabase client, created on first use (usable as a FastAPI
+    dependency). Importing the supabase package is the slowest part of
+    startup, so it only happens here.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client, ClientOptions
+
+                settings = get_settings()
+                client = create_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_SERVICE_KEY,
+                    options=ClientOptions(
+                        postgrest_client_timeout=30,  # Increased from 20
+                    )
+                )
+                # One span per Supabase HTTP call (covers helpers and raw table calls)
+                tracing.instrument_httpx_client(client.postgrest.session, "supabase")
+                _client = client
+    return _client
+
+
+def set_supabase_client(client) -> None:
+    """Use `client` instead of building one (tests, benchmarks); None resets."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+class _SupabaseProxy:
+    """Module-level `supabase` that resolves the client on attribute access."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_supabase(), name)
+
+
+supabase = _SupabaseProxy()
@@ -0,0 +1,348 @@
+"""
+Job Tracing
+
+Lightweight trace context propagation for a job's whole life:
+create_job -> worker claim -> n8n dispatch -> n8n -> callbacks.
+
+- A new trace id is generated at job creation and stored on the qc_jobs
+  row; a traceparent the client sent is only recorded as a link
+- It travels to n8n as a W3C `traceparent` header and `trace_id` payload
+  field, and comes back on the /callbacks/n8n/* requests
+- Spans cover each Supabase HTTP call, the with_retry helpers and the n8n
+  dispatch; they are buffered per request/job and written as JSON lines
+  to settings.TRACE_EXPORT_PATH, rotated at TRACE_EXPORT_MAX_BYTES
+- Only traces that belong to a job (or are sampled by TRACE_SAMPLE_RATE,
+  traceparent or not) are exported, so dashboard polling stays cheap and
+  clients can't force exports
+- The timeline endpoint reads the last TRACE_BUFFER_TRACES traces from
+  memory; the export file is for offline analysis
+"""
+
+import json
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class TraceContext:
+    """Spans collected for one unit of work (a request or a worker dispatch)."""
+
+    def __init__(self, trace_id: Optional[str] = None, parent_id: Optional[str] = None, keep: bool = False):
+        self.trace_id = trace_id or new_trace_id()
+        self.remote_parent_id = parent_id
+        self.links: List[dict] = []  # Traces this one was started from (see new_job_trace)
+        self.keep = keep
+        self.spans: List[dict] = []
+        self.closed = False
+
+
+class Span:
+    def __init__(self, ctx: TraceContext, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.ctx = ctx
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent  # None: the trace's root (child of the remote parent, if any)
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.status = "ok"
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def end(self) -> None:
+        record = {
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else self.ctx.remote_parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((time.perf_counter() - self._start_perf) * 1000, 3),
+            "status": self.status,
+            "attrs": self.attrs,
+        }
+        if self.parent is None and self.ctx.links:
+            record["links"] = self.ctx.links
+        if self.ctx.closed:
+            # Outlived its request (e.g. background task): export on its own
+            if self.ctx.keep:
+                _export(self.ctx.trace_id, [record])
+        else:
+            self.ctx.spans.append(record)
+
+
+_context: ContextVar[Optional[TraceContext]] = ContextVar("trace_context", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def current_trace_id() -> Optional[str]:
+    ctx = _context.get()
+    return ctx.trace_id if ctx else None
+
+
+def traceparent() -> Optional[str]:
+    """W3C traceparent header value for the current span, if tracing."""
+    ctx = _context.get()
+    if ctx is None:
+        return None
+    span = _current_span.get()
+    span_id = span.span_id if span else secrets.token_hex(8)
+    return f"00-{ctx.trace_id}-{span_id}-01"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Parse a traceparent header into (trace_id, parent_span_id)."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def join_trace(trace_id: Optional[str]) -> Optional[str]:
+    """
+    Attach the current unit of work to a job's trace and mark it for export.
+
+    Spans already buffered are re-stamped with the job's trace id, so a
+    callback can join the trace after it has looked up the job row.
+    Without a trace_id, the current trace is kept as is and returned.
+    """
+    ctx = _context.get()
+    if ctx is None:
+        return trace_id
+    if trace_id:
+        ctx.trace_id = trace_id
+    ctx.keep = True
+    return ctx.trace_id
+
+
+def new_job_trace() -> str:
+    """
+    Start a new trace for a job being created and mark it for export. The
+    current unit of work moves to it; a trace the caller continued from a
+    client's traceparent is kept only as a link, so clients can't pick
+    the trace ids of their jobs.
+    """
+    trace_id = new_trace_id()
+    ctx = _context.get()
+    if ctx is None:
+        return trace_id
+    if ctx.remote_parent_id:
+        ctx.links.append({"trace_id": ctx.trace_id, "span_id": ctx.remote_parent_id})
+        ctx.remote_parent_id = None
+    ctx.trace_id = trace_id
+    ctx.keep = True
+    return trace_id
+
+
+@contextmanager
+def use_trace(trace_id: Optional[str], name: str, parent_id: Optional[str] = None, keep: bool = True, **attrs):
+    """Run a block as the root span of a (possibly existing) trace."""
+    ctx = TraceContext(trace_id, parent_id, keep=keep)
+    ctx_token = _context.set(ctx)
+    try:
+        with span(name, **attrs) as root:
+            yield root
+    finally:
+        _context.reset(ctx_token)
+        ctx.closed = True
+        if ctx.keep and ctx.spans:
+            _export(ctx.trace_id, ctx.spans)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a child span of the current span (no-op outside a trace)."""
+    ctx = _context.get()
+    if ctx is None:
+        yield None
+        return
+
+    current = Span(ctx, name, _current_span.get(), attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attrs["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def start_span(name: str, **attrs) -> Optional[Span]:
+    """Start a span without making it current (for callback-style hooks)."""
+    ctx = _context.get()
+    if ctx is None:
+        return None
+    return Span(ctx, name, _current_span.get(), attrs)
+
+
+# ============================================
+# Export
+# ============================================
+
+class JsonlSpanExporter:
+    """
+    Appends spans as JSON lines from a background thread and keeps the most
+    recent traces in memory for the timeline endpoint. Past max_bytes the
+    file is rotated like logging's RotatingFileHandler (path.1 is the
+    newest of `backups` old files).
+    """
+
+    def __init__(self, path: str, max_traces: int, max_bytes: int = 0, backups: int = 0):
+        self.path = path
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._recent: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, trace_id: str, spans: List[dict]) -> None:
+        records = [{"trace_id": trace_id, **record} for record in spans]
+        with self._lock:
+            self._recent.setdefault(trace_id, []).extend(records)
+            self._recent.move_to_end(trace_id)
+            while len(self._recent) > self.max_traces:
+                self._recent.popitem(last=False)
+        if self._thread is None:
+            self._start()
+        self._queue.put(records)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def _run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                records = self._queue.get()
+                if records is None:
+                    return
+                for record in records:
+                    f.write(json.dumps(record, default=str) + "\n")
+                if self._queue.empty():
+                    f.flush()
+                if self.max_bytes and f.tell() >= self.max_bytes:
+                    f.close()
+                    self._rotate()
+                    f = open(self.path, "a", encoding="utf-8")
+        finally:
+            f.close()
+
+    def get_trace(self, trace_id: str) -> List[dict]:
+        """The spans of a recent trace ([] once it left memory; the file is not scanned)."""
+        with self._lock:
+            return list(self._recent.get(trace_id, []))
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_exporter: Optional[JsonlSpanExporter] = None
+
+
+def configure(path: str, max_traces: int = 1000, enabled: bool = True,
+              max_bytes: int = 0, backups: int = 0) -> None:
+    global _exporter
+    _exporter = JsonlSpanExporter(path, max_traces, max_bytes, backups) if enabled else None
+
+
+def _export(trace_id: str, spans: List[dict]) -> None:
+    if _exporter is not None:
+        _exporter.export(trace_id, spans)
+
+
+def get_trace(trace_id: str) -> List[dict]:
+    return _exporter.get_trace(trace_id) if _exporter else []
+
+
+def shutdown() -> None:
+    if _exporter is not None:
+        _exporter.shutdown()
+
+
+# ============================================
+# Integrations
+# ============================================
+
+def instrument_httpx_client(client, prefix: str) -> None:
+    """Add a span per request to a sync httpx.Client (e.g. Supabase's)."""
+
+    def on_request(request):
+        current = start_span(f"{prefix} {request.method} {request.url.path}")
+        if current is not None:
+            request.extensions["qc_span"] = current
+
+    def on_response(response):
+        current = response.request.extensions.get("qc_span")
+        if current is not None:
+            current.set(status_code=response.status_code)
+            if response.status_code >= 400:
+                current.status = "error"
+            current.end()
+
+    hooks = client.event_hooks
+    hooks["request"].append(on_request)
+    hooks["response"].append(on_response)
+    client.event_hooks = hooks
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving every request a trace context. Requests carrying
+    a traceparent header continue that trace; any request is exported only
+    if sampled or joined to a job trace.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                incoming = parse_traceparent(value.decode("latin-1"))
+                break
+
+        trace_id, parent_id = incoming or (None, None)
+        keep = self.sample_rate > 0 and random.random() < self.sample_rate
+        with use_trace(trace_id, f"{scope['method']} {scope['path']}", parent_id=parent_id, keep=keep):
+            await self.app(scope, receive, send)
@@ -1,4 +1,5 @@
 import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import health
@@ -7,54 +8,96 @@ from app.api.v1 import teams
 from app.api.v1 import jobs
 from app.api.v1 import onboarding
 from app.api.v1 import callbacks
-from app.workers.auto_job_processor import auto_process_jobs
+from app.api.v1 import webhooks
+from app.api.v1 import metrics
+from app.core.metrics import MetricsMiddleware
+from app.core.rate_limit import RateLimiter, RateLimitMiddleware
+from app.core.responses import CompressionMiddleware
+from app.core.logger import setup_logging, shutdown_logging, get_logger, RequestIdMiddleware
+from app.core import tracing
+from app.core.lifecycle import TaskSupervisor
+from app.core.supabase import get_supabase
+from app.workers.runner import start_background_tasks, stop_background_tasks
 from fastapi.security import HTTPBearer
 
 
 security = HTTPBearer()
 
-
-app = FastAPI(
-    title="QC Lobby API",
-    description="Video Quality Control SaaS Backend",
-    version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Start background job processor on application startup."""
-    print(f"[startup] n8n processing enabled: {settings.USE_N8N_PROCESSING}")
-    print(f"[startup] n8n webhook URL: {settings.N8N_WEBHOOK_URL}")
-    asyncio.create_task(auto_process_jobs())
-
-
-app.include_router(health.router, prefix="/v1", tags=["health"])
-
-@app.get("/")
-async def root():
-    return {"message": "QC Lobby API", "version": "1.0.0"}
-
-
-app.include_router(teams.router, prefix="/v1", tags=["teams"])
-app.include_router(jobs.router, prefix="/v1", tags=["jobs"])
-app.include_router(onboarding.router, prefix="/v1", tags=["onboarding"])
-app.include_router(callbacks.router, prefix="/v1", tags=["n8n-callbacks"])
-
-
-print("REGISTERED ROUTES:")
-for route in app.routes:
-    print(route.path)
-
-
+logger = get_logger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start logging/tracing and supervised background tasks; drain and flush on shutdown."""
+    setup_logging(settings.LOG_LEVEL, settings.LOG_LEVELS)
+    tracing.configure(settings.TRACE_EXPORT_PATH, settings.TRACE_BUFFER_TRACES, settings.TRACING_ENABLED,
+                      settings.TRACE_EXPORT_MAX_BYTES, settings.TRACE_EXPORT_BACKUPS)
+    logger.info("Starting up", extra={"n8n_enabled": settings.USE_N8N_PROCESSING,
+                                      "run_worker": settings.RUN_WORKER_IN_API})
+    supervisor = TaskSupervisor(max_backoff=settings.TASK_RESTART_MAX_BACKOFF_SEC)
+    app.state.supervisor = supervisor
+    # Build the Supabase client off the event loop while we start serving
+    supervisor.start("supabase-warmup", lambda: asyncio.to_thread(get_supabase), restart=False)
+    start_background_tasks(supervisor, run_job_processor=settings.RUN_WORKER_IN_API, run_eta_resync=True)
+    try:
+        yield
+    finally:
+        await stop_background_tasks(supervisor, settings.SHUTDOWN_DRAIN_TIMEOUT_SEC)
+        tracing.shutdown()
+        shutdown_logging()
+
+
+def create_app() -> FastAPI:
+    """
+    Build the FastAPI app. Clients (Supabase, n8n) are created on first use
+    and telemetry is started by the lifespan, so this does no I/O. Settings
+    are read here, not when app.main is imported: serve it with
+    `uvicorn --factory app.main:create_app`.
+    """
+    app = FastAPI(
+        title="QC Lobby API",
+        description="Video Quality Control SaaS Backend",
+        version="1.0.0",
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan,
+    )
+
+    # Rate limiting sits inside CORS so browsers can read 429s and their headers
+    if settings.RATE_LIMIT_ENABLED:
+        app.add_middleware(RateLimitMiddleware, limiter=RateLimiter.from_settings(settings))
+
+    # Add CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:3001"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Retry-After", "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "X-Request-ID"],
+    )
+    if settings.COMPRESSION_ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.COMPRESSION_MIN_SIZE,
+            gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+            brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(tracing.TracingMiddleware, sample_rate=settings.TRACE_SAMPLE_RATE)
+    app.add_middleware(RequestIdMiddleware)
+
+    app.include_router(health.router, prefix="/v1", tags=["health"])
+
+    @app.get("/")
+    async def root():
+        return {"message": "QC Lobby API", "version": "1.0.0"}
+
+    app.include_router(teams.router, prefix="/v1", tags=["teams"])
+    app.include_router(jobs.router, prefix="/v1", tags=["jobs"])
+    app.include_router(onboarding.router, prefix="/v1", tags=["onboarding"])
+    app.include_router(callbacks.router, prefix="/v1", tags=["n8n-callbacks"])
+    app.include_router(webhooks.router, prefix="/v1", tags=["webhooks"])
+    app.include_router(metrics.router, tags=["metrics"])
+
+    return app
@@ -0,0 +1,451 @@
+"""
+Job Archive
+
+Completed and failed jobs older than ARCHIVE_AFTER_DAYS move out of qc_jobs
+into an Iceberg catalog (ARCHIVE_CATALOG_URI, by default SQLite in the
+warehouse) with Parquet data files under ARCHIVE_WAREHOUSE_PATH (a local
+path or an object store URI such as s3://bucket/archive):
+- qc_archive.jobs: one row per job; qc_result, artifacts and video_metadata
+  are kept as JSON text so rows read back exactly as they were
+- qc_archive.job_comments: the normalized QC comments, one row per comment,
+  for analytics scans that don't need to parse qc_result
+
+Both tables are partitioned by team_id and month(created_at). History reads
+always filter on team_id, so a team's read only opens its own data files.
+
+The hot table stays small: every job query (dashboard lists, the worker's
+status counts) only ever sees recent jobs.
+
+Archived jobs are read by the API and written by the worker, so rows are
+only deleted from qc_jobs when every process sees the same catalog: a
+shared catalog database and object store warehouse, or
+ARCHIVE_ALLOW_LOCAL_CATALOG on a single host where the API and worker share
+the disk. Reads that can't open the archive return no archived jobs.
+
+Needs pyiceberg with the pyarrow and SQLAlchemy extras
+(pip install "pyiceberg[pyarrow,sql-sqlite]"); both are imported on first use.
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.cache import CacheBackend, cache_key, create_cache
+from app.core.supabase import supabase, with_retry
+from app.core.logger import get_logger
+from app.services import job_reads
+
+logger = get_logger(__name__)
+
+NAMESPACE = "qc_archive"
+JOBS_TABLE = f"{NAMESPACE}.jobs"
+COMMENTS_TABLE = f"{NAMESPACE}.job_comments"
+
+FINAL_STATUSES = ("completed", "failed")
+
+# qc_jobs columns stored as JSON text; any other unknown column goes to extra_json
+JSON_COLUMNS = ("qc_result", "artifacts", "video_metadata")
+SCALAR_COLUMNS = (
+    "id", "team_id", "status", "qc_mode", "video_url", "thumbnail_url", "duration_sec",
+    "credits_used", "dispatch_attempts", "content_fingerprint", "trace_id", "created_at",
+)
+
+
+class ArchiveUnavailable(Exception):
+    """The archive is enabled but its dependencies are missing or its catalog is not shared."""
+    pass
+
+
+def _is_remote(uri: Optional[str]) -> bool:
+    return bool(uri) and "://" in uri and not uri.startswith(("file:", "sqlite:"))
+
+
+def catalog_is_shared() -> bool:
+    """Whether every process and host sees the catalog the archiver writes."""
+    return settings.ARCHIVE_ALLOW_LOCAL_CATALOG or (
+        _is_remote(settings.ARCHIVE_CATALOG_URI) and _is_remote(settings.ARCHIVE_WAREHOUSE_PATH)
+    )
+
+
+def _schemas():
+    from pyiceberg.schema import Schema
+    from pyiceberg.types import LongType, NestedField, StringType, TimestamptzType
+    from pyiceberg.partitioning import PartitionField, PartitionSpec
+    from pyiceberg.transforms import IdentityTransform, MonthTransform
+
+    jobs = Schema(
+        NestedField(1, "id", StringType(), required=True),
+        NestedField(2, "team_id", StringType(), required=True),
+        NestedField(3, "created_at", TimestamptzType(), required=True),
+        NestedField(4, "status", StringType()),
+        NestedField(5, "qc_mode", StringType()),
+        NestedField(6, "video_url", StringType()),
+        NestedField(7, "thumbnail_url", StringType()),
+        NestedField(8, "duration_sec", LongType()),
+        NestedField(9, "credits_used", LongType()),
+        NestedField(10, "dispatch_attempts", LongType()),
+        NestedField(11, "content_fingerprint", StringType()),
+        NestedField(12, "trace_id", StringType()),
+        NestedField(13, "qc_result_json", StringType()),
+        NestedField(14, "artifacts_json", StringType()),
+        NestedField(15, "video_metadata_json", StringType()),
+        NestedField(16, "extra_json", StringType()),
+        NestedField(17, "archived_at", TimestamptzType(), required=True),
+    )
+    comments = Schema(
+        NestedField(1, "job_id", StringType(), required=True),
+        NestedField(2, "team_id", StringType(), required=True),
+        NestedField(3, "created_at", TimestamptzType(), required=True),
+        NestedField(4, "qc_mode", StringType()),
+        NestedField(5, "position", LongType(), required=True),
+        NestedField(6, "timestamp", StringType()),
+        NestedField(7, "timestamp_sec", LongType()),
+        NestedField(8, "category", StringType()),
+        NestedField(9, "severity", StringType()),
+        NestedField(10, "description", StringType()),
+        NestedField(11, "suggestion", StringType()),
+    )
+
+    def spec(schema: Schema) -> PartitionSpec:
+        return PartitionSpec(
+            PartitionField(source_id=schema.find_field("team_id").field_id, field_id=1000,
+                           transform=IdentityTransform(), name="team_id"),
+            PartitionField(source_id=schema.find_field("created_at").field_id, field_id=1001,
+                           transform=MonthTransform(), name="created_month"),
+        )
+
+    return (jobs, spec(jobs)), (comments, spec(comments))
+
+
+def _parse_time(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _dumps(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+def _int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def to_archive_rows(job: dict, archived_at: datetime) -> Tuple[dict, List[dict]]:
+    """A qc_jobs row as (jobs row, job_comments rows)."""
+    created_at = _parse_time(job["created_at"])
+    extra = {k: v for k, v in job.items() if k not in SCALAR_COLUMNS and k not in JSON_COLUMNS}
+    row = {
+        "id": str(job["id"]),
+        "team_id": str(job["team_id"]),
+        "created_at": created_at,
+        "status": job.get("status"),
+        "qc_mode": job.get("qc_mode"),
+        "video_url": job.get("video_url"),
+        "thumbnail_url": job.get("thumbnail_url"),
+        "duration_sec": _int(job.get("duration_sec")),
+        "credits_used": _int(job.get("credits_used")),
+        "dispatch_attempts": _int(job.get("dispatch_attempts")),
+        "content_fingerprint": job.get("content_fingerprint"),
+        "trace_id": job.get("trace_id"),
+        "qc_result_json": _dumps(job.get("qc_result")),
+        "artifacts_json": _dumps(job.get("artifacts")),
+        "video_metadata_json": _dumps(job.get("video_metadata")),
+        "extra_json": _dumps(extra) if extra else None,
+        "archived_at": archived_at,
+    }
+
+    qc_result = job.get("qc_result")
+    comments = qc_result.get("comments") if isinstance(qc_result, dict) else None
+    comment_rows = [
+        {
+            "job_id": row["id"],
+            "team_id": row["team_id"],
+            "created_at": created_at,
+            "qc_mode": row["qc_mode"],
+            "position": position,
+            "timestamp": comment.get("timestamp"),
+            "timestamp_sec": _int(comment.get("timestamp_sec")),
+            "category": comment.get("category"),
+            "severity": comment.get("severity"),
+            "description": comment.get("description"),
+            "suggestion": comment.get("suggestion"),
+        }
+        for position, comment in enumerate(comments or [])
+        if isinstance(comment, dict)
+    ]
+    return row, comment_rows
+
+
+def from_archive_row(row: dict) -> dict:
+    """An archived jobs row back in the shape of a qc_jobs row (plus archived_at)."""
+    job = {column: row.get(column) for column in SCALAR_COLUMNS}
+    job["created_at"] = row["created_at"].isoformat()
+    for column in JSON_COLUMNS:
+        raw = row.get(f"{column}_json")
+        job[column] = json.loads(raw) if raw is not None else None
+    if row.get("extra_json"):
+        job.update(json.loads(row["extra_json"]))
+    job["archived_at"] = row["archived_at"].isoformat()
+    return job
+
+
+class JobArchive:
+    """
+    Iceberg tables holding archived jobs. The catalog is opened (and the
+    tables created) on first use. Reads are cached per team and snapshot of
+    the jobs table: each read checks the current snapshot in the catalog (no
+    data files), so an archival run in the worker process is seen by the
+    API's next read even with a per-process cache.
+    """
+
+    def __init__(self):
+        self._catalog = None
+        self._tables: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._cache: Optional[CacheBackend] = None
+        self._read_error_logged = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ARCHIVE_ENABLED
+
+    def _get_cache(self) -> CacheBackend:
+        if self._cache is None:
+            self._cache = create_cache("archive", maxsize=1000, ttl=settings.ARCHIVE_READ_CACHE_TTL_SEC)
+        return self._cache
+
+    def _table(self, identifier: str):
+        with self._lock:
+            if identifier not in self._tables:
+                self._open()
+            return self._tables[identifier]
+
+    def _open(self) -> None:
+        try:
+            from pyiceberg.catalog.sql import SqlCatalog
+            import pyarrow  # noqa: F401  Needed to write and scan data files
+        except ImportError as e:
+            raise ArchiveUnavailable(
+                'ARCHIVE_ENABLED needs pyiceberg[pyarrow,sql-sqlite] installed'
+            ) from e
+
+        location = settings.ARCHIVE_WAREHOUSE_PATH
+        if _is_remote(location):
+            if not settings.ARCHIVE_CATALOG_URI:
+                raise ArchiveUnavailable("An object store ARCHIVE_WAREHOUSE_PATH needs ARCHIVE_CATALOG_URI")
+            warehouse_uri, catalog_uri = location, settings.ARCHIVE_CATALOG_URI
+        else:
+            warehouse = Path(location).resolve()
+            warehouse.mkdir(parents=True, exist_ok=True)
+            warehouse_uri = warehouse.as_uri()
+            catalog_uri = settings.ARCHIVE_CATALOG_URI or f"sqlite:///{warehouse / 'catalog.db'}"
+        self._catalog = SqlCatalog("qc_archive", uri=catalog_uri, warehouse=warehouse_uri)
+        self._catalog.create_namespace_if_not_exists(NAMESPACE)
+        (jobs_schema, jobs_spec), (comments_schema, comments_spec) = _schemas()
+        self._tables[JOBS_TABLE] = self._catalog.create_table_if_not_exists(
+            JOBS_TABLE, schema=jobs_schema, partition_spec=jobs_spec
+        )
+        self._tables[COMMENTS_TABLE] = self._catalog.create_table_if_not_exists(
+            COMMENTS_TABLE, schema=comments_schema, partition_spec=comments_spec
+        )
+
+    def _scan(self, identifier: str, row_filter, snapshot_id: Optional[int] = None) -> List[dict]:
+        table = self._table(identifier)
+        if snapshot_id is None:
+            table.refresh()  # Pick up snapshots written by other processes
+        return table.scan(row_filter=row_filter, snapshot_id=snapshot_id).to_arrow().to_pylist()
+
+    def _jobs_snapshot(self) -> int:
+        """The jobs table's current snapshot id, 0 before anything was archived."""
+        table = self._table(JOBS_TABLE)
+        table.refresh()
+        snapshot = table.current_snapshot()
+        return snapshot.snapshot_id if snapshot else 0
+
+    def _read(self, identifier: str, team_id: str, since: Optional[datetime] = None,
+              snapshot_id: Optional[int] = None) -> Optional[List[dict]]:
+        """
+        A team's rows (created from `since` on, as of `snapshot_id`, default
+        the latest); None when the archive can't be read (see _guarded).
+        """
+
+        def scan():
+            try:
+                from pyiceberg.expressions import And, EqualTo, GreaterThanOrEqual
+            except ImportError as e:
+                raise ArchiveUnavailable("ARCHIVE_ENABLED needs pyiceberg[pyarrow,sql-sqlite] installed") from e
+            row_filter = EqualTo("team_id", team_id)
+            if since is not None:
+                # Prunes whole months through the created_month partition
+                row_filter = And(row_filter, GreaterThanOrEqual("created_at", since.isoformat()))
+            return self._scan(identifier, row_filter, snapshot_id)
+
+        return self._guarded(scan)
+
+    def _guarded(self, read: Callable[[], Any]) -> Optional[Any]:
+        """read() for request paths: None (logged) instead of an error when the archive can't be read."""
+        try:
+            return read()
+        except ArchiveUnavailable as e:
+            if not self._read_error_logged:
+                self._read_error_logged = True
+                logger.error("Archived jobs are not readable, serving recent jobs only: %s", e)
+        except Exception:
+            logger.exception("Archive read failed, serving recent jobs only")
+        return None
+
+    # ----------------------------------------
+    # Reads
+    # ----------------------------------------
+
+    def team_jobs(self, team_id: str) -> List[dict]:
+        """A team's archived jobs, newest first ([] when archiving is off)."""
+        if not self.enabled:
+            return []
+        snapshot_id = self._guarded(self._jobs_snapshot)
+        if snapshot_id is None:
+            return []
+        key = cache_key("team", team_id, snapshot_id)
+        cached = self._get_cache().get(key)
+        if cached is not None:
+            return cached
+        rows = self._read(JOBS_TABLE, team_id, snapshot_id=snapshot_id or None)
+        if rows is None:
+            return []
+        jobs = sorted((from_archive_row(r) for r in rows), key=lambda j: j["created_at"], reverse=True)
+        self._get_cache().set(key, jobs)
+        return jobs
+
+    def job(self, team_id: str, job_id: str) -> List[dict]:
+        """An archived job of a team as a 0/1-row list."""
+        if not self.enabled:
+            return []
+        return [j for j in self.team_jobs(team_id) if j["id"] == str(job_id)][:1]
+
+    def team_comments(self, team_id: str, since: Optional[datetime] = None) -> List[dict]:
+        """A team's archived QC comments (analytics), optionally from `since` on."""
+        if not self.enabled:
+            return []
+        return self._read(COMMENTS_TABLE, team_id, since) or []
+
+    # ----------------------------------------
+    # Archival
+    # ----------------------------------------
+
+    def _archived_ids(self, jobs: List[dict]) -> set:
+        from pyiceberg.expressions import And, In
+
+        team_ids = {str(j["team_id"]) for j in jobs}
+        rows = self._table(JOBS_TABLE).scan(
+            row_filter=And(In("team_id", team_ids), In("id", {str(j["id"]) for j in jobs})),
+            selected_fields=("id",),
+        ).to_arrow().to_pylist()
+        return {r["id"] for r in rows}
+
+    def archive_batch(self, jobs: List[dict]) -> int:
+        """
+        Append jobs to the archive tables and delete them from qc_jobs.
+
+        Jobs already in the archive (a previous run died between the append
+        and the delete) are not appended again.
+
+        Returns:
+            Number of jobs removed from qc_jobs
+        """
+        if not jobs:
+            return 0
+        import pyarrow as pa
+
+        (jobs_schema, _), (comments_schema, _) = _schemas()
+        jobs_table = self._table(JOBS_TABLE)
+        jobs_table.refresh()
+        already = self._archived_ids(jobs)
+
+        archived_at = datetime.now(timezone.utc)
+        job_rows, comment_rows = [], []
+        for job in jobs:
+            if str(job["id"]) in already:
+                continue
+            row, comments = to_archive_rows(job, archived_at)
+            job_rows.append(row)
+            comment_rows.extend(comments)
+
+        # Comments first: a job row marks the job (and its comments) as archived
+        if comment_rows:
+            self._table(COMMENTS_TABLE).append(pa.Table.from_pylist(comment_rows, schema=comments_schema.as_arrow()))
+        if job_rows:
+            jobs_table.append(pa.Table.from_pylist(job_rows, schema=jobs_schema.as_arrow()))
+
+        ids = [str(job["id"]) for job in jobs]
+        _delete_hot_jobs(ids)
+
+        # Cached archive reads are keyed by snapshot, so only the hot reads need dropping
+        for team_id in {str(job["team_id"]) for job in jobs}:
+            job_reads.invalidate(team_id=team_id)
+        for job_id in ids:
+            job_reads.invalidate(job_id)
+        return len(ids)
+
+    def archive_once(self, older_than_days: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+        """
+        Archive every final job created more than `older_than_days` ago.
+
+        Returns:
+            Number of jobs archived
+
+        Raises:
+            ArchiveUnavailable: missing dependencies, or the catalog is only
+                visible on this host (see catalog_is_shared)
+        """
+        if not catalog_is_shared():
+            raise ArchiveUnavailable(
+                "Refusing to archive into a local catalog the API may not see: set ARCHIVE_CATALOG_URI and "
+                "an object store ARCHIVE_WAREHOUSE_PATH, or ARCHIVE_ALLOW_LOCAL_CATALOG on a single host"
+            )
+        days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+        total = 0
+        while True:
+            batch = _query_archivable_jobs(cutoff.isoformat(), batch_size).data or []
+            total += self.archive_batch(batch)
+            if len(batch) < batch_size:
+                break
+        if total:
+            logger.info("Archived %d jobs older than %d days", total, days)
+        return total
+
+
+@with_retry()
+def _query_archivable_jobs(cutoff: str, limit: int):
+    """
+    Oldest final jobs created before the cutoff, with retry on transient
+    failures. Segments are left out: their results are merged into the
+    parent, and deleting the parent cascades to them.
+    """
+    return (
+        supabase
+        .table("qc_jobs")
+        .select("*")
+        .in_("status", list(FINAL_STATUSES))
+        .lt("created_at", cutoff)
+        .is_("parent_job_id", "null")
+        .order("created_at", desc=False)
+        .limit(limit)
+        .execute()
+    )
+
+
+@with_retry()
+def _delete_hot_jobs(job_ids: List[str]):
+    """Remove archived jobs from qc_jobs with retry on transient failures."""
+    return supabase.table("qc_jobs").delete().in_("id", job_ids).in_("status", list(FINAL_STATUSES)).execute()
+
+
+job_archive = JobArchive()
@@ -0,0 +1,71 @@
+"""
+Circuit Breaker
+
+Stops calling a dependency (n8n) after repeated failures so the worker can
+pause instead of failing every queued job, then lets a trial request
+through after a cool-down to detect recovery.
+
+States:
+- closed: requests flow, consecutive failures are counted
+- open: requests are refused until reset_timeout has elapsed
+- half_open: trial requests allowed; one success closes, one failure re-opens
+"""
+
+import time
+import threading
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = CLOSED
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        return self.state != OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial request through."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning("%s circuit opened after %d failures", self.name, self._failures)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
@@ -0,0 +1,116 @@
+"""
+Credits
+
+Team credits are kept in an append-only ledger (credit_ledger, see
+migrations/versions/0003_credit_ledger.sql). Postgres functions append the
+entry and update the materialized balances (teams.credits,
+teams.credits_reserved) in one transaction, so concurrent requests can't
+lose updates and balance reads stay a single-row lookup.
+
+Job lifecycle:
+- reserve at job creation (fails with InsufficientCredits)
+- capture when the job completes
+- release (refund) when it fails
+
+reserve/capture/release are idempotent per job, so retries are safe.
+
+Movements of the available balance (grant, reserve, release) drop the
+team's cached profile (app.services.profiles) and pin its reads to the
+primary for a while (app.core.db_router).
+"""
+
+from typing import Optional, Union
+from uuid import UUID
+from app.core.supabase import supabase, with_retry
+from app.core.db_router import db_router
+from app.core.metrics import CREDIT_LEDGER_ENTRIES
+from app.core.logger import get_logger
+from app.services import profiles
+
+logger = get_logger(__name__)
+
+
+class InsufficientCredits(Exception):
+    """The team's available balance doesn't cover the reservation."""
+
+    def __init__(self, required: int, available: int):
+        super().__init__(f"Insufficient credits. Required: {required}, Available: {available}")
+        self.required = required
+        self.available = available
+
+
+@with_retry()
+def _rpc_reserve(team_id: str, job_id: str, amount: int):
+    """Reserve credits for a job with retry on transient failures."""
+    return supabase.rpc("credit_reserve", {"p_team_id": team_id, "p_job_id": job_id, "p_amount": amount}).execute()
+
+
+@with_retry()
+def _rpc_capture(job_id: str):
+    """Capture a job's reserve with retry on transient failures."""
+    return supabase.rpc("credit_capture", {"p_job_id": job_id}).execute()
+
+
+@with_retry()
+def _rpc_release(job_id: str, reason: Optional[str]):
+    """Release a job's reserve with retry on transient failures."""
+    return supabase.rpc("credit_release", {"p_job_id": job_id, "p_reason": reason}).execute()
+
+
+@with_retry()
+def _rpc_grant(team_id: str, amount: int, reason: str):
+    """Grant credits to a team with retry on transient failures."""
+    return supabase.rpc("credit_grant", {"p_team_id": team_id, "p_amount": amount, "p_reason": reason}).execute()
+
+
+def _balance_changed(team_id: str) -> None:
+    profiles.invalidate_team(team_id)
+    db_router.wrote(team_id)
+
+
+def reserve(team_id: str, job_id: Union[str, UUID], amount: int) -> int:
+    """
+    Move `amount` credits from the team's available balance to reserved.
+
+    Returns:
+        The available balance after the reservation
+
+    Raises:
+        InsufficientCredits: the available balance is lower than `amount`
+    """
+    row = _rpc_reserve(team_id, str(job_id), amount).data[0]
+    if not row["ok"]:
+        CREDIT_LEDGER_ENTRIES.labels(kind="reserve", result="rejected").inc()
+        raise InsufficientCredits(amount, row["balance"] or 0)
+    CREDIT_LEDGER_ENTRIES.labels(kind="reserve", result="applied").inc()
+    _balance_changed(team_id)
+    return row["balance"]
+
+
+def capture(job_id: Union[str, UUID]) -> bool:
+    """Charge a completed job's reserve. False if there was nothing to capture."""
+    applied = bool(_rpc_capture(str(job_id)).data)
+    CREDIT_LEDGER_ENTRIES.labels(kind="capture", result="applied" if applied else "noop").inc()
+    return applied
+
+
+def release(job_id: Union[str, UUID], reason: Optional[str] = None, team_id: Optional[str] = None) -> bool:
+    """
+    Refund a job's reserve to its team. False if there was nothing to release.
+    Pass the job's team_id to drop its cached profile on a refund.
+    """
+    applied = bool(_rpc_release(str(job_id), reason).data)
+    CREDIT_LEDGER_ENTRIES.labels(kind="release", result="applied" if applied else "noop").inc()
+    if applied:
+        if team_id:
+            _balance_changed(team_id)
+        logger.info("Released job credits", extra={"job_id": str(job_id), "reason": reason})
+    return applied
+
+
+def grant(team_id: str, amount: int, reason: str) -> int:
+    """Add credits to a team (trial credits, top-ups). Returns the new balance."""
+    balance = _rpc_grant(team_id, amount, reason).data
+    CREDIT_LEDGER_ENTRIES.labels(kind="grant", result="applied").inc()
+    _balance_changed(team_id)
+    return balance
@@ -0,0 +1,382 @@
+"""
+Queue ETAs
+
+Estimates when a job will start and complete, for GET /v1/jobs and
+GET /v1/jobs/{id}:
+
+- the processing rate of each qc_mode (seconds of processing per second
+  of video) is an EWMA over completed jobs, from started_at to completion.
+  It is rebuilt from the latest ETA_HISTORY_JOBS completed jobs every
+  ETA_HISTORY_REFRESH_SEC (completions this process doesn't see included).
+- the FIFO queue of pending jobs is tracked incrementally. Each job gets a
+  ticket and a snapshot of the running video seconds per qc_mode when it
+  is enqueued, so its position and the work ahead of it are differences
+  of two snapshots rather than a scan of the queue.
+- the work ahead plus what is left of the processing jobs is spread over
+  the worker's WORKER_MAX_PROCESSING_JOBS slots.
+
+Job events (created, claimed, finished) keep the tracker current in this
+process. Other processes (the worker, other API instances) change the
+queue too, so a background task (run_resync, in the API process) re-reads
+it from qc_jobs every ETA_RESYNC_SEC, and within a second after changes it
+can't follow (requeues, manual status updates). Reads never query.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from app.core.supabase import supabase, with_retry
+from app.core.config import settings
+from app.core.lifecycle import wait_or_stop
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+QC_MODES = ("polisher", "guardian")
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    """Epoch seconds of a timestamptz value, None if missing or invalid."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _format_timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+@with_retry()
+def _query_queue():
+    """List pending top-level jobs in dispatch order with retry on transient failures."""
+    return (
+        supabase
+        .table("qc_jobs")
+        .select("id, qc_mode, duration_sec")
+        .eq("status", "pending")
+        .is_("parent_job_id", "null")
+        .order("created_at", desc=False)
+        .execute()
+    )
+
+
+@with_retry()
+def _query_processing():
+    """List processing top-level jobs with retry on transient failures."""
+    return (
+        supabase
+        .table("qc_jobs")
+        .select("id, qc_mode, duration_sec, started_at")
+        .eq("status", "processing")
+        .is_("parent_job_id", "null")
+        .execute()
+    )
+
+
+@with_retry()
+def _query_rate_history(qc_mode: str, limit: int):
+    """Get the latest completed jobs of a qc_mode with retry on transient failures."""
+    return (
+        supabase
+        .table("qc_jobs")
+        .select("duration_sec, started_at, finished_at")
+        .eq("qc_mode", qc_mode)
+        .eq("status", "completed")
+        .is_("parent_job_id", "null")
+        .not_.is_("started_at", "null")
+        .order("finished_at", desc=True)
+        .limit(limit)
+        .execute()
+    )
+
+
+class RateModel:
+    """EWMA of processing seconds per second of video, per qc_mode."""
+
+    def __init__(self, alpha: float, default: float):
+        self.alpha = alpha
+        self.default = default
+        self._rates: Dict[str, float] = {}
+
+    def rate(self, qc_mode: str) -> float:
+        return self._rates.get(qc_mode, self.default)
+
+    def observe(self, qc_mode: str, duration_sec: float, processing_sec: float) -> None:
+        if duration_sec <= 0 or processing_sec <= 0:
+            return
+        sample = processing_sec / duration_sec
+        current = self._rates.get(qc_mode)
+        self._rates[qc_mode] = sample if current is None else self.alpha * sample + (1 - self.alpha) * current
+
+
+@dataclass
+class _Queued:
+    ticket: int
+    qc_mode: str
+    duration_sec: float
+    # Video seconds per qc_mode enqueued before this job
+    video_before: Dict[str, float] = field(default_factory=dict)
+
+
+class QueueTracker:
+    """
+    Pending jobs in FIFO order, with O(log holes) position and work-ahead
+    lookups.
+
+    Jobs normally leave from the head (the worker claims the oldest). A job
+    removed from the middle leaves a hole that is subtracted from the jobs
+    behind it until the head passes it, through prefix sums of the holes
+    rebuilt after they change.
+    """
+
+    def __init__(self):
+        self._pending: "OrderedDict[str, _Queued]" = OrderedDict()
+        self._holes: List[Tuple[int, str, float]] = []  # (ticket, qc_mode, duration_sec), sorted
+        self._hole_sums: Optional[List[Dict[str, float]]] = None  # [i]: video per qc_mode of holes[:i]
+        self._next_ticket = 0
+        self._video_total: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._pending
+
+    def enqueue(self, job_id: str, qc_mode: str, duration_sec: float) -> None:
+        if job_id in self._pending:
+            return
+        self._pending[job_id] = _Queued(self._next_ticket, qc_mode, duration_sec, dict(self._video_total))
+        self._next_ticket += 1
+        self._video_total[qc_mode] = self._video_total.get(qc_mode, 0.0) + duration_sec
+
+    def remove(self, job_id: str) -> bool:
+        entry = self._pending.get(job_id)
+        if entry is None:
+            return False
+        if next(iter(self._pending)) == job_id:
+            self._pending.popitem(last=False)
+            if not self._pending:
+                self._holes.clear()
+                self._hole_sums = None
+            else:
+                head = next(iter(self._pending.values())).ticket
+                drop = bisect.bisect_left(self._holes, (head,))
+                if drop:
+                    del self._holes[:drop]
+                    self._hole_sums = None
+        else:
+            del self._pending[job_id]
+            bisect.insort(self._holes, (entry.ticket, entry.qc_mode, entry.duration_sec))
+            self._hole_sums = None
+        return True
+
+    def _holes_video(self, count: int) -> Dict[str, float]:
+        """Video seconds per qc_mode of the first `count` holes."""
+        if self._hole_sums is None:
+            running: Dict[str, float] = {}
+            sums = [{}]
+            for _, qc_mode, duration_sec in self._holes:
+                running = {**running, qc_mode: running.get(qc_mode, 0.0) + duration_sec}
+                sums.append(running)
+            self._hole_sums = sums
+        return self._hole_sums[count]
+
+    def ahead(self, job_id: Optional[str]) -> Tuple[int, Dict[str, float]]:
+        """
+        Jobs and video seconds per qc_mode queued before a job. Unknown jobs
+        (enqueued by another process since the last resync) count as the tail.
+        """
+        if not self._pending:
+            return 0, {}
+        head = next(iter(self._pending.values()))
+        entry = self._pending.get(job_id) if job_id else None
+        ticket = entry.ticket if entry else self._next_ticket
+        video_before = entry.video_before if entry else self._video_total
+
+        count = ticket - head.ticket
+        video = {
+            mode: video_before.get(mode, 0.0) - head.video_before.get(mode, 0.0)
+            for mode in video_before
+        }
+        holes = bisect.bisect_left(self._holes, (ticket,))
+        if holes:
+            count -= holes
+            for qc_mode, duration_sec in self._holes_video(holes).items():
+                video[qc_mode] = video.get(qc_mode, 0.0) - duration_sec
+        return count, video
+
+
+class QueueEstimator:
+    """Start and completion estimates for active jobs (see module docstring)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rate_model: Optional[RateModel] = None
+        self._queue = QueueTracker()
+        self._processing: Dict[str, Tuple[str, float, float]] = {}  # job_id -> (qc_mode, duration_sec, started)
+        self._synced_at: Optional[float] = None
+        self._history_at: Optional[float] = None
+
+    @property
+    def _rates(self) -> RateModel:
+        # Built on first use: settings aren't read at import time
+        if self._rate_model is None:
+            self._rate_model = RateModel(settings.ETA_EWMA_ALPHA, settings.ETA_DEFAULT_RATE)
+        return self._rate_model
+
+    @_rates.setter
+    def _rates(self, rates: RateModel) -> None:
+        self._rate_model = rates
+
+    # ---- job events -------------------------------------------------------
+
+    def job_created(self, job: dict) -> None:
+        """A job was inserted as pending (appended to the queue)."""
+        if job.get("status") != "pending" or job.get("parent_job_id"):
+            return
+        with self._lock:
+            self._queue.enqueue(str(job["id"]), job["qc_mode"], job["duration_sec"])
+
+    def job_started(self, job: dict) -> None:
+        """The worker claimed a job (needs qc_mode, duration_sec, started_at)."""
+        job_id = str(job["id"])
+        started = _parse_timestamp(job.get("started_at")) or time.time()
+        with self._lock:
+            self._queue.remove(job_id)
+            self._processing[job_id] = (job["qc_mode"], job["duration_sec"], started)
+
+    def job_finished(self, job: dict, completed: bool) -> None:
+        """
+        A top-level job reached a final state. Completed jobs with a
+        started_at update their qc_mode's processing rate.
+        """
+        job_id = str(job["id"])
+        with self._lock:
+            self._queue.remove(job_id)
+            running = self._processing.pop(job_id, None)
+            if not completed:
+                return
+            started = _parse_timestamp(job.get("started_at")) or (running[2] if running else None)
+            duration_sec = job.get("duration_sec") or (running[1] if running else None)
+            if started and duration_sec:
+                self._rates.observe(job["qc_mode"], duration_sec, time.time() - started)
+
+    def invalidate(self) -> None:
+        """The queue changed in a way the tracker can't follow: resync right away."""
+        self._synced_at = None
+
+    # ---- reads ------------------------------------------------------------
+
+    def annotate(self, jobs: List[dict]) -> List[dict]:
+        """
+        Jobs with estimated_start_at / estimated_completion_at on the pending
+        and processing ones. Rows are copied, never modified (they may be
+        shared through the job read cache).
+        """
+        if not settings.ETA_ENABLED or not any(job.get("status") in ("pending", "processing") for job in jobs):
+            return jobs
+        now = time.time()
+        annotated = []
+        with self._lock:
+            for job in jobs:
+                estimate = self._estimate(job, now)
+                if estimate is None:
+                    annotated.append(job)
+                    continue
+                start, completion = estimate
+                annotated.append({
+                    **job,
+                    "estimated_start_at": _format_timestamp(start),
+                    "estimated_completion_at": _format_timestamp(completion),
+                })
+        return annotated
+
+    def _estimate(self, job: dict, now: float) -> Optional[Tuple[float, float]]:
+        status = job.get("status")
+        if status not in ("pending", "processing") or job.get("parent_job_id"):
+            return None
+        runtime = self._rates.rate(job["qc_mode"]) * job["duration_sec"]
+
+        if status == "processing":
+            started = _parse_timestamp(job.get("started_at"))
+            if started is None:
+                running = self._processing.get(str(job["id"]))
+                started = running[2] if running else now
+            return started, max(started + runtime, now)
+
+        # Pending: queued work and the rest of the running jobs, over the slots
+        _, video_ahead = self._queue.ahead(str(job["id"]))
+        work_ahead = sum(self._rates.rate(mode) * seconds for mode, seconds in video_ahead.items())
+        remaining = [
+            max(started + self._rates.rate(mode) * duration_sec - now, 0.0)
+            for mode, duration_sec, started in self._processing.values()
+        ]
+        slots = max(settings.WORKER_MAX_PROCESSING_JOBS, 1)
+        wait = (sum(remaining) + work_ahead) / slots
+        if len(remaining) >= slots:
+            wait = max(wait, min(remaining))
+        start = now + wait
+        return start, start + runtime
+
+    # ---- resync -----------------------------------------------------------
+
+    async def run_resync(self, stop_event: Optional[asyncio.Event] = None) -> None:
+        """Background loop: resync when ETA_RESYNC_SEC passed or invalidate() was called."""
+        tick = min(1.0, settings.ETA_RESYNC_SEC)
+        while True:
+            if self._synced_at is None or time.monotonic() - self._synced_at >= settings.ETA_RESYNC_SEC:
+                try:
+                    await asyncio.to_thread(self.resync)
+                except Exception:
+                    logger.exception("Could not resync the job queue for ETAs")
+            if await wait_or_stop(stop_event, tick):
+                return
+
+    def resync(self) -> None:
+        """Re-read the queue and processing jobs (and the rate history when due)."""
+        if self._history_at is None or time.monotonic() - self._history_at >= settings.ETA_HISTORY_REFRESH_SEC:
+            self._load_history()
+
+        queue = QueueTracker()
+        for row in _query_queue().data or []:
+            queue.enqueue(str(row["id"]), row["qc_mode"], row["duration_sec"])
+        processing = {
+            str(row["id"]): (
+                row["qc_mode"],
+                row["duration_sec"],
+                _parse_timestamp(row.get("started_at")) or time.time(),
+            )
+            for row in _query_processing().data or []
+        }
+        with self._lock:
+            self._queue = queue
+            self._processing = processing
+            self._synced_at = time.monotonic()
+
+    def _load_history(self) -> None:
+        """Rebuild the processing rates from completed jobs (oldest first)."""
+        rates = RateModel(settings.ETA_EWMA_ALPHA, settings.ETA_DEFAULT_RATE)
+        for qc_mode in QC_MODES:
+            rows = _query_rate_history(qc_mode, settings.ETA_HISTORY_JOBS).data or []
+            for row in reversed(rows):
+                started = _parse_timestamp(row.get("started_at"))
+                finished = _parse_timestamp(row.get("finished_at"))
+                if started and finished:
+                    rates.observe(qc_mode, row["duration_sec"], finished - started)
+        with self._lock:
+            self._rates = rates
+        self._history_at = time.monotonic()
+
+
+queue_eta = QueueEstimator()
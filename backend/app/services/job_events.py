@@ -0,0 +1,95 @@
+"""
+Job Events
+
+Side effects that run once a job reaches a final state, whichever path got
+it there (n8n callbacks, local/mock backends, result cache, worker failures),
+or after any other change to a job row (claim, requeue, probe metadata,
+progress). The caller is responsible for the qc_jobs update itself.
+
+Final states settle the job's credit reserve: captured on completion,
+released (refunded) on failure and on completion from the result cache, take the job off the queue ETA tracker
+(completions also teach it the qc_mode's processing rate) and the progress
+coalescer, and queue the team's job.completed / job.failed webhooks.
+Segments of a segmented job only settle their parent (see
+app.services.segmenter).
+
+The job is already final when these run, so each side effect is isolated:
+one that raises is logged and the others still run. A caller that failed
+would make n8n retry into "already completed" and lose the rest for good.
+"""
+
+from typing import Callable, Optional
+from app.core.db_router import db_router
+from app.core.metrics import observe_job_finished
+from app.core.logger import get_logger
+from app.services.result_cache import result_cache
+from app.services import credits, job_reads, webhooks
+from app.services.eta import queue_eta
+from app.services.progress import job_progress
+from app.services.segmenter import settle_parent
+
+logger = get_logger(__name__)
+
+
+def _attempt(what: str, job: dict, fn: Callable, *args) -> None:
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception("Could not %s for job %s", what, job.get("id"))
+
+
+def on_job_updated(job: dict) -> None:
+    """Run side effects of a change to a job row (needs id and team_id)."""
+    job_reads.invalidate(job.get("id"), job.get("team_id"))
+    db_router.wrote(job.get("team_id"))
+
+
+def on_segment_finished(segment: dict) -> None:
+    """A segment reached a final state: finish its parent if this was the last one."""
+    _attempt("invalidate reads", segment, on_job_updated, segment)
+    try:
+        outcome = settle_parent(segment["parent_job_id"])
+    except Exception:
+        logger.exception("Could not settle the parent of segment %s", segment["id"])
+        return
+    if outcome is None:
+        return
+    parent, final_status, qc_result, artifacts = outcome
+    if final_status == "completed":
+        on_job_completed(parent, qc_result, artifacts)
+    else:
+        on_job_failed(parent, qc_result)
+
+
+def on_job_completed(job: dict, qc_result: dict, artifacts: Optional[dict] = None,
+                     cached: bool = False) -> None:
+    """
+    Run completion side effects for a job that is now 'completed'. A job
+    completed from the result cache (cached=True) is not charged.
+    """
+    _attempt("write the last progress", job, job_progress.finish, job["id"], True)
+    if job.get("parent_job_id"):
+        on_segment_finished(job)
+        return
+    _attempt("invalidate reads", job, on_job_updated, job)
+    if cached:
+        _attempt("release credits", job, credits.release, job["id"], "cached_result", job.get("team_id"))
+    else:
+        _attempt("capture credits", job, credits.capture, job["id"])
+        _attempt("cache the result", job, result_cache.store, job, qc_result, artifacts)
+    _attempt("update the queue ETA", job, queue_eta.job_finished, job, True)
+    _attempt("queue job.completed webhooks", job, webhooks.enqueue, "job.completed", job, qc_result, artifacts)
+    _attempt("record metrics", job, observe_job_finished, job, "completed")
+
+
+def on_job_failed(job: dict, qc_result: Optional[dict] = None) -> None:
+    """Run failure side effects for a job that is now 'failed' (qc_result holds the error)."""
+    _attempt("write the last progress", job, job_progress.finish, job["id"], False)
+    if job.get("parent_job_id"):
+        on_segment_finished(job)
+        return
+    _attempt("invalidate reads", job, on_job_updated, job)
+    _attempt("release credits", job, credits.release, job["id"], "job failed", job.get("team_id"))
+    _attempt("update the queue ETA", job, queue_eta.job_finished, job, False)
+    _attempt("queue job.failed webhooks", job, webhooks.enqueue, "job.failed", job, qc_result, None)
+    _attempt("record metrics", job, observe_job_finished, job, "failed")
@@ -0,0 +1,78 @@
+"""
+Job Read Coalescing
+
+Dashboard tabs (ActiveQueue, RecentActivity, JobList) poll the same team's
+jobs within milliseconds of each other. Reads of a team's job list and of
+a single job go through here so that:
+- concurrent identical reads share one in-flight Supabase query
+  (single-flight)
+- results are kept for JOB_READ_CACHE_TTL_SEC to absorb polling bursts
+- every job state transition invalidates the team list and the job
+  (see app.services.job_events.on_job_updated)
+"""
+
+from typing import Callable, List, Optional
+from app.core.cache import CacheBackend, SingleFlight, cache_key, create_cache
+from app.core.config import settings
+
+_flight = SingleFlight()
+_cache: Optional[CacheBackend] = None
+
+
+def _get_cache() -> Optional[CacheBackend]:
+    global _cache
+    if settings.JOB_READ_CACHE_TTL_SEC <= 0:
+        return None
+    if _cache is None:
+        _cache = create_cache(
+            "job_reads",
+            maxsize=settings.JOB_READ_CACHE_MAX_ENTRIES,
+            ttl=settings.JOB_READ_CACHE_TTL_SEC
+        )
+    return _cache
+
+
+def _read(key: str, load: Callable[[], List[dict]]) -> List[dict]:
+    cache = _get_cache()
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    def load_and_store() -> List[dict]:
+        rows = load()
+        if cache is not None:
+            cache.set(key, rows)
+        return rows
+
+    return _flight.do(key, load_and_store)
+
+
+def team_jobs(team_id: str, load: Callable[[], List[dict]]) -> List[dict]:
+    """A team's jobs (newest first); `load` runs the Supabase query."""
+    return _read(cache_key("team", team_id), load)
+
+
+def job(job_id: str, load: Callable[[], List[dict]], team_id: Optional[str] = None) -> List[dict]:
+    """
+    A job as a 0/1-row list, like the Supabase response data. Cached by job
+    id alone; a team_id that doesn't own the job gets an empty list.
+    """
+    rows = _read(cache_key("job", job_id), load)
+    if team_id and rows and rows[0].get("team_id") != team_id:
+        return []
+    return rows
+
+
+def invalidate(job_id: Optional[str] = None, team_id: Optional[str] = None) -> None:
+    """Drop cached reads affected by a change to a job (and its team's list)."""
+    cache = _get_cache()
+    if cache is None:
+        return
+    keys = []
+    if job_id:
+        keys.append(cache_key("job", job_id))
+    if team_id:
+        keys.append(cache_key("team", team_id))
+    if keys:
+        cache.delete(*keys)
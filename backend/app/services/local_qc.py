@@ -0,0 +1,101 @@
+"""
+Local Technical QC
+
+Cheap technical checks that run in-process (on the local backend's
+process pool) instead of going through an n8n workflow.
+
+Everything here must stay picklable and free of Supabase/network access:
+functions receive a plain job dict and return a structured qc_result.
+"""
+
+from typing import Any, Dict, List
+
+
+# Minimum acceptable delivery specs
+MIN_WIDTH = 1280
+MIN_HEIGHT = 720
+STANDARD_FPS = (23.976, 24, 25, 29.97, 30, 50, 59.94, 60)
+
+
+def _comment(category: str, description: str, suggestion: str, severity: str) -> dict:
+    """Build a structured comment anchored at the start of the video."""
+    return {
+        "timestamp": "00:00:00",
+        "timestamp_sec": 0,
+        "category": category,
+        "description": description,
+        "suggestion": suggestion,
+        "severity": severity
+    }
+
+
+def _check_resolution(metadata: dict) -> List[dict]:
+    width = metadata.get("width")
+    height = metadata.get("height")
+    if not width or not height:
+        return []
+    # Portrait deliveries are checked against the rotated minimum
+    long_side, short_side = max(width, height), min(width, height)
+    if long_side < MIN_WIDTH or short_side < MIN_HEIGHT:
+        return [_comment(
+            "Technical",
+            f"Resolution {width}x{height} is below the {MIN_WIDTH}x{MIN_HEIGHT} minimum",
+            "Re-export at 1920x1080 (or 1080x1920 for vertical) or higher",
+            "error"
+        )]
+    return []
+
+
+def _check_fps(metadata: dict) -> List[dict]:
+    fps = metadata.get("fps")
+    if not fps:
+        return []
+    if not any(abs(fps - standard) < 0.01 for standard in STANDARD_FPS):
+        return [_comment(
+            "Technical",
+            f"Non-standard frame rate: {fps} fps",
+            "Conform to a standard delivery frame rate (24, 25, 30, 60...)",
+            "warning"
+        )]
+    return []
+
+
+def _check_audio(metadata: dict) -> List[dict]:
+    if metadata.get("audio") is False:
+        return [_comment(
+            "Audio",
+            "No audio track found",
+            "Check that the audio was included in the export",
+            "warning"
+        )]
+    return []
+
+
+def run_technical_checks(job: Dict[str, Any]) -> dict:
+    """
+    Run the local technical checks for a job.
+
+    Uses the probed ``video_metadata`` on the job when available. Returns a
+    qc_result in the structured { comments, summary } format.
+    """
+    metadata = job.get("video_metadata") or {}
+
+    comments = []
+    comments.extend(_check_resolution(metadata))
+    comments.extend(_check_fps(metadata))
+    comments.extend(_check_audio(metadata))
+
+    by_category = {}
+    for comment in comments:
+        cat = comment["category"]
+        by_category[cat] = by_category.get(cat, 0) + 1
+
+    return {
+        "comments": comments,
+        "summary": {
+            "total_issues": len(comments),
+            "by_category": by_category
+        },
+        "qc_mode": job.get("qc_mode"),
+        "source": "local_processor"
+    }
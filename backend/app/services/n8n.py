@@ -2,29 +2,86 @@
 n8n Integration Service
 
 Handles communication between QC Lobby backend and n8n workflows.
-- Sends job requests to n8n webhook
+- Sends job requests to a pool of n8n webhooks (least-outstanding routing,
+  retried with jittered backoff, guarded by a circuit breaker). Only
+  failures where n8n cannot have started the workflow are retried (see
+  _post_webhook), so a retry never runs a job twice.
 - Validates callbacks from n8n
 """
 
+import logging
+import time
 import httpx
+from functools import cached_property
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 from typing import Optional, Dict, Any
 from app.core.config import settings
+from app.core.metrics import N8N_DISPATCH_DURATION, N8N_DISPATCHES
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.n8n_pool import EndpointPool, NoEndpointAvailable
+from app.core.logger import get_logger, redact
+from app.core import tracing
+
+logger = get_logger(__name__)
+
+
+class N8NError(Exception):
+    """n8n rejected the job (bad request, inactive workflow, invalid response)."""
+
+
+class N8NTransientError(N8NError):
+    """n8n is unreachable or overloaded; the dispatch can be retried later."""
 
 
 class N8NService:
     """Service for communicating with n8n workflows."""
     
     def __init__(self):
-        self.webhook_url = settings.N8N_WEBHOOK_URL
-        self.api_key = settings.N8N_API_KEY
-        self.callback_base_url = settings.N8N_CALLBACK_BASE_URL
+        # Pool, breaker and client are built on first use, not at import
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @cached_property
+    def pool(self) -> EndpointPool:
+        return EndpointPool.from_settings(settings)
+    
+    @cached_property
+    def breaker(self) -> CircuitBreaker:
+        return CircuitBreaker(
+            "n8n",
+            failure_threshold=settings.N8N_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.N8N_BREAKER_RESET_SEC
+        )
+    
+    @property
+    def api_key(self) -> str:
+        return settings.N8N_API_KEY
+    
+    @property
+    def callback_base_url(self) -> Optional[str]:
+        return settings.N8N_CALLBACK_BASE_URL
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared client, so dispatches reuse connections to the n8n instances."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=60.0)  # Increased timeout for slower n8n workflows
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client (on shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     def _get_headers(self) -> Dict[str, str]:
-        """Get headers for n8n requests including auth."""
-        return {
+        """Get headers for n8n requests including auth and trace context."""
+        headers = {
             "Content-Type": "application/json",
             "X-API-Key": self.api_key
         }
+        traceparent = tracing.traceparent()
+        if traceparent:
+            headers["traceparent"] = traceparent
+        return headers
     
     async def trigger_qc_job(
         self,
@@ -33,7 +90,8 @@ class N8NService:
         qc_mode: str,
         duration_sec: int,
         team_id: str,
-        thumbnail_url: Optional[str] = None
+        thumbnail_url: Optional[str] = None,
+        segment: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Trigger a QC job in n8n.
@@ -45,9 +103,16 @@ class N8NService:
             duration_sec: Video duration in seconds
             team_id: Team identifier
             thumbnail_url: Optional thumbnail image URL
+            segment: For segment sub-jobs: start_sec/end_sec (the time range
+                to check), segment_index, segment_count and parent_job_id
             
         Returns:
             Response from n8n webhook
+            
+        Raises:
+            CircuitOpenError: n8n is considered down, dispatch later
+            N8NTransientError: n8n still unavailable after all retries
+            N8NError: n8n rejected the job
         """
         payload = {
             "job_id": job_id,
@@ -60,6 +125,15 @@ class N8NService:
         if thumbnail_url:
             payload["thumbnail_url"] = thumbnail_url
         
+        # Segment sub-job: only QC [start_sec, end_sec) of the video
+        if segment:
+            payload.update(segment)
+        
+        # n8n should echo trace_id back on its callbacks
+        trace_id = tracing.current_trace_id()
+        if trace_id:
+            payload["trace_id"] = trace_id
+        
         # Add callback URLs if configured
         if self.callback_base_url:
             payload["callback_urls"] = {
@@ -68,51 +142,121 @@ class N8NService:
                 "failed": f"{self.callback_base_url}/v1/callbacks/n8n/failed"
             }
         
-        print(f"[n8n] Sending request to: {self.webhook_url}")
-        print(f"[n8n] Payload: {payload}")
-        print(f"[n8n] Headers: {self._get_headers()}")
+        if not self.breaker.allow_request():
+            N8N_DISPATCHES.labels(outcome="circuit_open").inc()
+            raise CircuitOpenError(
+                f"n8n circuit is open, retry in {self.breaker.retry_after():.0f}s"
+            )
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("n8n payload", extra={"payload": redact(payload)})
+        
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(settings.N8N_RETRY_ATTEMPTS),
+            wait=wait_random_exponential(multiplier=0.5, max=settings.N8N_RETRY_MAX_WAIT_SEC),
+            retry=retry_if_exception_type(N8NTransientError),
+            reraise=True
+        )
+        async for attempt in retrying:
+            with attempt:
+                try:
+                    endpoint = self.pool.choose(qc_mode)
+                except NoEndpointAvailable as e:
+                    raise N8NTransientError(str(e))
+                
+                logger.debug("Sending request to %s", endpoint.url)
+                endpoint.in_flight += 1
+                outcome = "ok"
+                started = time.perf_counter()
+                try:
+                    with tracing.span("n8n.dispatch", endpoint=endpoint.url,
+                                      attempt=attempt.retry_state.attempt_number):
+                        result = await self._post_webhook(endpoint.url, payload)
+                except N8NTransientError as e:
+                    outcome = "transient_error"
+                    self.pool.record_failure(endpoint)
+                    self.breaker.record_failure()
+                    logger.warning("Attempt %d failed: %s", attempt.retry_state.attempt_number, e)
+                    # Stop hammering n8n as soon as the breaker trips
+                    if not self.breaker.allow_request():
+                        raise CircuitOpenError(f"n8n circuit opened: {e}")
+                    raise
+                except N8NError:
+                    outcome = "rejected"
+                    raise
+                finally:
+                    endpoint.in_flight -= 1
+                    N8N_DISPATCH_DURATION.labels(outcome=outcome).observe(time.perf_counter() - started)
+                    N8N_DISPATCHES.labels(outcome=outcome).inc()
+                self.pool.record_success(endpoint)
         
+        self.breaker.record_success()
+        return result
+    
+    async def _post_webhook(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        POST one job payload to a webhook endpoint and interpret the response.
+        
+        Outcomes by failure, depending on whether n8n may have received the job:
+        - not received (retryable, N8NTransientError): connect errors and
+          timeouts, no free pooled connection, the request body not fully
+          sent, and 429 / 502 / 503 responses
+        - received and still running: read timeout or 504 (acknowledged,
+          the callback settles the job)
+        - unknown (N8NError, not retried): the connection dropped after the
+          request was sent, or any other 5xx; the job fails, and a late
+          callback for it is ignored
+
+        Raises:
+            N8NTransientError: n8n did not receive the job (retryable)
+            N8NError: any other rejection
+        """
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:  # Increased timeout for slower n8n workflows
-                response = await client.post(
-                    self.webhook_url,
-                    json=payload,
-                    headers=self._get_headers()
-                )
-        except httpx.TimeoutException:
+            response = await self._get_client().post(
+                url,
+                json=payload,
+                headers=self._get_headers()
+            )
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.WriteError, httpx.WriteTimeout) as e:
+            # Never reached the instance (or not the whole request) - retryable, and counts against it
+            raise N8NTransientError(f"n8n unreachable: {type(e).__name__}: {e}")
+        except httpx.ReadTimeout:
             # n8n workflow takes longer than timeout - this is okay!
             # n8n is still processing and will send callback when done
-            print(f"[n8n] Request timed out - n8n is likely still processing, will receive callback later")
+            logger.info("Request timed out - n8n is likely still processing, will receive callback later")
             return {"status": "acknowledged", "message": "n8n request timed out but likely processing"}
         except httpx.RequestError as e:
-            # Network error - this is a real failure
-            print(f"[n8n] Network error: {e}")
-            raise Exception(f"n8n network error: {e}")
+            # Dropped after the request went out: n8n may be running it, so no retry
+            raise N8NError(f"n8n connection lost after sending the job: {type(e).__name__}: {e}")
         
-        print(f"[n8n] Response status: {response.status_code}")
-        print(f"[n8n] Response body: {response.text[:500] if response.text else '(empty)'}")
+        logger.debug("n8n response %d", response.status_code, extra={"body": response.text[:500]})
         
         # n8n should respond with acknowledgment or QC results
+        if response.status_code in (429, 502, 503):
+            raise N8NTransientError(f"n8n webhook unavailable: {response.status_code} - {response.text[:200]}")
+        if response.status_code == 504:
+            logger.info("Gateway timed out - n8n is likely still processing, will receive callback later")
+            return {"status": "acknowledged", "message": "n8n gateway timed out but likely processing"}
         if response.status_code >= 400:
-            raise Exception(f"n8n webhook failed: {response.status_code} - {response.text}")
+            raise N8NError(f"n8n webhook failed: {response.status_code} - {response.text}")
         
         # n8n might return empty body on success (just acknowledgment)
         if not response.text or response.text.strip() == "":
-            print(f"[n8n] Empty response (accepted as acknowledgment)")
+            logger.debug("Empty response (accepted as acknowledgment)")
             return {"status": "acknowledged", "message": "n8n accepted the request"}
         
         try:
             response_json = response.json()
         except Exception:
             # If n8n returns non-JSON, it's likely an HTML error page or raw text
-            raise Exception(
+            raise N8NError(
                 f"n8n returned invalid response: {response.text[:200]}"
             )
 
         # If n8n returns the QC results directly (synchronous workflow), 
         # that's valid - just acknowledge and return
         if isinstance(response_json, list):
-            print(f"[n8n] Received QC results directly ({len(response_json)} items) - workflow is synchronous")
+            logger.info("Received QC results directly (%d items) - workflow is synchronous", len(response_json))
             return {"status": "acknowledged", "message": "n8n returned results directly", "results": response_json}
         
         # Check for logical errors in the response body
@@ -120,8 +264,8 @@ class N8NService:
         if isinstance(response_json, dict):
             # Check for error messages
             if response_json.get("message") and "error" in str(response_json.get("message")).lower():
-                print(f"[n8n] Logical error in response: {response_json}")
-                raise Exception(f"n8n workflow error: {response_json.get('message')}")
+                logger.warning("Logical error in response", extra={"response": response_json})
+                raise N8NError(f"n8n workflow error: {response_json.get('message')}")
             # Any other dict response is fine (could be acknowledgment or status)
             return response_json
         
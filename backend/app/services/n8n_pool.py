@@ -0,0 +1,151 @@
+"""
+n8n Endpoint Pool
+
+Spreads QC dispatches over several n8n webhook endpoints:
+- least-outstanding-requests routing (in-flight count / weight)
+- optional per-qc_mode assignment of endpoints
+- passive ejection after consecutive errors or connect timeouts
+- active health checks against each instance's /healthz
+"""
+
+import asyncio
+import random
+import time
+import httpx
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from app.core.lifecycle import wait_or_stop
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Endpoint:
+    url: str
+    weight: float = 1.0
+    qc_modes: Optional[List[str]] = None  # None means every mode
+    health_url: Optional[str] = None
+    in_flight: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+    healthy: bool = True  # Result of the last active health check
+
+    def __post_init__(self):
+        if self.health_url is None:
+            parts = urlsplit(self.url)
+            self.health_url = f"{parts.scheme}://{parts.netloc}/healthz"
+
+    def serves(self, qc_mode: Optional[str]) -> bool:
+        return self.qc_modes is None or qc_mode is None or qc_mode in self.qc_modes
+
+    def is_up(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+
+class NoEndpointAvailable(Exception):
+    """Every endpoint for the requested qc_mode is ejected or unhealthy."""
+
+
+class EndpointPool:
+    """Health-aware pool of n8n webhook endpoints."""
+
+    def __init__(self, endpoints: List[Endpoint], eject_after_failures: int, eject_sec: float):
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.eject_after_failures = eject_after_failures
+        self.eject_sec = eject_sec
+
+    @classmethod
+    def from_settings(cls, settings) -> "EndpointPool":
+        """Build the pool from N8N_ENDPOINTS, falling back to N8N_WEBHOOK_URL."""
+        configs: List[Dict[str, Any]] = settings.N8N_ENDPOINTS or [{"url": settings.N8N_WEBHOOK_URL}]
+        endpoints = [
+            Endpoint(
+                url=config["url"],
+                weight=float(config.get("weight", 1.0)),
+                qc_modes=config.get("qc_modes"),
+                health_url=config.get("health_url"),
+            )
+            for config in configs
+        ]
+        return cls(endpoints, settings.N8N_EJECT_AFTER_FAILURES, settings.N8N_EJECT_SEC)
+
+    def has_available(self, qc_mode: Optional[str] = None) -> bool:
+        now = time.monotonic()
+        return any(ep.serves(qc_mode) and ep.is_up(now) for ep in self.endpoints)
+
+    def choose(self, qc_mode: Optional[str] = None) -> Endpoint:
+        """
+        Pick the eligible endpoint with the fewest in-flight requests per
+        unit of weight; ties are broken randomly.
+
+        Raises:
+            NoEndpointAvailable: nothing is up for this qc_mode
+        """
+        now = time.monotonic()
+        candidates = [ep for ep in self.endpoints if ep.serves(qc_mode) and ep.is_up(now)]
+        if not candidates:
+            raise NoEndpointAvailable(f"No healthy n8n endpoint for qc_mode={qc_mode}")
+        best_score = min((ep.in_flight + 1) / ep.weight for ep in candidates)
+        best = [ep for ep in candidates if (ep.in_flight + 1) / ep.weight == best_score]
+        return random.choice(best)
+
+    def record_success(self, endpoint: Endpoint) -> None:
+        endpoint.consecutive_failures = 0
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.eject_after_failures:
+            endpoint.ejected_until = time.monotonic() + self.eject_sec
+            endpoint.consecutive_failures = 0
+            logger.warning("Ejected %s for %.0fs", endpoint.url, self.eject_sec)
+
+    async def check_health(self) -> None:
+        """Probe every endpoint's health URL once."""
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            results = await asyncio.gather(
+                *[client.get(ep.health_url) for ep in self.endpoints],
+                return_exceptions=True
+            )
+        for endpoint, result in zip(self.endpoints, results):
+            # Only a 2xx counts: a 404 means the URL isn't an n8n instance
+            healthy = not isinstance(result, Exception) and result.is_success
+            if healthy and not endpoint.healthy:
+                logger.info("%s is healthy again", endpoint.url)
+                endpoint.ejected_until = 0.0
+            elif not healthy and endpoint.healthy:
+                logger.warning("%s failed health check", endpoint.url)
+            endpoint.healthy = healthy
+
+    async def run_health_checks(self, interval: float, stop_event: Optional[asyncio.Event] = None) -> None:
+        """Background loop running check_health() every `interval` seconds until stop_event is set."""
+        while True:
+            try:
+                await self.check_health()
+            except Exception:
+                logger.exception("Health check error")
+            if await wait_or_stop(stop_event, interval):
+                return
+
+    def snapshot(self) -> List[dict]:
+        """
+        Current state of every endpoint (for health/metrics endpoints).
+        Endpoints are identified by index and host only: webhook paths are
+        secrets.
+        """
+        now = time.monotonic()
+        return [
+            {
+                "index": index,
+                "host": urlsplit(ep.url).hostname,
+                "weight": ep.weight,
+                "qc_modes": ep.qc_modes,
+                "in_flight": ep.in_flight,
+                "healthy": ep.healthy,
+                "ejected": now < ep.ejected_until,
+            }
+            for index, ep in enumerate(self.endpoints)
+        ]
@@ -0,0 +1,362 @@
+"""
+Video Probe Service
+
+Reads technical metadata from a video's container headers using HTTP range
+requests, without downloading the file:
+- MP4/MOV (ISO BMFF): ftyp + moov atoms (duration, resolution, fps, codecs, audio)
+
+Results are cached by (video_url, ETag) so re-probing an unchanged file
+costs a single small range request.
+"""
+
+import math
+import struct
+import httpx
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.core.cache import CacheBackend, cache_key, create_cache
+from app.core.outbound import UnsafeURL, check_url_async
+
+
+# Size of the first range read; usually covers ftyp and a front-loaded moov
+HEAD_CHUNK_SIZE = 64 * 1024
+# Refuse to fetch absurdly large moov atoms (corrupt size fields)
+MAX_MOOV_SIZE = 32 * 1024 * 1024
+# Max top-level boxes to walk before giving up
+MAX_TOP_LEVEL_BOXES = 64
+# Redirect hops followed per range read (each one is checked)
+MAX_REDIRECTS = 5
+
+# Box types that may legitimately start an ISO BMFF file
+ISO_BMFF_LEADING_BOXES = {b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"}
+# Boxes we descend into while parsing moov
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class ProbeError(Exception):
+    """The video is unreachable, corrupt, or does not match the job."""
+
+
+class ProbeUnavailable(Exception):
+    """The probe could not run (network/server error). Not the video's fault."""
+
+
+# ============================================
+# Range reads
+# ============================================
+
+async def read_range(client: httpx.AsyncClient, url: str, start: int, length: int) -> Tuple[bytes, Optional[int], Optional[str]]:
+    """
+    Fetch `length` bytes at `start`.
+
+    Returns:
+        (data, total_size, etag). Servers that ignore Range are read only up
+        to `length` bytes so the file is never fully downloaded.
+
+    Raises:
+        ProbeError: the URL or a redirect points at a non-public address
+    """
+    headers = {"Range": f"bytes={start}-{start + length - 1}"}
+    try:
+        # Redirects are followed here so every hop's host is checked
+        for _ in range(MAX_REDIRECTS + 1):
+            try:
+                await check_url_async(url)
+            except UnsafeURL as e:
+                raise ProbeError(f"Video URL not allowed: {e}")
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.is_redirect:
+                    location = response.headers.get("location")
+                    if not location:
+                        raise ProbeError("Video URL redirects without a Location")
+                    url = str(response.url.join(location))
+                    continue
+                return await _read_body(response, start, length)
+        raise ProbeError("Video URL redirects too many times")
+    except httpx.RequestError as e:
+        raise ProbeUnavailable(f"Network error while probing: {e}")
+
+
+async def _read_body(response: httpx.Response, start: int, length: int) -> Tuple[bytes, Optional[int], Optional[str]]:
+    if response.status_code in (401, 403, 404, 410):
+        raise ProbeError(f"Video URL returned {response.status_code}")
+    if response.status_code >= 400:
+        raise ProbeUnavailable(f"Video host returned {response.status_code}")
+
+    total = None
+    content_range = response.headers.get("content-range")
+    if content_range and "/" in content_range:
+        total_str = content_range.rsplit("/", 1)[1]
+        total = int(total_str) if total_str.isdigit() else None
+    elif response.status_code == 200 and response.headers.get("content-length", "").isdigit():
+        total = int(response.headers["content-length"])
+
+    chunks = []
+    received = 0
+    # A 200 means the server ignored Range; skip to `start` ourselves
+    skip = start if response.status_code == 200 else 0
+    async for chunk in response.aiter_bytes():
+        if skip:
+            if len(chunk) <= skip:
+                skip -= len(chunk)
+                continue
+            chunk = chunk[skip:]
+            skip = 0
+        chunks.append(chunk)
+        received += len(chunk)
+        if received >= length:
+            break
+    data = b"".join(chunks)[:length]
+    return data, total, response.headers.get("etag")
+
+
+# ============================================
+# ISO BMFF parsing
+# ============================================
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, payload_start, box_end) for boxes fully contained in data[start:end]."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ProbeError(f"Corrupt '{box_type.decode('latin-1')}' box")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _parse_mvhd(data: bytes, pos: int) -> Tuple[int, int]:
+    version = data[pos]
+    if version == 1:
+        timescale, duration = struct.unpack(">IQ", data[pos + 20:pos + 32])
+    else:
+        timescale, duration = struct.unpack(">II", data[pos + 12:pos + 20])
+    return timescale, duration
+
+
+def _parse_tkhd(data: bytes, pos: int) -> Tuple[int, int]:
+    version = data[pos]
+    # width/height are 16.16 fixed point at the end of the box
+    offset = pos + (88 if version == 1 else 76)
+    width, height = struct.unpack(">II", data[offset:offset + 8])
+    return width >> 16, height >> 16
+
+
+def _parse_trak(data: bytes, start: int, end: int) -> dict:
+    """Collect the fields we need from one trak box."""
+    track = {}
+    stack = [(start, end)]
+    while stack:
+        s, e = stack.pop()
+        for box_type, pos, box_end in _iter_boxes(data, s, e):
+            if box_type in CONTAINER_BOXES:
+                stack.append((pos, box_end))
+            elif box_type == b"tkhd":
+                track["width"], track["height"] = _parse_tkhd(data, pos)
+            elif box_type == b"mdhd":
+                track["timescale"], track["duration"] = _parse_mvhd(data, pos)
+            elif box_type == b"hdlr":
+                track["handler"] = data[pos + 8:pos + 12]
+            elif box_type == b"stsd":
+                entry_count = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+                if entry_count:
+                    track["codec"] = data[pos + 12:pos + 16].decode("latin-1").strip()
+            elif box_type == b"stts":
+                entry_count = struct.unpack(">I", data[pos + 4:pos + 8])[0]
+                samples = 0
+                for i in range(entry_count):
+                    offset = pos + 8 + i * 8
+                    samples += struct.unpack(">I", data[offset:offset + 4])[0]
+                track["sample_count"] = samples
+    return track
+
+
+def parse_moov(moov: bytes, brand: Optional[str] = None) -> dict:
+    """
+    Parse a complete moov box (header included) into technical metadata.
+
+    Returns:
+        Dict with container, duration_sec, width, height, fps, video_codec,
+        audio_codec and audio.
+    """
+    boxes = list(_iter_boxes(moov))
+    if not boxes or boxes[0][0] != b"moov":
+        raise ProbeError("Missing moov atom")
+    _, moov_start, moov_end = boxes[0]
+
+    duration_sec = None
+    tracks: List[dict] = []
+    for box_type, pos, box_end in _iter_boxes(moov, moov_start, moov_end):
+        if box_type == b"mvhd":
+            timescale, duration = _parse_mvhd(moov, pos)
+            if timescale:
+                duration_sec = duration / timescale
+        elif box_type == b"trak":
+            tracks.append(_parse_trak(moov, pos, box_end))
+
+    video = next((t for t in tracks if t.get("handler") == b"vide"), None)
+    audio = next((t for t in tracks if t.get("handler") == b"soun"), None)
+    if video is None and audio is None:
+        raise ProbeError("No audio or video tracks found")
+
+    metadata = {
+        "container": "mov" if brand == "qt" else "mp4",
+        "duration_sec": round(duration_sec, 3) if duration_sec is not None else None,
+        "width": None,
+        "height": None,
+        "fps": None,
+        "video_codec": None,
+        "audio_codec": audio.get("codec") if audio else None,
+        "audio": audio is not None,
+    }
+    if video:
+        metadata["width"] = video.get("width")
+        metadata["height"] = video.get("height")
+        metadata["video_codec"] = video.get("codec")
+        if video.get("timescale") and video.get("duration") and video.get("sample_count"):
+            track_seconds = video["duration"] / video["timescale"]
+            metadata["fps"] = round(video["sample_count"] / track_seconds, 3)
+    return metadata
+
+
+# ============================================
+# Probe service
+# ============================================
+
+class VideoProbe:
+    """Range-request prober with a (url, etag) keyed result cache."""
+
+    def __init__(self, cache_size: int = 1024, cache_ttl: float = 24 * 3600):
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+        self._backend: Optional[CacheBackend] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def _cache(self) -> CacheBackend:
+        if self._backend is None:
+            self._backend = create_cache("probe", maxsize=self._cache_size, ttl=self._cache_ttl)
+        return self._backend
+
+    def client(self) -> httpx.AsyncClient:
+        """Shared client for range reads (also used for fingerprinting)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=settings.PROBE_TIMEOUT_SEC, follow_redirects=False)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def probe(self, video_url: str) -> Optional[dict]:
+        """
+        Probe a video URL.
+
+        Returns:
+            Metadata dict, or None if the container is not MP4/MOV.
+
+        Raises:
+            ProbeError: the file is unreachable or corrupt
+            ProbeUnavailable: transient network/server problem
+        """
+        client = self.client()
+        head, total, etag = await read_range(client, video_url, 0, HEAD_CHUNK_SIZE)
+
+        key = cache_key(video_url, etag)
+        if etag:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+
+        if len(head) < 8 or head[4:8] not in ISO_BMFF_LEADING_BOXES:
+            return None
+
+        moov, brand = await self._find_moov(client, video_url, head, total)
+        try:
+            metadata = parse_moov(moov, brand)
+        except (struct.error, IndexError):
+            # Field reads past the end of a short box
+            raise ProbeError("Corrupt container: truncated box in moov")
+
+        if etag:
+            self._cache.set(key, metadata)
+        return metadata
+
+    async def _find_moov(self, client: httpx.AsyncClient, url: str, head: bytes, total: Optional[int]) -> Tuple[bytes, Optional[str]]:
+        """Walk top-level box headers (range-reading as needed) until moov is found."""
+        brand = None
+        offset = 0
+        for _ in range(MAX_TOP_LEVEL_BOXES):
+            if total is not None and offset >= total:
+                break
+            if offset + 16 <= len(head):
+                header = head[offset:offset + 16]
+            else:
+                header, _, _ = await read_range(client, url, offset, 16)
+            if len(header) < 8:
+                break
+
+            size, box_type = struct.unpack(">I4s", header[:8])
+            if size == 1:
+                if len(header) < 16:
+                    break
+                size = struct.unpack(">Q", header[8:16])[0]
+            elif size == 0:
+                if total is None:
+                    break
+                size = total - offset
+            if size < 8:
+                raise ProbeError("Corrupt container: invalid box size")
+
+            if box_type == b"ftyp" and offset + 12 <= len(head):
+                brand = head[offset + 8:offset + 12].decode("latin-1").strip()
+            elif box_type == b"moov":
+                if size > MAX_MOOV_SIZE:
+                    raise ProbeError("Corrupt container: moov atom too large")
+                if offset + size <= len(head):
+                    return head[offset:offset + size], brand
+                moov, _, _ = await read_range(client, url, offset, size)
+                if len(moov) < size:
+                    raise ProbeError("Truncated moov atom")
+                return moov, brand
+
+            offset += size
+
+        raise ProbeError("No moov atom found (file truncated or not a valid MP4/MOV)")
+
+    async def probe_job(self, job: dict) -> Optional[dict]:
+        """
+        Probe stage for the dispatcher: probe the job's video and check the
+        declared duration_sec (which credits are billed on) against it.
+
+        Raises:
+            ProbeError: the upload is corrupt or misbilled
+        """
+        metadata = await self.probe(job["video_url"])
+        if not metadata or metadata.get("duration_sec") is None:
+            return metadata
+
+        actual = math.ceil(metadata["duration_sec"])
+        declared = job["duration_sec"]
+        if abs(actual - declared) > settings.PROBE_DURATION_TOLERANCE_SEC:
+            raise ProbeError(
+                f"Declared duration {declared}s does not match the video duration {actual}s"
+            )
+        return metadata
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# Singleton instance
+video_probe = VideoProbe()
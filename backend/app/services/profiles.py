@@ -0,0 +1,128 @@
+"""
+Profiles
+
+Onboarding and the cached profile read behind GET /v1/profile, which every
+dashboard load calls.
+
+onboard() is one call to the onboard_user Postgres function (see
+migrations/versions/0009_onboarding.sql), which creates the team, the user
+and the trial credit grant in one transaction, or returns the existing
+profile.
+
+The profile is cached in two parts so each change invalidates one key:
+- ("user", user_id): email, team_id, plan_type (plan changes)
+- ("team", team_id): team name and available credits (credit movements,
+  see app.services.credits)
+A miss on either re-reads both with the embedded users/teams query, from
+a read replica unless the user or their team wrote recently
+(app.core.db_router).
+"""
+
+from typing import Optional
+from app.core.cache import CacheBackend, cache_key, create_cache
+from app.core.config import settings
+from app.core.db_router import db_router
+from app.core.supabase import supabase, with_retry
+
+
+@with_retry()
+def _rpc_onboard(user_id: str, email: Optional[str], plan_type: str, team_name: str, trial_credits: int):
+    """Create (or get) a user's profile, team and trial credits with retry on transient failures."""
+    return supabase.rpc("onboard_user", {
+        "p_user_id": user_id,
+        "p_email": email,
+        "p_plan_type": plan_type,
+        "p_team_name": team_name,
+        "p_trial_credits": trial_credits,
+    }).execute()
+
+
+@with_retry()
+def _query_profile(user_id: str, primary: bool = False):
+    """Get a user with their team (from a read replica) with retry on transient failures."""
+    return (
+        (supabase if primary else db_router.reader(user_id))
+        .table("users")
+        .select("email, team_id, plan_type, teams(*)")
+        .eq("id", user_id)
+        .execute()
+    )
+
+
+# Profile of a user without a team
+_NO_TEAM = {"team_name": None, "credits": 0}
+
+_cache: Optional[CacheBackend] = None
+
+
+def _get_cache() -> Optional[CacheBackend]:
+    global _cache
+    if settings.PROFILE_CACHE_TTL_SEC <= 0:
+        return None
+    if _cache is None:
+        _cache = create_cache(
+            "profiles",
+            maxsize=settings.PROFILE_CACHE_MAX_ENTRIES,
+            ttl=settings.PROFILE_CACHE_TTL_SEC
+        )
+    return _cache
+
+
+def onboard(user_id: str, email: Optional[str], plan_type: str, team_name: str, trial_credits: int) -> dict:
+    """
+    Onboard a user in one round trip. Idempotent: an existing user gets
+    their profile back with is_new_user False.
+
+    Returns:
+        {team_id, plan_type, credits, is_new_user}
+    """
+    row = _rpc_onboard(user_id, email, plan_type, team_name, trial_credits).data[0]
+    if row["is_new_user"]:
+        invalidate_user(user_id)
+        db_router.wrote(user_id, row["team_id"])
+    return row
+
+
+def profile(user_id: str) -> Optional[dict]:
+    """
+    A user's profile with their team (email, team_id, plan_type, team_name,
+    credits), None if they haven't onboarded.
+    """
+    cache = _get_cache()
+    user_key = cache_key("user", user_id)
+    if cache is not None:
+        user = cache.get(user_key)
+        if user is not None:
+            team = cache.get(cache_key("team", user["team_id"])) if user["team_id"] else _NO_TEAM
+            if team is not None:
+                return {**user, **team}
+
+    rows = _query_profile(user_id).data
+    if rows and db_router.sticky(rows[0].get("team_id")):
+        # The team wrote since: the replica may not have it yet
+        rows = _query_profile(user_id, primary=True).data
+    if not rows:
+        return None
+    row = rows[0]
+    user = {"email": row.get("email"), "team_id": row.get("team_id"), "plan_type": row.get("plan_type")}
+    team_data = row.get("teams")
+    team = {"team_name": team_data.get("name"), "credits": team_data.get("credits") or 0} if team_data else _NO_TEAM
+    if cache is not None:
+        cache.set(user_key, user)
+        if user["team_id"]:
+            cache.set(cache_key("team", user["team_id"]), team)
+    return {**user, **team}
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop a user's cached profile (after their plan or team changes)."""
+    cache = _get_cache()
+    if cache is not None:
+        cache.delete(cache_key("user", user_id))
+
+
+def invalidate_team(team_id: str) -> None:
+    """Drop a team's cached name and credits (after a credit movement)."""
+    cache = _get_cache()
+    if cache is not None:
+        cache.delete(cache_key("team", team_id))
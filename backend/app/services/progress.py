@@ -0,0 +1,179 @@
+"""
+Job Progress
+
+n8n can report progress many times a second per job. Reports are kept in
+memory per job and written in bulk with qc_jobs_set_progress (see
+migrations/versions/0008_job_progress.sql):
+
+- a report that moves a job's value by PROGRESS_FLUSH_DELTA points or more
+  since its last write (or is its first) flushes every pending report
+- the rest are flushed by the progress flusher every
+  PROGRESS_FLUSH_INTERVAL_MS, and on shutdown
+- job reads overlay the latest in-memory value on active jobs, so pollers
+  see it before it is written
+- when a job finishes its entry is dropped; a failed job's last value is
+  written first (completion sets progress to 100 in the database)
+
+The memory is per process: another API instance serves the stored value,
+at most one flush interval old.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.core.supabase import supabase, with_retry
+from app.core.config import settings
+from app.core.lifecycle import wait_or_stop
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Entries not reported to for this long are dropped (jobs finished elsewhere)
+IDLE_ENTRY_SEC = 3600.0
+
+
+@with_retry()
+def _rpc_set_progress(rows: List[dict]):
+    """Write the progress of active jobs in bulk with retry on transient failures."""
+    return supabase.rpc("qc_jobs_set_progress", {"p_jobs": rows}).execute()
+
+
+@with_retry()
+def _update_progress(job_id: str, progress: int, message: Optional[str]):
+    """Write a finished job's last progress with retry on transient failures."""
+    return supabase.table("qc_jobs").update({
+        "progress": progress,
+        "progress_message": message,
+        "progress_updated_at": datetime.now(timezone.utc).isoformat()
+    }).eq("id", job_id).execute()
+
+
+@dataclass
+class _Progress:
+    progress: int
+    message: Optional[str]
+    updated_at: str  # When it was reported (served to readers)
+    reported: float  # time.monotonic() of the report
+    flushed: Optional[int] = None  # Last value written
+    dirty: bool = True
+
+
+class ProgressCoalescer:
+    """Latest progress per job, written in bulk (see module docstring)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Progress] = {}
+
+    def tracking(self, job_id: str) -> bool:
+        """Whether the job has reported progress (and is known to be active)."""
+        return job_id in self._entries
+
+    def report(self, job_id: str, progress: int, message: Optional[str] = None) -> bool:
+        """
+        Record a job's progress.
+
+        Returns:
+            True if a flush is due (the caller flushes, once per request)
+        """
+        progress = min(max(progress, 0), 100)
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                entry = self._entries[job_id] = _Progress(progress, message, now, time.monotonic())
+            else:
+                entry.progress, entry.message, entry.updated_at = progress, message, now
+                entry.reported = time.monotonic()
+                entry.dirty = True
+            return entry.flushed is None or abs(progress - entry.flushed) >= settings.PROGRESS_FLUSH_DELTA
+
+    def flush(self) -> int:
+        """Write every pending report in one call; returns how many were written."""
+        with self._lock:
+            rows = []
+            for job_id, entry in self._entries.items():
+                if entry.dirty:
+                    entry.dirty = False
+                    rows.append({"id": job_id, "progress": entry.progress, "message": entry.message})
+        if not rows:
+            return 0
+
+        try:
+            updated = {str(job_id) for job_id in _rpc_set_progress(rows).data or []}
+        except Exception:
+            logger.exception("Could not write the progress of %d jobs", len(rows))
+            with self._lock:
+                for row in rows:
+                    entry = self._entries.get(row["id"])
+                    if entry is not None:
+                        entry.dirty = True
+            return 0
+
+        with self._lock:
+            for row in rows:
+                if row["id"] not in updated:
+                    # Finished (or gone) without us seeing it: stop tracking
+                    self._entries.pop(row["id"], None)
+                    continue
+                entry = self._entries.get(row["id"])
+                if entry is not None:
+                    entry.flushed = row["progress"]
+        return len(updated)
+
+    def finish(self, job_id: str, completed: bool) -> None:
+        """
+        Drop a job that reached a final state. A failed job keeps the last
+        progress it reported, written here if it wasn't already.
+        """
+        with self._lock:
+            entry = self._entries.pop(job_id, None)
+        if entry is None or completed or entry.flushed == entry.progress:
+            return
+        _update_progress(job_id, entry.progress, entry.message)
+
+    def overlay(self, jobs: List[dict]) -> List[dict]:
+        """
+        Jobs with the latest in-memory progress on active ones. Rows are
+        copied, never modified (they may be shared through the job read cache).
+        """
+        if not self._entries:
+            return jobs
+        overlaid = []
+        with self._lock:
+            for job in jobs:
+                entry = self._entries.get(job.get("id"))
+                if entry is None or job.get("status") not in ("pending", "processing"):
+                    overlaid.append(job)
+                    continue
+                overlaid.append({
+                    **job,
+                    "progress": entry.progress,
+                    "progress_message": entry.message,
+                    "progress_updated_at": entry.updated_at,
+                })
+        return overlaid
+
+    def _drop_idle(self) -> None:
+        cutoff = time.monotonic() - IDLE_ENTRY_SEC
+        with self._lock:
+            for job_id in [j for j, e in self._entries.items() if not e.dirty and e.reported < cutoff]:
+                del self._entries[job_id]
+
+    async def run_flusher(self, interval: float, stop_event: Optional[asyncio.Event] = None) -> None:
+        """
+        Background loop flushing pending reports every `interval` seconds
+        until stop_event is set (shutdown flushes the rest).
+        """
+        while not await wait_or_stop(stop_event, interval):
+            try:
+                await asyncio.to_thread(self.flush)
+                self._drop_idle()
+            except Exception:
+                logger.exception("Progress flush error")
+
+
+job_progress = ProgressCoalescer()
@@ -0,0 +1,257 @@
+"""
+QC Backends
+
+Pluggable execution backends for QC jobs:
+- n8n: dispatches the job to the n8n webhook, results arrive via callbacks
+- mock: fake processing with a canned result (development)
+- local: runs the technical checks on an in-process worker pool
+
+Routing is by qc_mode (settings.QC_BACKEND_ROUTES) with a default backend
+for every mode that is not routed explicitly.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Protocol, Set
+from app.core.supabase import supabase
+from app.core.config import settings
+from app.services.n8n import n8n_service, N8NTransientError
+from app.services.circuit_breaker import CircuitOpenError
+from app.services.local_qc import run_technical_checks
+from app.services.job_events import on_job_completed, on_job_failed
+from app.services.segmenter import SegmentsUnavailable, dispatch_segments, should_segment
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BackendUnavailable(Exception):
+    """The backend is temporarily unavailable; the job should stay queued."""
+
+    def __init__(self, message: str, outage: bool = False):
+        super().__init__(message)
+        # The backend as a whole is down (circuit open, no endpoint left),
+        # so the attempt doesn't count against the job
+        self.outage = outage
+
+
+class QCBackend(Protocol):
+    """Interface every QC backend implements."""
+
+    name: str
+
+    def is_available(self) -> bool:
+        """False while the backend is known to be down (e.g. circuit open)."""
+        ...
+
+    async def submit(self, job: dict) -> bool:
+        """
+        Start processing a claimed job.
+
+        Returns:
+            True if the job was accepted, False if it could not be started
+
+        Raises:
+            BackendUnavailable: transient failure, requeue the job
+        """
+        ...
+
+    async def drain(self, timeout: float) -> None:
+        """Wait up to `timeout` seconds for jobs still running in this process."""
+        ...
+
+    def close(self) -> None:
+        """Release any resources held by the backend."""
+        ...
+
+
+class N8NBackend:
+    """
+    Dispatches jobs to the n8n workflow. Completion arrives via callbacks.
+    Long videos run as parallel segments (see app.services.segmenter).
+    """
+
+    name = "n8n"
+
+    def is_available(self) -> bool:
+        return n8n_service.breaker.allow_request() and n8n_service.pool.has_available()
+
+    async def submit(self, job: dict) -> bool:
+        if should_segment(job):
+            try:
+                return await dispatch_segments(job)
+            except SegmentsUnavailable as e:
+                raise BackendUnavailable(str(e), outage=not self.is_available())
+
+        try:
+            response = await n8n_service.trigger_qc_job(
+                job_id=job["id"],
+                video_url=job["video_url"],
+                qc_mode=job["qc_mode"],
+                duration_sec=job["duration_sec"],
+                team_id=job["team_id"],
+                thumbnail_url=job.get("thumbnail_url")
+            )
+            logger.info("Job dispatched to n8n", extra={"response": response})
+            return True
+        except (CircuitOpenError, N8NTransientError) as e:
+            outage = isinstance(e, CircuitOpenError) or not self.is_available()
+            raise BackendUnavailable(str(e), outage=outage)
+        except Exception as e:
+            logger.error("Failed to dispatch job to n8n: %s", e)
+            return False
+
+    async def drain(self, timeout: float) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MockBackend:
+    """Mock QC processing. Used when n8n is disabled."""
+
+    name = "mock"
+
+    def is_available(self) -> bool:
+        return True
+
+    async def submit(self, job: dict) -> bool:
+        # Simulate processing time
+        await asyncio.sleep(3)
+
+        # Generate mock QC result, using the probed metadata when available
+        metadata = job.get("video_metadata") or {}
+        resolution = "1920x1080"
+        if metadata.get("width") and metadata.get("height"):
+            resolution = f"{metadata['width']}x{metadata['height']}"
+        qc_result = {
+            "resolution": resolution,
+            "fps": metadata.get("fps") or 30,
+            "audio": metadata.get("audio", True),
+            "source": "mock_processor"
+        }
+
+        supabase.table("qc_jobs").update({
+            "status": "completed",
+            "qc_result": qc_result
+        }).eq("id", job["id"]).execute()
+        on_job_completed(job, qc_result)
+
+        logger.info("Job completed with mock result")
+        return True
+
+    async def drain(self, timeout: float) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class LocalProcessBackend:
+    """
+    Runs the local technical checks on a ProcessPoolExecutor.
+
+    submit() returns as soon as the job is queued on the pool; the job is
+    completed (or failed) in the background when the analysis finishes.
+    """
+
+    name = "local"
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers  # None: settings.LOCAL_QC_WORKERS
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def is_available(self) -> bool:
+        return True
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers or settings.LOCAL_QC_WORKERS)
+        return self._pool
+
+    async def submit(self, job: dict) -> bool:
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, job: dict) -> None:
+        job_id = job["id"]
+        loop = asyncio.get_running_loop()
+        try:
+            qc_result = await loop.run_in_executor(self._get_pool(), run_technical_checks, job)
+        except Exception as e:
+            logger.error("Local QC failed: %s", e)
+            qc_result = {"error": f"Local QC failed: {e}"}
+            supabase.table("qc_jobs").update({
+                "status": "failed",
+                "qc_result": qc_result
+            }).eq("id", job_id).execute()
+            on_job_failed(job, qc_result)
+            return
+
+        supabase.table("qc_jobs").update({
+            "status": "completed",
+            "qc_result": qc_result
+        }).eq("id", job_id).execute()
+        on_job_completed(job, qc_result)
+        logger.info("Local QC completed", extra={"total_issues": qc_result["summary"]["total_issues"]})
+
+    async def drain(self, timeout: float) -> None:
+        if self._tasks:
+            logger.info("Waiting for %d local QC jobs", len(self._tasks))
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _default_backend_name() -> str:
+    if settings.QC_DEFAULT_BACKEND:
+        return settings.QC_DEFAULT_BACKEND
+    return "n8n" if settings.USE_N8N_PROCESSING else "mock"
+
+
+class BackendRegistry:
+    """Holds the configured backends and routes jobs to them by qc_mode."""
+
+    def __init__(self):
+        self._backends: Dict[str, QCBackend] = {}
+
+    def register(self, backend: QCBackend) -> None:
+        self._backends[backend.name] = backend
+
+    def get(self, name: str) -> QCBackend:
+        if name not in self._backends:
+            raise ValueError(f"Unknown QC backend: {name}")
+        return self._backends[name]
+
+    def for_mode(self, qc_mode: str) -> QCBackend:
+        """Pick the backend for a qc_mode, falling back to the default."""
+        name = settings.QC_BACKEND_ROUTES.get(qc_mode, _default_backend_name())
+        return self.get(name)
+
+    def validate_routes(self) -> None:
+        """Raise ValueError if QC_BACKEND_ROUTES or the default name an unknown backend."""
+        names = {_default_backend_name(), *settings.QC_BACKEND_ROUTES.values()}
+        unknown = sorted(names - set(self._backends))
+        if unknown:
+            raise ValueError(f"Unknown QC backend(s) in QC_BACKEND_ROUTES/QC_DEFAULT_BACKEND: {', '.join(unknown)}")
+
+    async def drain(self, timeout: float) -> None:
+        await asyncio.gather(*(backend.drain(timeout) for backend in self._backends.values()))
+
+    def close(self) -> None:
+        for backend in self._backends.values():
+            backend.close()
+
+
+# Singleton instance
+qc_backends = BackendRegistry()
+qc_backends.register(N8NBackend())
+qc_backends.register(MockBackend())
+qc_backends.register(LocalProcessBackend())
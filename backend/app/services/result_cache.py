@@ -0,0 +1,128 @@
+"""
+QC Result Cache
+
+Caches normalized QC results keyed by (team, content fingerprint, qc_mode,
+workflow version) so a video the team re-submits completes immediately
+instead of running the n8n workflow again. Results never cross teams: a hit
+copies the original job's artifacts and id into the new job, and refunds
+the new job's credit reserve (see app.services.job_events).
+
+Results are stored when the n8n callback completes a job (API process) and
+looked up by the job processor (worker process), so with the worker split
+out (RUN_WORKER_IN_API=false) hits need CACHE_BACKEND=redis.
+
+The content fingerprint is a hash of the file size plus a handful of
+sampled byte ranges, read with HTTP range requests (no full download).
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.cache import CacheBackend, cache_key, create_cache
+from app.core.metrics import RESULT_CACHE_LOOKUPS
+from app.services.probe import read_range, video_probe, ProbeError
+
+
+# Number of evenly spaced samples (first and last included) and bytes per sample
+FINGERPRINT_SAMPLES = 8
+FINGERPRINT_SAMPLE_SIZE = 64 * 1024
+
+
+async def fingerprint_video(video_url: str) -> str:
+    """
+    Compute a sampled content fingerprint for a video URL.
+
+    Raises:
+        ProbeError / ProbeUnavailable: the video could not be read
+    """
+    client = video_probe.client()
+    head, total, _ = await read_range(client, video_url, 0, FINGERPRINT_SAMPLE_SIZE)
+    if total is None:
+        raise ProbeError("Video host did not report a content length")
+
+    offsets = []
+    if total > FINGERPRINT_SAMPLE_SIZE:
+        step = (total - FINGERPRINT_SAMPLE_SIZE) / (FINGERPRINT_SAMPLES - 1)
+        offsets = sorted({int(step * i) for i in range(1, FINGERPRINT_SAMPLES)})
+    samples = await asyncio.gather(*[
+        read_range(client, video_url, offset, FINGERPRINT_SAMPLE_SIZE) for offset in offsets
+    ])
+
+    digest = hashlib.sha256()
+    digest.update(str(total).encode())
+    digest.update(head)
+    for data, _, _ in samples:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    TTL/LRU cache of normalized QC results with hit-rate stats. Shared
+    across processes when CACHE_BACKEND=redis (see app.core.cache).
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        # None: RESULT_CACHE_MAX_ENTRIES / RESULT_CACHE_TTL_SEC, read on first use
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._backend: Optional[CacheBackend] = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def _cache(self) -> CacheBackend:
+        if self._backend is None:
+            self._backend = create_cache(
+                "qc_result",
+                maxsize=self._maxsize or settings.RESULT_CACHE_MAX_ENTRIES,
+                ttl=self._ttl or settings.RESULT_CACHE_TTL_SEC
+            )
+        return self._backend
+
+    @staticmethod
+    def _key(team_id: str, fingerprint: str, qc_mode: str) -> str:
+        return cache_key(team_id, fingerprint, qc_mode, settings.QC_WORKFLOW_VERSION)
+
+    def get(self, team_id: str, fingerprint: str, qc_mode: str) -> Optional[Dict[str, Any]]:
+        """Look up a team's cached result; returns {qc_result, artifacts, job_id} or None."""
+        entry = self._cache.get(self._key(team_id, fingerprint, qc_mode))
+        if entry is None:
+            self.misses += 1
+            RESULT_CACHE_LOOKUPS.labels(result="miss").inc()
+        else:
+            self.hits += 1
+            RESULT_CACHE_LOOKUPS.labels(result="hit").inc()
+        return entry
+
+    def store(self, job: dict, qc_result: dict, artifacts: Optional[dict] = None) -> None:
+        """Cache a completed job's normalized result for its team (no-op without a fingerprint)."""
+        fingerprint = job.get("content_fingerprint")
+        if not fingerprint or not job.get("qc_mode") or not job.get("team_id"):
+            return
+        self._cache.set(self._key(job["team_id"], fingerprint, job["qc_mode"]), {
+            "qc_result": qc_result,
+            "artifacts": artifacts,
+            "job_id": job["id"],
+        })
+        self.stores += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self._cache.stats(),
+            "workflow_version": settings.QC_WORKFLOW_VERSION,
+        }
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# Singleton instance
+result_cache = ResultCache()
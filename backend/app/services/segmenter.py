@@ -0,0 +1,300 @@
+"""
+Segmented Dispatch
+
+Jobs longer than SEGMENT_THRESHOLD_SEC are split into time-range sub-jobs
+(qc_jobs rows with parent_job_id) that run as parallel n8n executions:
+
+1. dispatch_segments() creates the segment rows (already 'processing') and
+   triggers n8n once per segment with start_sec/end_sec in the payload.
+   Adjacent segments overlap by SEGMENT_OVERLAP_SEC so issues at a cut are
+   not missed.
+2. Each segment completes or fails through the normal n8n callbacks.
+3. settle_parent() runs after every segment callback: the first failed
+   segment fails the parent; once all segments completed their comments are
+   merged (timestamps offset by the segment start, duplicates from the
+   overlaps dropped) into the parent's qc_result.
+
+Once the parent fails (a segment failed, or one could not be dispatched)
+its other active segments are failed too, so none stays 'processing'; their
+late callbacks then find them final and are ignored.
+
+The parent holds the only worker concurrency slot; segments are excluded
+from the worker's and the team's active job counts.
+"""
+
+import asyncio
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+from uuid import uuid4
+from app.core.supabase import supabase, with_retry
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.services.n8n import n8n_service, N8NTransientError
+from app.services.circuit_breaker import CircuitOpenError
+
+logger = get_logger(__name__)
+
+SEGMENT_COLUMNS = "id, status, segment_index, segment_start_sec, segment_end_sec, qc_result, artifacts"
+
+
+class SegmentsUnavailable(Exception):
+    """No segment could be dispatched for a transient reason; retry the job later."""
+    pass
+
+
+def should_segment(job: dict) -> bool:
+    return (
+        settings.SEGMENT_ENABLED
+        and not job.get("parent_job_id")
+        and (job.get("duration_sec") or 0) > settings.SEGMENT_THRESHOLD_SEC
+    )
+
+
+def plan_segments(duration_sec: int, length_sec: int, overlap_sec: int, max_segments: int) -> List[Tuple[int, int]]:
+    """
+    Split [0, duration_sec) into (start_sec, end_sec) ranges of about
+    length_sec (longer if that would exceed max_segments). Every segment but
+    the first starts overlap_sec early.
+    """
+    count = max(1, min(max_segments, math.ceil(duration_sec / length_sec)))
+    length = math.ceil(duration_sec / count)
+    return [
+        (max(0, i * length - overlap_sec), min(duration_sec, (i + 1) * length))
+        for i in range(count)
+    ]
+
+
+@with_retry()
+def _delete_segments(parent_job_id: str):
+    """Remove a job's segments (from an earlier attempt) with retry on transient failures."""
+    return supabase.table("qc_jobs").delete().eq("parent_job_id", parent_job_id).execute()
+
+
+@with_retry()
+def _insert_segments(rows: List[dict]):
+    """Insert segment rows with retry on transient failures."""
+    return supabase.table("qc_jobs").insert(rows).execute()
+
+
+@with_retry()
+def _query_segments(parent_job_id: str):
+    """A job's segments in order with retry on transient failures."""
+    return (
+        supabase
+        .table("qc_jobs")
+        .select(SEGMENT_COLUMNS)
+        .eq("parent_job_id", parent_job_id)
+        .order("segment_index")
+        .execute()
+    )
+
+
+@with_retry()
+def _cancel_segments(parent_job_id: str, reason: str):
+    """Fail a job's still active segments with retry on transient failures."""
+    return (
+        supabase
+        .table("qc_jobs")
+        .update({"status": "failed", "qc_result": {"error": reason, "error_code": "SEGMENT_CANCELLED"}})
+        .eq("parent_job_id", parent_job_id)
+        .in_("status", ["pending", "processing"])
+        .execute()
+    )
+
+
+@with_retry()
+def _finish_parent(parent_job_id: str, update_data: dict):
+    """Move a parent from processing to a final state; no rows if another caller did it first."""
+    return (
+        supabase
+        .table("qc_jobs")
+        .update(update_data)
+        .eq("id", parent_job_id)
+        .eq("status", "processing")
+        .execute()
+    )
+
+
+async def dispatch_segments(job: dict) -> bool:
+    """
+    Split a claimed job into segments and trigger n8n for each.
+
+    Returns:
+        True if every segment was dispatched, False if any was rejected
+        (the caller fails the parent; the other segments are failed here)
+
+    Raises:
+        SegmentsUnavailable: n8n unavailable for every segment
+    """
+    ranges = plan_segments(
+        job["duration_sec"],
+        settings.SEGMENT_LENGTH_SEC,
+        settings.SEGMENT_OVERLAP_SEC,
+        settings.SEGMENT_MAX_COUNT
+    )
+    rows = [
+        {
+            "id": str(uuid4()),
+            "parent_job_id": job["id"],
+            "team_id": job["team_id"],
+            "video_url": job["video_url"],
+            "qc_mode": job["qc_mode"],
+            "status": "processing",
+            "duration_sec": end - start,
+            "credits_used": 0,  # Billed on the parent
+            "segment_index": index,
+            "segment_start_sec": start,
+            "segment_end_sec": end,
+            "trace_id": job.get("trace_id"),
+        }
+        for index, (start, end) in enumerate(ranges)
+    ]
+    _delete_segments(job["id"])
+    _insert_segments(rows)
+    logger.info("Dispatching job as %d segments", len(rows))
+
+    results = await asyncio.gather(
+        *(
+            n8n_service.trigger_qc_job(
+                job_id=row["id"],
+                video_url=job["video_url"],
+                qc_mode=job["qc_mode"],
+                duration_sec=row["duration_sec"],
+                team_id=job["team_id"],
+                thumbnail_url=job.get("thumbnail_url"),
+                segment={
+                    "start_sec": row["segment_start_sec"],
+                    "end_sec": row["segment_end_sec"],
+                    "segment_index": row["segment_index"],
+                    "segment_count": len(rows),
+                    "parent_job_id": job["id"],
+                }
+            )
+            for row in rows
+        ),
+        return_exceptions=True
+    )
+
+    errors = [(row, result) for row, result in zip(rows, results) if isinstance(result, BaseException)]
+    if not errors:
+        return True
+
+    transient = (CircuitOpenError, N8NTransientError)
+    if len(errors) == len(rows) and all(isinstance(e, transient) for _, e in errors):
+        _delete_segments(job["id"])
+        raise SegmentsUnavailable(str(errors[0][1]))
+
+    for row, error in errors:
+        logger.error("Failed to dispatch segment %d: %s", row["segment_index"], error)
+    first = errors[0][0]
+    _cancel_segments(job["id"], f"Segment {first['segment_index'] + 1}/{len(rows)} could not be dispatched")
+    return False
+
+
+def format_timestamp(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def _comment_key(comment: dict) -> Tuple[str, str]:
+    description = re.sub(r"\W+", " ", str(comment.get("description") or "")).strip().lower()
+    return comment.get("category") or "Other", description
+
+
+def merge_segment_results(segments: List[dict], dedup_window_sec: Optional[float] = None) -> dict:
+    """
+    Merge completed segments' qc_results into one for the parent.
+
+    Comment timestamps are shifted by their segment's start. A comment with
+    the same category and description as one within dedup_window_sec before
+    it from another segment (the same issue seen by two overlapping
+    segments) is dropped.
+    """
+    window = settings.SEGMENT_DEDUP_WINDOW_SEC if dedup_window_sec is None else dedup_window_sec
+    comments = []
+    for segment in segments:
+        offset = segment.get("segment_start_sec") or 0
+        qc_result = segment.get("qc_result") or {}
+        for comment in qc_result.get("comments") or []:
+            seconds = int(comment.get("timestamp_sec") or 0) + offset
+            comments.append((
+                {**comment, "timestamp_sec": seconds, "timestamp": format_timestamp(seconds)},
+                segment["segment_index"]
+            ))
+    comments.sort(key=lambda item: item[0]["timestamp_sec"])
+
+    merged: List[dict] = []
+    last_kept: Dict[Tuple[str, str], Tuple[int, int]] = {}  # key -> (timestamp_sec, segment_index)
+    for comment, segment_index in comments:
+        key = _comment_key(comment)
+        previous = last_kept.get(key)
+        if (
+            previous is not None
+            and previous[1] != segment_index
+            and comment["timestamp_sec"] - previous[0] <= window
+        ):
+            continue  # Same issue reported by the neighbouring segment
+        last_kept[key] = (comment["timestamp_sec"], segment_index)
+        merged.append(comment)
+
+    by_category: Dict[str, int] = {}
+    for comment in merged:
+        category = comment.get("category", "Other")
+        by_category[category] = by_category.get(category, 0) + 1
+    return {
+        "comments": merged,
+        "summary": {"total_issues": len(merged), "by_category": by_category},
+        "segments": len(segments),
+    }
+
+
+def merge_segment_artifacts(segments: List[dict]) -> Optional[Dict[str, str]]:
+    """Segment artifact URLs, keyed <name>_part<n>."""
+    artifacts = {}
+    for segment in sorted(segments, key=lambda s: s["segment_index"]):
+        for name, url in (segment.get("artifacts") or {}).items():
+            artifacts[f"{name}_part{segment['segment_index'] + 1}"] = url
+    return artifacts or None
+
+
+def settle_parent(parent_job_id: str) -> Optional[Tuple[dict, str, Optional[dict], Optional[dict]]]:
+    """
+    Finish a segmented job once its segments allow it.
+
+    Called after any segment reached a final state. Concurrent callers race
+    on a conditional update, so exactly one of them finishes the parent.
+
+    Returns:
+        (parent row, 'completed' | 'failed', qc_result, artifacts) for the
+        caller that finished the parent, else None
+    """
+    segments = _query_segments(parent_job_id).data or []
+    if not segments:
+        return None
+
+    failed = next((s for s in segments if s["status"] == "failed"), None)
+    if failed is not None:
+        error = (failed.get("qc_result") or {}).get("error") or "unknown error"
+        qc_result = {
+            "error": f"Segment {failed['segment_index'] + 1}/{len(segments)} failed: {error}",
+            "error_code": "SEGMENT_FAILED",
+        }
+        rows = _finish_parent(parent_job_id, {"status": "failed", "qc_result": qc_result}).data
+        if not rows:
+            return None
+        _cancel_segments(parent_job_id, f"Segment {failed['segment_index'] + 1}/{len(segments)} failed")
+        return rows[0], "failed", qc_result, None
+
+    if any(s["status"] != "completed" for s in segments):
+        return None
+
+    qc_result = merge_segment_results(segments)
+    artifacts = merge_segment_artifacts(segments)
+    update_data = {"status": "completed", "qc_result": qc_result}
+    if artifacts:
+        update_data["artifacts"] = artifacts
+    rows = _finish_parent(parent_job_id, update_data).data
+    if not rows:
+        return None
+    logger.info("Segmented job completed", extra={"job_id": parent_job_id, "segments": len(segments)})
+    return rows[0], "completed", qc_result, artifacts
@@ -0,0 +1,309 @@
+"""
+Customer Webhooks
+
+Teams subscribe URLs to job events (job.completed, job.failed) instead of
+polling GET /v1/jobs. Delivery is at-least-once through a persistent outbox
+(webhook_outbox, see migrations/versions/0006_webhooks.sql):
+
+- enqueue() runs in the job's final-state side effects (app.services.job_events)
+  and writes one outbox row per matching subscription. Ids are derived from
+  the job and event, so a repeated callback doesn't queue the event twice
+  and receivers can dedupe on the event id.
+- the webhook dispatcher (app.workers.webhook_sender) claims due rows,
+  POSTs them with a pooled HTTP client, at most WEBHOOK_ENDPOINT_CONCURRENCY
+  requests in flight per endpoint, up to the subscription's batch_size
+  events per request, and reschedules failures with jittered exponential
+  backoff until WEBHOOK_MAX_ATTEMPTS.
+
+Every request body is {"events": [...]} signed with the subscription's
+secret: X-QC-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">.
+
+Subscription URLs must resolve to public addresses (app.core.outbound),
+checked when they are registered and again before every request, since DNS
+can change after registration; redirects are not followed.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import httpx
+from app.core.cache import CacheBackend, cache_key, create_cache
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import WEBHOOK_DELIVERIES
+from app.core.outbound import UnsafeURL, check_url_async
+from app.core.responses import dumps
+from app.core.supabase import supabase, with_retry
+
+logger = get_logger(__name__)
+
+EVENTS = ("job.completed", "job.failed")
+SIGNATURE_HEADER = "X-QC-Signature"
+# Namespace of the deterministic event and delivery ids
+EVENT_NAMESPACE = uuid.UUID("5f0c7d2e-8a43-4b7e-9d56-3c1f2a9b7e10")
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Signature header value for a request body sent at `timestamp`."""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify(secret: str, header: str, body: bytes, tolerance_sec: int = 300) -> bool:
+    """Check a signature header (for receivers, and the webhook docs)."""
+    try:
+        parts = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance_sec:
+        return False
+    return hmac.compare_digest(sign(secret, timestamp, body), header)
+
+
+def event_payload(event: str, job: dict, qc_result: Optional[dict] = None,
+                  artifacts: Optional[dict] = None) -> dict:
+    """The event as delivered; its id is stable for a job and event type."""
+    return {
+        "id": str(uuid.uuid5(EVENT_NAMESPACE, f"{job['id']}:{event}")),
+        "type": event,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "data": {
+            "job_id": job["id"],
+            "status": "completed" if event == "job.completed" else "failed",
+            "qc_mode": job.get("qc_mode"),
+            "duration_sec": job.get("duration_sec"),
+            "video_url": job.get("video_url"),
+            "created_at": job.get("created_at"),
+            "qc_result": qc_result,
+            "artifacts": artifacts,
+        },
+    }
+
+
+@with_retry()
+def _query_team_subscriptions(team_id: str):
+    """List a team's active webhook subscriptions with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_subscriptions")
+        .select("id, events")
+        .eq("team_id", team_id)
+        .eq("active", True)
+        .execute()
+    )
+
+
+@with_retry()
+def _upsert_outbox(rows: List[dict]):
+    """Queue webhook deliveries (existing ids are left alone) with retry on transient failures."""
+    return supabase.table("webhook_outbox").upsert(rows, on_conflict="id", ignore_duplicates=True).execute()
+
+
+@with_retry()
+def _rpc_claim(limit: int, lease_sec: int):
+    """Claim due webhook deliveries with retry on transient failures."""
+    return supabase.rpc("webhook_claim_deliveries", {"p_limit": limit, "p_lease_sec": lease_sec}).execute()
+
+
+@with_retry()
+def _query_subscriptions(subscription_ids: List[str]):
+    """Get webhook subscriptions by id with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_subscriptions")
+        .select("id, url, secret, batch_size, active")
+        .in_("id", subscription_ids)
+        .execute()
+    )
+
+
+@with_retry()
+def _mark_delivered(delivery_ids: List[str]):
+    """Mark webhook deliveries delivered with retry on transient failures."""
+    return (
+        supabase
+        .table("webhook_outbox")
+        .update({"status": "delivered", "delivered_at": datetime.now(timezone.utc).isoformat()})
+        .in_("id", delivery_ids)
+        .execute()
+    )
+
+
+@with_retry()
+def _update_delivery(delivery_id: str, update_data: dict):
+    """Reschedule or kill a webhook delivery with retry on transient failures."""
+    return supabase.table("webhook_outbox").update(update_data).eq("id", delivery_id).execute()
+
+
+_subscriptions_cache: Optional[CacheBackend] = None
+
+
+def _get_subscriptions_cache() -> CacheBackend:
+    global _subscriptions_cache
+    if _subscriptions_cache is None:
+        _subscriptions_cache = create_cache(
+            "webhook_subscriptions", maxsize=10000, ttl=settings.WEBHOOK_SUBSCRIPTION_CACHE_TTL_SEC
+        )
+    return _subscriptions_cache
+
+
+def team_subscriptions(team_id: str) -> List[dict]:
+    """A team's active subscriptions (id, events), cached: every job completion looks them up."""
+    cache = _get_subscriptions_cache()
+    key = cache_key("team", team_id)
+    subscriptions = cache.get(key)
+    if subscriptions is None:
+        subscriptions = _query_team_subscriptions(team_id).data or []
+        cache.set(key, subscriptions)
+    return subscriptions
+
+
+def invalidate_subscriptions(team_id: str) -> None:
+    """Drop a team's cached subscriptions (after they change)."""
+    _get_subscriptions_cache().delete(cache_key("team", team_id))
+
+
+def enqueue(event: str, job: dict, qc_result: Optional[dict] = None,
+            artifacts: Optional[dict] = None) -> int:
+    """
+    Queue `event` for the job's team subscriptions that want it.
+
+    Returns:
+        The number of subscriptions it was queued for
+    """
+    if not settings.WEBHOOKS_ENABLED or not job.get("team_id"):
+        return 0
+    subscriptions = [s for s in team_subscriptions(job["team_id"]) if event in (s.get("events") or EVENTS)]
+    if not subscriptions:
+        return 0
+    payload = event_payload(event, job, qc_result, artifacts)
+    _upsert_outbox([
+        {
+            "id": str(uuid.uuid5(EVENT_NAMESPACE, f"{payload['id']}:{subscription['id']}")),
+            "subscription_id": subscription["id"],
+            "team_id": job["team_id"],
+            "event": event,
+            "payload": payload,
+        }
+        for subscription in subscriptions
+    ])
+    return len(subscriptions)
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before retry `attempts` (1-based): jittered, doubling, capped."""
+    delay = min(settings.WEBHOOK_RETRY_BASE_SEC * 2 ** (attempts - 1), settings.WEBHOOK_RETRY_MAX_SEC)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WebhookDispatcher:
+    """Delivers claimed outbox rows (see module docstring)."""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._endpoint_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared client, so deliveries reuse connections to each endpoint."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=settings.WEBHOOK_TIMEOUT_SEC,
+                follow_redirects=False,
+                headers={"User-Agent": "QC-Lobby-Webhooks/1.0"},
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client (on shutdown)."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _slots(self, url: str) -> asyncio.Semaphore:
+        slots = self._endpoint_slots.get(url)
+        if slots is None:
+            slots = self._endpoint_slots[url] = asyncio.Semaphore(settings.WEBHOOK_ENDPOINT_CONCURRENCY)
+        return slots
+
+    async def run_once(self) -> int:
+        """Claim and deliver one batch of due deliveries; returns how many were claimed."""
+        claimed = (await asyncio.to_thread(
+            _rpc_claim, settings.WEBHOOK_CLAIM_BATCH, settings.WEBHOOK_LEASE_SEC
+        )).data or []
+        if not claimed:
+            return 0
+
+        by_subscription: Dict[str, List[dict]] = {}
+        for delivery in claimed:
+            by_subscription.setdefault(delivery["subscription_id"], []).append(delivery)
+        subscriptions = {
+            s["id"]: s
+            for s in (await asyncio.to_thread(_query_subscriptions, list(by_subscription))).data or []
+        }
+
+        sends = []
+        for subscription_id, deliveries in by_subscription.items():
+            subscription = subscriptions.get(subscription_id)
+            if subscription is None or not subscription["active"]:
+                sends.append(self._give_up(deliveries, "subscription inactive"))
+                continue
+            deliveries.sort(key=lambda d: d["created_at"])
+            size = subscription.get("batch_size") or 1
+            for i in range(0, len(deliveries), size):
+                sends.append(self._send(subscription, deliveries[i:i + size]))
+        await asyncio.gather(*sends)
+        return len(claimed)
+
+    async def _send(self, subscription: dict, deliveries: List[dict]) -> None:
+        body = dumps({"events": [d["payload"] for d in deliveries]})
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: sign(subscription["secret"], int(time.time()), body),
+            "X-QC-Delivery-Attempt": str(max(d["attempts"] for d in deliveries) + 1),
+        }
+        try:
+            await check_url_async(subscription["url"])
+            async with self._slots(subscription["url"]):
+                response = await self._get_client().post(subscription["url"], content=body, headers=headers)
+            error = None if response.is_success else f"HTTP {response.status_code}"
+        except UnsafeURL as e:
+            error = f"URL not allowed: {e}"
+        except httpx.HTTPError as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if error is None:
+            WEBHOOK_DELIVERIES.labels(result="delivered").inc(len(deliveries))
+            await asyncio.to_thread(_mark_delivered, [d["id"] for d in deliveries])
+            return
+        logger.warning(
+            "Webhook delivery failed: %s", error,
+            extra={"subscription_id": subscription["id"], "events": len(deliveries)}
+        )
+        await asyncio.gather(*(self._retry_later(d, error) for d in deliveries))
+
+    async def _retry_later(self, delivery: dict, error: str) -> None:
+        attempts = delivery["attempts"] + 1
+        if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            WEBHOOK_DELIVERIES.labels(result="dead").inc()
+            update_data = {"status": "dead", "attempts": attempts, "last_error": error}
+        else:
+            WEBHOOK_DELIVERIES.labels(result="retried").inc()
+            next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=retry_delay(attempts))
+            update_data = {"attempts": attempts, "next_attempt_at": next_attempt_at.isoformat(), "last_error": error}
+        await asyncio.to_thread(_update_delivery, delivery["id"], update_data)
+
+    async def _give_up(self, deliveries: List[dict], error: str) -> None:
+        WEBHOOK_DELIVERIES.labels(result="dead").inc(len(deliveries))
+        await asyncio.gather(*(
+            asyncio.to_thread(_update_delivery, d["id"], {"status": "dead", "last_error": error})
+            for d in deliveries
+        ))
+
+
+webhook_dispatcher = WebhookDispatcher()
@@ -0,0 +1,48 @@
+"""
+Standalone worker process
+
+Runs the job processor (and n8n health checks) without the API, so the
+two scale independently. Set RUN_WORKER_IN_API=False on the API when
+running this.
+
+Usage (from backend/):
+    python -m app.workers
+"""
+
+import asyncio
+import signal
+from prometheus_client import start_http_server
+from app.core.config import settings
+from app.core.lifecycle import TaskSupervisor
+from app.core.logger import setup_logging, shutdown_logging, get_logger
+from app.core import tracing
+from app.workers.runner import start_background_tasks, stop_background_tasks
+
+logger = get_logger("app.workers")
+
+
+async def main() -> None:
+    supervisor = TaskSupervisor(max_backoff=settings.TASK_RESTART_MAX_BACKOFF_SEC)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    start_background_tasks(supervisor)
+    logger.info("Worker started")
+    await stop.wait()
+    logger.info("Shutting down worker")
+    await stop_background_tasks(supervisor, settings.SHUTDOWN_DRAIN_TIMEOUT_SEC)
+
+
+if __name__ == "__main__":
+    setup_logging(settings.LOG_LEVEL, settings.LOG_LEVELS)
+    tracing.configure(settings.TRACE_EXPORT_PATH, settings.TRACE_BUFFER_TRACES, settings.TRACING_ENABLED,
+                      settings.TRACE_EXPORT_MAX_BYTES, settings.TRACE_EXPORT_BACKUPS)
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT)
+    try:
+        asyncio.run(main())
+    finally:
+        tracing.shutdown()
+        shutdown_logging()
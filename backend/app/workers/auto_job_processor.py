@@ -1,94 +1,232 @@
 """
 Automatic Job Processor
 
-Monitors pending jobs and dispatches them to n8n for processing.
-Falls back to mock processing if n8n is disabled or fails.
+Monitors pending jobs and dispatches them to the QC backend routed for
+their qc_mode (n8n, mock or local, see app.services.qc_backends).
 """
 
 import asyncio
+from datetime import datetime, timezone
+from typing import Optional
 from app.core.supabase import supabase
 from app.core.config import settings
-from app.services.n8n import n8n_service
+from app.services.qc_backends import qc_backends, BackendUnavailable
+from app.services.probe import video_probe, ProbeError, ProbeUnavailable
+from app.services.result_cache import result_cache, fingerprint_video
+from app.services.job_events import on_job_completed, on_job_failed, on_job_updated
+from app.services.eta import queue_eta
+from app.core.logger import get_logger, bind_job
+from app.core.lifecycle import wait_or_stop
+from app.core import tracing
 
+logger = get_logger(__name__)
 
-async def dispatch_job_to_n8n(job: dict) -> bool:
+
+def fail_job(job: dict, error: str, **extra) -> None:
+    """Mark a job as failed with an error result and run failure side effects."""
+    qc_result = {"error": error}
+    if extra.get("error_code"):
+        qc_result["error_code"] = extra.pop("error_code")
+    supabase.table("qc_jobs").update({
+        "status": "failed",
+        "qc_result": qc_result,
+        **extra
+    }).eq("id", job["id"]).execute()
+    on_job_failed(job, qc_result)
+
+
+async def probe_job(job: dict) -> bool:
     """
-    Dispatch a job to n8n for processing.
-    
+    Probe stage: read the video's container headers before dispatch.
+
+    Attaches the real metadata to the job (row and dict). Corrupt or
+    misbilled uploads are marked failed so they never use a QC slot.
+
     Returns:
-        True if successfully dispatched, False otherwise
+        True if the job should be dispatched, False if it was rejected
     """
     try:
-        response = await n8n_service.trigger_qc_job(
-            job_id=job["id"],
-            video_url=job["video_url"],
-            qc_mode=job["qc_mode"],
-            duration_sec=job["duration_sec"],
-            team_id=job["team_id"],
-            thumbnail_url=job.get("thumbnail_url")
-        )
-        print(f"[n8n] Job {job['id']} dispatched to n8n: {response}")
+        metadata = await video_probe.probe_job(job)
+    except ProbeUnavailable as e:
+        # Our side of the network failed; don't punish the upload
+        logger.warning("Skipping probe: %s", e)
         return True
-    except Exception as e:
-        # Debug logging removed
+    except ProbeError as e:
+        logger.warning("Rejecting job after probe: %s", e)
+        fail_job(job, str(e), error_code="PROBE_REJECTED")
+        return False
+
+    if metadata:
+        job["video_metadata"] = metadata
+        supabase.table("qc_jobs").update({"video_metadata": metadata}).eq("id", job["id"]).execute()
+        on_job_updated(job)
+    return True
+
 
-        print(f"[n8n] Failed to dispatch job {job['id']} to n8n: {e}")
+async def complete_from_cache(job: dict) -> bool:
+    """
+    Result cache stage: fingerprint the video and, on a cache hit for the
+    same (team, content, qc_mode, workflow version), complete the job
+    immediately and refund its reserve.
+
+    Returns:
+        True if the job was completed from the cache, or stopped being
+        ours (requeued or failed meanwhile)
+    """
+    try:
+        fingerprint = await fingerprint_video(job["video_url"])
+    except (ProbeError, ProbeUnavailable) as e:
+        logger.warning("Could not fingerprint video: %s", e)
+        return False
+
+    job["content_fingerprint"] = fingerprint
+    cached = result_cache.get(job["team_id"], fingerprint, job["qc_mode"])
+    if cached is None:
+        supabase.table("qc_jobs").update({"content_fingerprint": fingerprint}).eq("id", job["id"]).execute()
+        on_job_updated(job)
         return False
 
+    update_data = {
+        "status": "completed",
+        "content_fingerprint": fingerprint,
+        "qc_result": {**cached["qc_result"], "cached_from_job_id": cached["job_id"]}
+    }
+    if cached.get("artifacts"):
+        update_data["artifacts"] = cached["artifacts"]
+    updated = supabase.table("qc_jobs").update(update_data).eq("id", job["id"]).eq("status", "processing").execute()
+    if not updated.data:
+        logger.info("Job changed status meanwhile, not completing it from the cache")
+        return True
+    on_job_completed(job, cached["qc_result"], cached.get("artifacts"), cached=True)
+    logger.info("Job completed from cached result", extra={"cached_from_job_id": cached["job_id"]})
+    return True
 
-async def process_job_mock(job_id: str):
+
+def requeue_job(job: dict, reason: str, count_attempt: bool = True) -> None:
     """
-    Mock QC processing fallback.
-    Used when n8n is disabled or fails.
+    Put a job whose dispatch failed transiently back to pending.
+    
+    The attempt counter is persisted on the row; after
+    DISPATCH_MAX_JOB_ATTEMPTS the job is marked failed instead. Failures
+    during a backend outage (count_attempt=False) leave the counter alone,
+    so the head of the queue waits out the outage instead of failing.
     """
-    # Simulate processing time
-    await asyncio.sleep(3)
+    if not count_attempt:
+        logger.warning("Requeueing job, backend unavailable: %s", reason)
+        supabase.table("qc_jobs").update({"status": "pending"}).eq("id", job["id"]).eq("status", "processing").execute()
+        on_job_updated(job)
+        queue_eta.invalidate()
+        return
+
+    attempts = (job.get("dispatch_attempts") or 0) + 1
     
-    # Generate mock QC result
-    qc_result = {
-        "resolution": "1920x1080",
-        "fps": 30,
-        "audio": True,
-        "source": "mock_processor"
-    }
+    if attempts >= settings.DISPATCH_MAX_JOB_ATTEMPTS:
+        logger.error("Job failed after %d dispatch attempts: %s", attempts, reason)
+        fail_job(job, f"Failed to dispatch after {attempts} attempts: {reason}", dispatch_attempts=attempts)
+        return
     
-    # Update to completed
+    logger.warning("Requeueing job (attempt %d): %s", attempts, reason)
     supabase.table("qc_jobs").update({
-        "status": "completed",
-        "qc_result": qc_result
-    }).eq("id", job_id).execute()
+        "status": "pending",
+        "dispatch_attempts": attempts
+    }).eq("id", job["id"]).eq("status", "processing").execute()
+    on_job_updated(job)
+    # Back at the head of the queue (oldest created_at), out of ticket order
+    queue_eta.invalidate()
+
+
+def claim_job(job_id: str) -> Optional[str]:
+    """
+    Atomically move a job from pending to processing.
+
+    Returns:
+        The job's started_at, or None if another worker already took it
+    """
+    started_at = datetime.now(timezone.utc).isoformat()
+    with tracing.span("worker.claim"):
+        update_res = (
+            supabase
+            .table("qc_jobs")
+            .update({"status": "processing", "started_at": started_at})
+            .eq("id", job_id)
+            .eq("status", "pending")  # Ensure it's still pending (atomic check)
+            .execute()
+        )
+    return started_at if update_res.data else None
+
+
+async def dispatch_claimed_job(job: dict, backend) -> None:
+    """Run the pipeline stages for a job this worker just claimed."""
+    logger.info("Processing job (mode: %s)", job["qc_mode"])
     
-    print(f"[mock] Job {job_id} completed with mock result")
+    # Probe container headers before spending a QC slot
+    if settings.PROBE_ENABLED:
+        with tracing.span("worker.probe"):
+            if not await probe_job(job):
+                return
+
+    # Re-submitted videos complete from the result cache
+    if settings.RESULT_CACHE_ENABLED:
+        with tracing.span("worker.result_cache") as cache_span:
+            hit = await complete_from_cache(job)
+            if cache_span:
+                cache_span.set(hit=hit)
+        if hit:
+            return
+
+    # Dispatch to the backend routed for this qc_mode
+    try:
+        with tracing.span("worker.submit", backend=backend.name):
+            success = await backend.submit(job)
+    except BackendUnavailable as e:
+        requeue_job(job, str(e), count_attempt=not e.outage)
+        return
 
+    if not success:
+        # Dispatch failed - mark job as failed, do NOT fallback to mock
+        logger.error("%s dispatch failed - marking job as failed", backend.name)
+        fail_job(job, f"Failed to dispatch to {backend.name} backend")
+    else:
+        # Leave job in "processing" state until the backend completes it
+        # (n8n calls back via /callbacks/n8n/complete when done)
+        logger.info("Job dispatched to %s backend", backend.name)
 
-async def auto_process_jobs():
+
+async def auto_process_jobs(stop_event: Optional[asyncio.Event] = None):
     """
     Background worker that:
     1. Monitors pending jobs
-    2. Dispatches them to n8n (or mock processor)
+    2. Dispatches them to their QC backend (n8n, mock or local)
     3. Updates status to processing
+
+    Once stop_event is set the loop exits after the dispatch in progress,
+    so a shutdown drains instead of dropping it.
     """
-    print(f"[worker] Starting job processor (n8n enabled: {settings.USE_N8N_PROCESSING})")
+    logger.info(
+        "Starting job processor",
+        extra={"n8n_enabled": settings.USE_N8N_PROCESSING, "routes": settings.QC_BACKEND_ROUTES}
+    )
     
-    while True:
+    while not (stop_event and stop_event.is_set()):
         job_id = None
         try:
-            # Count jobs with status = "processing"
+            # Count jobs with status = "processing" (segments run under their parent's slot)
             processing_res = (
                 supabase
                 .table("qc_jobs")
                 .select("id", count="exact")
                 .eq("status", "processing")
+                .is_("parent_job_id", "null")
                 .execute()
             )
             
             processing_count = processing_res.count or 0
-            print(f"[worker] Currently processing: {processing_count} jobs")
+            logger.debug("Currently processing: %d jobs", processing_count)
             
-            # If >= 2 jobs are processing, wait and continue
-            if processing_count >= 2:
-                print(f"[worker] Max concurrent jobs reached ({processing_count}), waiting...")
-                await asyncio.sleep(3)
+            # If the processing slots are full, wait and continue
+            if processing_count >= settings.WORKER_MAX_PROCESSING_JOBS:
+                logger.debug("Max concurrent jobs reached (%d), waiting...", processing_count)
+                await wait_or_stop(stop_event, 3)
                 continue
             
             # Fetch ONE job with status = "pending"
@@ -104,70 +242,59 @@ async def auto_process_jobs():
             
             if not pending_res.data:
                 # No pending jobs, wait and continue
-                print(f"[worker] No pending jobs found, waiting...")
-                await asyncio.sleep(3)
+                logger.debug("No pending jobs found, waiting...")
+                await wait_or_stop(stop_event, 3)
                 continue
             
             job = pending_res.data[0]
-            job_id = job["id"]
-            print(f"[worker] Found pending job: {job_id}")
-
-            
-            # Atomically update to "processing"
-            update_res = (
-                supabase
-                .table("qc_jobs")
-                .update({"status": "processing"})
-                .eq("id", job_id)
-                .eq("status", "pending")  # Ensure it's still pending (atomic check)
-                .execute()
-            )
-            
-            # If update didn't affect any rows, another worker got it first
-            if not update_res.data:
-                await asyncio.sleep(1)
+            try:
+                backend = qc_backends.for_mode(job["qc_mode"])
+            except ValueError as e:
+                # Unroutable: fail it, or it would stay at the head of the queue
+                fail_job(job, str(e), error_code="NO_QC_BACKEND")
                 continue
             
-            print(f"[worker] Processing job {job_id} (mode: {job['qc_mode']})")
+            # Backend down (circuit open): leave the job pending and pause
+            if not backend.is_available():
+                logger.warning("%s backend unavailable, pausing dispatch", backend.name)
+                await wait_or_stop(stop_event, 3)
+                continue
             
-            # Dispatch to n8n or use mock processing
-            if settings.USE_N8N_PROCESSING:
-                # Debug logging removed
-
-                success = await dispatch_job_to_n8n(job)
-                # Debug logging removed
+            job_id = job["id"]
+            logger.debug("Found pending job %s", job_id)
 
+            
+            with bind_job(job_id), tracing.use_trace(job.get("trace_id"), "worker.dispatch", job_id=job_id):
+                # If the claim fails, another worker got it first
+                started_at = claim_job(job_id)
+                if not started_at:
+                    await wait_or_stop(stop_event, 1)
+                    continue
+                job["started_at"] = started_at
+                on_job_updated(job)
+                queue_eta.job_started(job)
                 
-                if not success:
-                    # n8n dispatch failed - mark job as failed, do NOT fallback to mock
-                    print(f"[worker] n8n dispatch failed for job {job_id} - marking as failed")
-                    supabase.table("qc_jobs").update({
-                        "status": "failed",
-                        "qc_result": {"error": "Failed to dispatch to n8n workflow"}
-                    }).eq("id", job_id).execute()
-                else:
-                    # If n8n succeeds, leave job in "processing" state
-                    # n8n will call back via /callbacks/n8n/complete when done
-                    print(f"[worker] Job {job_id} dispatched to n8n - waiting for callback")
-            else:
-                # Use mock processing only when n8n is disabled
-                await process_job_mock(job_id)
+                try:
+                    await dispatch_claimed_job(job, backend)
+                except asyncio.CancelledError:
+                    # Drain deadline passed mid-dispatch: don't strand it in processing
+                    requeue_job(job, "worker shut down during dispatch")
+                    raise
             
         except Exception as e:
-            print(f"[worker] Error processing job: {e}")
+            logger.exception("Error processing job %s", job_id)
             
             # If any exception occurs, mark the job as "failed"
             if job_id:
                 try:
-                    supabase.table("qc_jobs").update({
-                        "status": "failed",
-                        "qc_result": {"error": str(e)}
-                    }).eq("id", job_id).execute()
+                    fail_job(job, str(e))
                 except Exception:
                     pass  # Ignore errors when marking as failed
             
             # Wait before retrying
-            await asyncio.sleep(3)
+            await wait_or_stop(stop_event, 3)
         
         # Small delay between iterations
-        await asyncio.sleep(1)
+        await wait_or_stop(stop_event, 1)
+    
+    logger.info("Job processor stopped")
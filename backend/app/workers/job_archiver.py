@@ -0,0 +1,48 @@
+"""
+Job Archiver
+
+Periodically moves old completed/failed jobs from qc_jobs to the Iceberg
+archive (see app.services.archive).
+
+One-off run (from backend/):
+    python -m app.workers.job_archiver [--older-than-days 30]
+"""
+
+import argparse
+import asyncio
+from typing import Optional
+from app.core.config import settings
+from app.core.lifecycle import wait_or_stop
+from app.core.logger import get_logger
+from app.services.archive import ArchiveUnavailable, job_archive
+
+logger = get_logger(__name__)
+
+
+async def archive_jobs(stop_event: Optional[asyncio.Event] = None):
+    """Archive old jobs every ARCHIVE_INTERVAL_SEC until stop_event is set."""
+    logger.info(
+        "Starting job archiver",
+        extra={"after_days": settings.ARCHIVE_AFTER_DAYS, "warehouse": settings.ARCHIVE_WAREHOUSE_PATH}
+    )
+    while not (stop_event and stop_event.is_set()):
+        try:
+            await asyncio.to_thread(job_archive.archive_once)
+        except ArchiveUnavailable as e:
+            logger.error("Job archiver disabled: %s", e)
+            return
+        except Exception:
+            logger.exception("Job archival run failed")
+        if await wait_or_stop(stop_event, settings.ARCHIVE_INTERVAL_SEC):
+            break
+    logger.info("Job archiver stopped")
+
+
+if __name__ == "__main__":
+    from app.core.logger import setup_logging
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--older-than-days", type=int, default=None)
+    args = parser.parse_args()
+    setup_logging(settings.LOG_LEVEL, settings.LOG_LEVELS)
+    print(f"Archived {job_archive.archive_once(args.older_than_days)} jobs")
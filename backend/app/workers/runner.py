@@ -0,0 +1,69 @@
+"""
+Worker Runner
+
+Starts and stops the background side of the app: the job processor, the
+n8n health checks, the job archiver, the webhook sender, the progress
+flusher, the queue ETA resync (API only) and the clients/pools they use.
+Shared by the API lifespan (when RUN_WORKER_IN_API is on) and
+`python -m app.workers`.
+"""
+
+import asyncio
+import time
+from app.core.config import settings
+from app.core.cache import close_caches
+from app.core.lifecycle import TaskSupervisor
+from app.core.logger import get_logger
+from app.services.eta import queue_eta
+from app.services.n8n import n8n_service
+from app.services.probe import video_probe
+from app.services.progress import job_progress
+from app.services.qc_backends import qc_backends
+from app.services.webhooks import webhook_dispatcher
+from app.workers.auto_job_processor import auto_process_jobs
+from app.workers.job_archiver import archive_jobs
+from app.workers.webhook_sender import deliver_webhooks
+
+logger = get_logger(__name__)
+
+
+def start_background_tasks(supervisor: TaskSupervisor, run_job_processor: bool = True,
+                           run_eta_resync: bool = False) -> None:
+    if run_job_processor:
+        # Fail at startup rather than on every job of a misrouted qc_mode
+        qc_backends.validate_routes()
+        supervisor.start("job-processor", lambda: auto_process_jobs(supervisor.stop_event))
+        if settings.ARCHIVE_ENABLED:
+            supervisor.start("job-archiver", lambda: archive_jobs(supervisor.stop_event))
+        if settings.WEBHOOKS_ENABLED:
+            supervisor.start("webhook-sender", lambda: deliver_webhooks(supervisor.stop_event))
+    if settings.USE_N8N_PROCESSING and settings.N8N_HEALTH_CHECK_INTERVAL_SEC > 0:
+        supervisor.start(
+            "n8n-health-checks",
+            lambda: n8n_service.pool.run_health_checks(settings.N8N_HEALTH_CHECK_INTERVAL_SEC, supervisor.stop_event)
+        )
+    if run_eta_resync and settings.ETA_ENABLED:
+        # Queue ETAs are served by the API: keep its tracker in sync off the request path
+        supervisor.start("eta-resync", lambda: queue_eta.run_resync(supervisor.stop_event))
+    supervisor.start(
+        "progress-flusher",
+        lambda: job_progress.run_flusher(settings.PROGRESS_FLUSH_INTERVAL_MS / 1000, supervisor.stop_event)
+    )
+
+
+async def stop_background_tasks(supervisor: TaskSupervisor, timeout: float) -> None:
+    """
+    Drain within `timeout` seconds: let the current dispatch finish, wait
+    for jobs running on local backends, then close clients and pools.
+    """
+    deadline = time.monotonic() + timeout
+    await supervisor.stop(timeout)
+    # Write the progress reports still in memory
+    await asyncio.to_thread(job_progress.flush)
+    await qc_backends.drain(max(0.0, deadline - time.monotonic()))
+    qc_backends.close()
+    await n8n_service.aclose()
+    await video_probe.aclose()
+    await webhook_dispatcher.aclose()
+    close_caches()
+    logger.info("Background tasks stopped")
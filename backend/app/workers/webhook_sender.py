@@ -0,0 +1,32 @@
+"""
+Webhook Sender
+
+Delivers queued customer webhook events (see app.services.webhooks): claims
+due outbox rows, POSTs them and reschedules failures. Polls every
+WEBHOOK_POLL_INTERVAL_SEC while the outbox is drained, and straight away
+while it is backlogged.
+"""
+
+import asyncio
+from typing import Optional
+from app.core.config import settings
+from app.core.lifecycle import wait_or_stop
+from app.core.logger import get_logger
+from app.services.webhooks import webhook_dispatcher
+
+logger = get_logger(__name__)
+
+
+async def deliver_webhooks(stop_event: Optional[asyncio.Event] = None):
+    """Deliver webhook events until stop_event is set."""
+    logger.info("Starting webhook sender", extra={"endpoint_concurrency": settings.WEBHOOK_ENDPOINT_CONCURRENCY})
+    while not (stop_event and stop_event.is_set()):
+        try:
+            claimed = await webhook_dispatcher.run_once()
+        except Exception:
+            logger.exception("Webhook delivery pass failed")
+            claimed = 0
+        if claimed < settings.WEBHOOK_CLAIM_BATCH:
+            if await wait_or_stop(stop_event, settings.WEBHOOK_POLL_INTERVAL_SEC):
+                break
+    logger.info("Webhook sender stopped")
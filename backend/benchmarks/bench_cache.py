@@ -0,0 +1,110 @@
+"""
+Cache backend benchmark
+
+Exercises app.core.cache against the in-memory Redis stand-in
+(benchmarks.fakes.FakeRedis):
+- get/set cost of LocalCache and RedisCache
+- cross-process invalidation: two "processes" with their own local cache
+  and bus share one server; a delete in one must reach the other
+- single-flight: N threads asking for the same missing key while the
+  loader takes `--load-ms` run the loader once
+
+Usage (from backend/):
+    python -m benchmarks.bench_cache [--ops 20000] [--threads 32] [--load-ms 20]
+"""
+
+import argparse
+import threading
+import time
+
+from benchmarks.harness import configure_env
+
+configure_env()
+
+from app.core.cache import InvalidationBus, LocalCache, RedisCache, SingleFlight  # noqa: E402
+from benchmarks.fakes import FakeRedis  # noqa: E402
+
+VALUE = {"qc_result": {"comments": [{"timestamp": "00:00:12", "text": "Typo"}] * 20}, "job_id": "job-1"}
+
+
+def bench_ops(cache, ops: int) -> tuple:
+    start = time.perf_counter()
+    for i in range(ops):
+        cache.set(f"k{i % 1000}", VALUE)
+    set_us = (time.perf_counter() - start) * 1e6 / ops
+    start = time.perf_counter()
+    for i in range(ops):
+        cache.get(f"k{i % 1000}")
+    get_us = (time.perf_counter() - start) * 1e6 / ops
+    return set_us, get_us
+
+
+def check_invalidation() -> float:
+    """Seconds for a delete in process A to reach process B's local cache."""
+    server = FakeRedis()
+    bus_a, bus_b = InvalidationBus(server, "bench:invalidate"), InvalidationBus(server, "bench:invalidate")
+    cache_a = bus_a.attach(LocalCache("jobs", 100, 60))
+    cache_b = bus_b.attach(LocalCache("jobs", 100, 60))
+    time.sleep(0.2)  # Let both listeners subscribe
+
+    cache_a.set("team-1", VALUE)
+    cache_b.set("team-1", VALUE)
+    start = time.perf_counter()
+    cache_a.delete("team-1")
+    while cache_b.get("team-1") is not None:
+        if time.perf_counter() - start > 5:
+            raise AssertionError("invalidation did not reach the other process")
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    bus_a.close()
+    bus_b.close()
+    return elapsed
+
+
+def check_single_flight(threads: int, load_ms: float) -> tuple:
+    flight = SingleFlight()
+    loads = 0
+    barrier = threading.Barrier(threads)
+
+    def loader():
+        nonlocal loads
+        loads += 1
+        time.sleep(load_ms / 1000)
+        return VALUE
+
+    def caller():
+        barrier.wait()
+        assert flight.do("team-1", loader) is VALUE
+
+    workers = [threading.Thread(target=caller) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return loads, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--load-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    for name, cache in (
+        ("LocalCache", LocalCache("bench", 10_000, 60)),
+        ("RedisCache (FakeRedis)", RedisCache("bench", 60, client=FakeRedis())),
+    ):
+        set_us, get_us = bench_ops(cache, args.ops)
+        print(f"{name:24} set {set_us:7.2f} us   get {get_us:7.2f} us")
+
+    print(f"pub/sub invalidation     reached the other process in {check_invalidation() * 1000:.2f} ms")
+
+    loads, elapsed = check_single_flight(args.threads, args.load_ms)
+    print(f"single-flight            {args.threads} concurrent callers -> {loads} load(s) "
+          f"in {elapsed * 1000:.1f} ms (loader {args.load_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Callback batching benchmark
+
+Delivers the same stream of n8n events (progress updates, then a completion
+or failure per job) to the API twice against the in-memory Supabase:
+
+- single: one request per event to /callbacks/n8n/progress|complete|failed
+- batch: --batch-size events per request to /callbacks/n8n/batch
+
+Reports events/s, request latency and Supabase calls per event, and checks
+that both runs leave every job in its expected final state.
+
+Exits non-zero if a job ends up in the wrong state.
+
+Usage (from backend/):
+    python -m benchmarks.bench_callbacks [--jobs 1000] [--progress-per-job 2]
+                                         [--batch-size 50] [--concurrency 16]
+                                         [--db-latency-ms 2]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import List
+
+from benchmarks.harness import BenchEnv, Recorder, configure_env, percentile, run_concurrently
+
+configure_env()
+
+SINGLE_PATHS = {
+    "progress": "/v1/callbacks/n8n/progress",
+    "complete": "/v1/callbacks/n8n/complete",
+    "failed": "/v1/callbacks/n8n/failed",
+}
+
+
+def job_events(env: BenchEnv, job: dict, progress_per_job: int, fail_rate: float) -> List[dict]:
+    """A job's events in the order n8n sends them."""
+    events = [
+        {"type": "progress", "job_id": job["id"], "progress": int(100 * (i + 1) / (progress_per_job + 1))}
+        for i in range(progress_per_job)
+    ]
+    if random.random() < fail_rate:
+        events.append({"type": "failed", "job_id": job["id"], "error": "workflow failed", "error_code": "BENCH"})
+    else:
+        events.append({"type": "complete", "job_id": job["id"], "qc_result": env.n8n.results_for(job["id"])})
+    return events
+
+
+async def run_mode(mode: str, args) -> dict:
+    random.seed(args.seed)
+    async with BenchEnv(db_latency_ms=args.db_latency_ms) as env:
+        team = env.db.seed_team()
+        jobs = env.seed_jobs(team["team"]["id"], args.jobs, status="processing")
+        per_job = [job_events(env, job, args.progress_per_job, args.fail_rate) for job in jobs]
+        expected = {events[-1]["job_id"]: "completed" if events[-1]["type"] == "complete" else "failed"
+                    for events in per_job}
+        total_events = sum(len(events) for events in per_job)
+        recorder = Recorder()
+        env.db.calls = 0
+
+        if mode == "single":
+            # Each job's events in order, jobs concurrently
+            async def send(i: int):
+                for event in per_job[i]:
+                    body = {k: v for k, v in event.items() if k != "type"}
+                    await recorder.timed(env.client.post(
+                        SINGLE_PATHS[event["type"]], json=body, headers=env.callback_headers()
+                    ))
+            count = len(per_job)
+        else:
+            stream = [event for events in per_job for event in events]
+            batches = [stream[i:i + args.batch_size] for i in range(0, len(stream), args.batch_size)]
+
+            async def send(i: int):
+                await recorder.timed(env.client.post(
+                    "/v1/callbacks/n8n/batch", json={"events": batches[i]}, headers=env.callback_headers()
+                ))
+            count = len(batches)
+
+        start = time.perf_counter()
+        await run_concurrently(send, count, args.concurrency)
+        elapsed = time.perf_counter() - start
+
+        rows = {row["id"]: row["status"] for row in env.db.tables["qc_jobs"]}
+        wrong = sum(1 for job_id, status in expected.items() if rows.get(job_id) != status)
+        latencies = sorted(recorder.latencies)
+        return {
+            "events": total_events,
+            "requests": len(latencies),
+            "elapsed_sec": round(elapsed, 3),
+            "events_per_sec": round(total_events / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "db_calls_per_event": round(env.db.calls / total_events, 2),
+            "outcomes": dict(recorder.outcomes),
+            "wrong_final_state": wrong,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--progress-per-job", type=int, default=2)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {mode: asyncio.run(run_mode(mode, args)) for mode in ("single", "batch")}
+    for mode, result in results.items():
+        print(f"{mode:7} {result['events']} events in {result['requests']} requests: "
+              f"{result['events_per_sec']:8.1f} events/s  p50={result['p50_ms']}ms p95={result['p95_ms']}ms  "
+              f"db calls/event={result['db_calls_per_event']}  {result['outcomes']}")
+    print(f"speedup {results['batch']['events_per_sec'] / results['single']['events_per_sec']:.1f}x")
+
+    wrong = {mode: r["wrong_final_state"] for mode, r in results.items() if r["wrong_final_state"]}
+    if wrong:
+        print(f"FAILED: jobs in the wrong final state {wrong}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Credit ledger stress test
+
+Hammers one team's balance from many threads/requests and checks that no
+credits are lost (against the in-memory Supabase, whose ledger RPCs hold
+the db lock like the Postgres functions hold the teams row lock):
+
+- debits: N concurrent debits of 1 credit, first with the old
+  read-modify-write of teams.credits, then with credits.reserve(). The
+  read-modify-write loses updates; the ledger must not.
+- lifecycle: concurrent job creation through the API, then every job
+  completed or failed by n8n callbacks (with duplicate deliveries). At the
+  end nothing may be reserved, the balance must equal grants minus
+  captures, and it must match the balance recomputed from the ledger.
+
+Exits non-zero if an invariant is violated.
+
+Usage (from backend/):
+    python -m benchmarks.bench_credits [--debits 500] [--jobs 200] [--concurrency 32]
+                                       [--db-latency-ms 2]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import BenchEnv, Recorder, configure_env, run_concurrently
+
+configure_env()
+
+from app.core.supabase import set_supabase_client  # noqa: E402
+from app.services import credits  # noqa: E402
+from benchmarks.fakes import FakeSupabase, ledger_balances  # noqa: E402
+
+
+def legacy_debit(db: FakeSupabase, team_id: str) -> None:
+    """The pre-ledger create_job debit: read credits, write credits - 1."""
+    current = db.table("teams").select("credits").eq("id", team_id).execute().data[0]["credits"]
+    db.table("teams").update({"credits": current - 1}).eq("id", team_id).execute()
+
+
+def check_debits(debits: int, concurrency: int, latency_ms: float) -> dict:
+    results = {}
+    for mode in ("read_modify_write", "ledger"):
+        db = FakeSupabase(latency_ms=latency_ms)
+        set_supabase_client(db)
+        team_id = db.seed_team(credits=debits)["team"]["id"]
+
+        if mode == "ledger":
+            debit = lambda _: credits.reserve(team_id, uuid.uuid4(), 1)  # noqa: E731
+        else:
+            debit = lambda _: legacy_debit(db, team_id)  # noqa: E731
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(debit, range(debits)))
+
+        balance = db.tables["teams"][0]["credits"]
+        results[mode] = {"expected_balance": 0, "balance": balance, "lost_debits": balance}
+    set_supabase_client(None)
+    return results
+
+
+async def check_lifecycle(jobs: int, concurrency: int, latency_ms: float) -> dict:
+    async with BenchEnv(db_latency_ms=latency_ms) as env:
+        # Several users per team so creations race on the same balance
+        team = env.db.seed_team(credits=jobs * 60, users=8)
+        team_id = team["team"]["id"]
+        granted = jobs * 60
+        recorder, callbacks = Recorder(), Recorder()
+
+        async def create(i: int):
+            await recorder.timed(env.client.post(
+                "/v1/jobs",
+                json={"video_url": f"https://cdn.bench.local/{i}.mp4", "duration_sec": 30, "qc_mode": "polisher"},
+                headers=env.auth(team["tokens"][i % len(team["tokens"])]),
+            ))
+
+        async def settle(job: dict):
+            path, body = random.choice([
+                ("/v1/callbacks/n8n/complete", {"qc_result": {"comments": []}}),
+                ("/v1/callbacks/n8n/failed", {"error": "workflow failed", "error_code": "BENCH"}),
+            ])
+            # n8n retries: some callbacks arrive twice, concurrently
+            for _ in range(2 if random.random() < 0.3 else 1):
+                await callbacks.timed(env.client.post(
+                    path, json={"job_id": job["id"], **body}, headers=env.callback_headers()
+                ))
+
+        # Interleave creations with settlements of the jobs created so far
+        async def mixed(i: int):
+            if i % 2 == 0:
+                await create(i // 2)
+            else:
+                unsettled = [j for j in env.db.tables["qc_jobs"] if j["status"] not in ("completed", "failed")]
+                if unsettled:
+                    await settle(random.choice(unsettled))
+
+        await run_concurrently(mixed, jobs * 2, concurrency)
+        remaining = [j for j in env.db.tables["qc_jobs"] if j["status"] not in ("completed", "failed")]
+        await asyncio.gather(*(settle(job) for job in remaining))
+
+        row = env.db.tables["teams"][0]
+        captured = sum(e["amount"] for e in env.db.tables["credit_ledger"] if e["kind"] == "capture")
+        ledger_available, ledger_reserved = ledger_balances(env.db, team_id)
+        return {
+            "jobs_created": len(env.db.tables["qc_jobs"]),
+            "create_outcomes": dict(recorder.outcomes),
+            "callback_outcomes": dict(callbacks.outcomes),
+            "granted": granted,
+            "captured": captured,
+            "balance": row["credits"],
+            "reserved": row["credits_reserved"],
+            "ledger_balance": ledger_available,
+            "ledger_reserved": ledger_reserved,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--debits", type=int, default=500)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    failures = []
+
+    debits = check_debits(args.debits, args.concurrency, args.db_latency_ms)
+    for mode, result in debits.items():
+        print(f"{mode:18} {args.debits} concurrent debits -> balance {result['balance']} "
+              f"(expected 0, {result['lost_debits']} lost)")
+    if debits["ledger"]["lost_debits"]:
+        failures.append("ledger lost debits")
+
+    lifecycle = asyncio.run(check_lifecycle(args.jobs, args.concurrency, args.db_latency_ms))
+    print(f"lifecycle          {lifecycle['jobs_created']} jobs created {lifecycle['create_outcomes']}, "
+          f"callbacks {lifecycle['callback_outcomes']}")
+    print(f"                   granted {lifecycle['granted']}, captured {lifecycle['captured']}, "
+          f"balance {lifecycle['balance']} (ledger {lifecycle['ledger_balance']}), "
+          f"reserved {lifecycle['reserved']} (ledger {lifecycle['ledger_reserved']})")
+    if lifecycle["reserved"] or lifecycle["ledger_reserved"]:
+        failures.append("credits left reserved after every job settled")
+    if lifecycle["balance"] != lifecycle["granted"] - lifecycle["captured"]:
+        failures.append("balance != granted - captured")
+    if (lifecycle["balance"], lifecycle["reserved"]) != (lifecycle["ledger_balance"], lifecycle["ledger_reserved"]):
+        failures.append("materialized balance drifted from the ledger")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: no credits lost")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Logging overhead benchmark
+
+Compares the per-job cost of the old print()-based dispatch logging (full
+payload incl. base64 thumbnail + headers, synchronous stdout) with the
+structured, level-gated, queue-based logger.
+
+Usage (from backend/):
+    python -m benchmarks.bench_logging [--jobs 2000]
+"""
+
+import argparse
+import base64
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from app.core.logger import get_logger, redact, setup_logging, shutdown_logging, bind_job
+
+
+def make_payload(i: int) -> dict:
+    thumbnail = "data:image/jpeg;base64," + base64.b64encode(os.urandom(60_000)).decode()
+    return {
+        "job_id": f"job-{i}",
+        "video_url": "https://cdn.example.com/videos/final_cut_v3.mp4",
+        "qc_mode": "guardian",
+        "duration_sec": 95,
+        "team_id": "team-1",
+        "thumbnail_url": thumbnail,
+        "callback_urls": {"complete": "https://api.example.com/v1/callbacks/n8n/complete"},
+    }
+
+
+HEADERS = {"Content-Type": "application/json", "X-API-Key": "secret-key"}
+
+
+def bench_print(payloads, out) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        for payload in payloads:
+            print(f"[n8n] Sending request to: https://n8n.example.com/webhook/x")
+            print(f"[n8n] Payload: {payload}")
+            print(f"[n8n] Headers: {HEADERS}")
+            print(f"[n8n] Response status: 200")
+            print(f"[worker] Job {payload['job_id']} dispatched to n8n")
+        out.flush()
+    return time.perf_counter() - start
+
+
+def bench_structured(payloads, level: str) -> float:
+    logger = get_logger("app.services.n8n")
+    start = time.perf_counter()
+    for payload in payloads:
+        with bind_job(payload["job_id"]):
+            logger.debug("Sending request to %s", "https://n8n.example.com/webhook/x")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("n8n payload", extra={"payload": redact(payload)})
+            logger.debug("n8n response %d", 200)
+            logger.info("Job dispatched to %s backend", "n8n")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=2000)
+    args = parser.parse_args()
+
+    payloads = [make_payload(i) for i in range(args.jobs)]
+
+    with tempfile.TemporaryFile("w") as out:
+        print_sec = bench_print(payloads, out)
+
+    real_stdout = sys.stdout
+    results = {}
+    for level in ("INFO", "DEBUG"):
+        with tempfile.TemporaryFile("w") as out:
+            sys.stdout = out
+            setup_logging(level)
+            results[level] = bench_structured(payloads, level)
+            shutdown_logging()
+            sys.stdout = real_stdout
+
+    print(f"jobs: {args.jobs}")
+    print(f"print() baseline:        {print_sec * 1e6 / args.jobs:8.1f} us/job")
+    for level, sec in results.items():
+        print(f"structured ({level:5}):    {sec * 1e6 / args.jobs:8.1f} us/job on the caller "
+              f"({print_sec / sec:.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Rate limiter overhead benchmark
+
+Measures what the RateLimitMiddleware adds to a request by calling a
+trivial ASGI app directly (no HTTP stack), with and without the limiter,
+for callers identified by JWT, callback API key and IP.
+
+Usage (from backend/):
+    python -m benchmarks.bench_rate_limit [--requests 50000] [--callers 1000]
+                                          [--redis-url redis://localhost:6379/0]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import jwt
+
+from app.core.rate_limit import MemoryStore, RateLimiter, RateLimitMiddleware, RedisStore, Rule, principal_for
+
+JWT_SECRET = "bench-secret"
+N8N_API_KEY = "bench-n8n-key"
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+def make_scopes(callers: int, kind: str):
+    scopes = []
+    for i in range(callers):
+        headers = []
+        if kind == "jwt":
+            token = jwt.encode({"sub": str(uuid.uuid4())}, JWT_SECRET, algorithm="HS256")
+            headers.append((b"authorization", f"Bearer {token}".encode()))
+        elif kind == "api_key":
+            headers.append((b"x-api-key", N8N_API_KEY.encode()))
+        scopes.append({
+            "type": "http", "method": "GET", "path": "/v1/jobs",
+            "headers": headers, "client": (f"10.0.{i // 256}.{i % 256}", 40000),
+        })
+    return scopes
+
+
+async def time_app(app, scopes, requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % len(scopes)], receive, send)
+    return time.perf_counter() - start
+
+
+def limiter_for(store) -> RateLimiter:
+    # Budgets large enough that nothing is rejected; we time the bookkeeping
+    rules = [Rule(name="jobs_read", method="GET", path="/v1/jobs", rate=1e9, burst=10**9)]
+    return RateLimiter(rules, Rule(name="default", rate=1e9, burst=10**9), store, ("/metrics",),
+                       jwt_secret=JWT_SECRET, n8n_api_key=N8N_API_KEY)
+
+
+async def main_async(args):
+    baseline = await time_app(ok_app, make_scopes(1, "ip"), args.requests)
+    print(f"requests: {args.requests}, callers: {args.callers}")
+    print(f"{'no limiter':28} {baseline * 1e6 / args.requests:8.2f} us/request")
+
+    stores = {"memory": MemoryStore()}
+    if args.redis_url:
+        stores["redis"] = RedisStore(args.redis_url)
+
+    for kind in ("jwt", "api_key", "ip"):
+        scopes = make_scopes(args.callers, kind)
+        start = time.perf_counter()
+        for i in range(args.requests):
+            principal_for(scopes[i % len(scopes)], JWT_SECRET, n8n_api_key=N8N_API_KEY)
+        identify = time.perf_counter() - start
+        print(f"{'principal_for (' + kind + ')':28} {identify * 1e6 / args.requests:8.2f} us/request")
+
+        for name, store in stores.items():
+            app = RateLimitMiddleware(ok_app, limiter_for(store))
+            requests = args.requests if name == "memory" else min(args.requests, 5000)
+            elapsed = await time_app(app, scopes, requests)
+            overhead = elapsed / requests - baseline / args.requests
+            print(f"{'limiter ' + name + ' (' + kind + ')':28} {elapsed * 1e6 / requests:8.2f} us/request "
+                  f"(+{overhead * 1e6:.2f} us)")
+
+    for store in stores.values():
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50_000)
+    parser.add_argument("--callers", type=int, default=1000)
+    parser.add_argument("--redis-url")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Read replica routing check
+
+Runs the same dashboard workload against the in-memory Supabase primary
+alone, then with two FakeReplica stand-ins (see app.core.db_router). Each
+user repeatedly creates a job, reads it back (detail, list, profile
+credits), marks it failed, reads it back again, then keeps polling the
+job list. Every read of the user's own write is checked:
+
+- primary: no replicas (baseline primary load)
+- replicas: two replicas; reads of own writes must never be stale
+- no_sticky: READ_REPLICA_STICKY_SEC=0, which must produce stale reads
+  (shows the check can see them)
+- stalled: the second replica stops replicating; the router must drop it
+  once its lag passes READ_REPLICA_MAX_LAG_SEC, still without stale reads
+
+Exits non-zero if replicas or stalled read a stale write, or no_sticky
+reads none.
+
+Usage (from backend/):
+    python -m benchmarks.bench_replicas [--users 20] [--rounds 3] [--polls 10]
+                                        [--replica-lag-sec 0.2] [--db-latency-ms 2]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.harness import BenchEnv, Recorder, configure_env, percentile, run_concurrently
+
+configure_env()
+
+from app.core.config import get_settings  # noqa: E402
+from app.core.db_router import db_router  # noqa: E402
+from benchmarks.fakes import FakeReplica  # noqa: E402
+
+MODES = ("primary", "replicas", "no_sticky", "stalled")
+JOB_CREDITS = 60  # polisher, 60 s
+
+
+async def run_mode(mode: str, args) -> dict:
+    settings = get_settings()
+    saved = {name: getattr(settings, name) for name in (
+        "READ_REPLICA_STICKY_SEC", "READ_REPLICA_MAX_LAG_SEC", "READ_REPLICA_LAG_CHECK_SEC",
+        "JOB_READ_CACHE_TTL_SEC", "PROFILE_CACHE_TTL_SEC",
+    )}
+    # Every read goes to the database, so routing decides what it sees
+    settings.JOB_READ_CACHE_TTL_SEC = 0
+    settings.PROFILE_CACHE_TTL_SEC = 0
+    settings.READ_REPLICA_MAX_LAG_SEC = args.replica_lag_sec * 2.5
+    settings.READ_REPLICA_LAG_CHECK_SEC = args.replica_lag_sec
+    settings.READ_REPLICA_STICKY_SEC = 0 if mode == "no_sticky" else args.replica_lag_sec * 5
+
+    async with BenchEnv(db_latency_ms=args.db_latency_ms) as env:
+        replicas = []
+        if mode != "primary":
+            replicas = [FakeReplica(env.db, args.replica_lag_sec, args.db_latency_ms) for _ in range(2)]
+        teams = [env.db.seed_team(credits=JOB_CREDITS * 100) for _ in range(args.users)]
+        for replica in replicas:
+            replica.sync()
+            replica.start()
+        if mode == "stalled":
+            replicas[1].pause()
+        db_router.set_replica_clients(replicas or None)
+
+        recorder = Recorder()
+        stale = []
+
+        async def get(path: str, headers: dict):
+            response = await recorder.timed(env.client.get(path, headers=headers))
+            return response.json() if response.status_code == 200 else None
+
+        async def check(i: int, job_id: str, status: str, credits: int):
+            headers = env.auth(teams[i]["tokens"][0])
+            job = await get(f"/v1/jobs/{job_id}", headers)
+            if job is None or job["status"] != status:
+                stale.append(("job", job and job["status"], status))
+            jobs = await get("/v1/jobs", headers) or []
+            if not any(j["id"] == job_id and j["status"] == status for j in jobs):
+                stale.append(("list", None, status))
+            profile = await get("/v1/profile", headers)
+            if profile is None or profile["credits"] != credits:
+                stale.append(("credits", profile and profile["credits"], credits))
+
+        async def user(i: int):
+            headers = env.auth(teams[i]["tokens"][0])
+            credits = JOB_CREDITS * 100
+            for _ in range(args.rounds):
+                response = await recorder.timed(env.client.post("/v1/jobs", json={
+                    "video_url": f"https://cdn.bench.local/{i}.mp4", "duration_sec": 60, "qc_mode": "polisher"
+                }, headers=headers))
+                job_id = response.json()["id"]
+                await check(i, job_id, "pending", credits - JOB_CREDITS)
+                await recorder.timed(env.client.patch(
+                    f"/v1/jobs/{job_id}/status", json={"status": "failed"}, headers=headers
+                ))
+                await check(i, job_id, "failed", credits)
+                for _ in range(args.polls):
+                    await asyncio.sleep(args.poll_interval_sec)
+                    await get("/v1/jobs", headers)
+
+        env.db.calls = 0
+        start = time.perf_counter()
+        await run_concurrently(user, args.users, args.users)
+        elapsed = time.perf_counter() - start
+
+        for replica in replicas:
+            replica.stop()
+        db_router.set_replica_clients(None)
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+        latencies = sorted(recorder.latencies)
+        return {
+            "requests": len(latencies),
+            "elapsed_sec": round(elapsed, 3),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "primary_calls": env.db.calls,
+            "replica_calls": [r.calls for r in replicas],
+            "stale_reads": len(stale),
+            "outcomes": dict(recorder.outcomes),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--polls", type=int, default=10, help="job list polls after each round")
+    parser.add_argument("--poll-interval-sec", type=float, default=0.1)
+    parser.add_argument("--replica-lag-sec", type=float, default=0.2,
+                        help="replication interval of the fake replicas")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in MODES:
+        results[mode] = result = asyncio.run(run_mode(mode, args))
+        print(f"{mode:9} {result['requests']} requests  p50={result['p50_ms']}ms p95={result['p95_ms']}ms  "
+              f"primary calls={result['primary_calls']} replica calls={result['replica_calls']}  "
+              f"stale reads={result['stale_reads']}  {result['outcomes']}")
+    primary = results["primary"]["primary_calls"]
+    print(f"primary load with replicas: {results['replicas']['primary_calls'] / primary:.0%} of primary-only")
+
+    failed = [mode for mode in ("replicas", "stalled") if results[mode]["stale_reads"]]
+    if failed:
+        print(f"FAILED: stale reads of own writes in {failed}")
+    if not results["no_sticky"]["stale_reads"]:
+        print("FAILED: no stale reads without stickiness; the check can't see them")
+    if failed or not results["no_sticky"]["stale_reads"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Job list serialization benchmark
+
+Compares FastAPI's default response path for GET /v1/jobs
+(jsonable_encoder + json.dumps) with FastJSONResponse, and the bytes on
+the wire with gzip/brotli, for a realistic team history: completed jobs
+with structured qc_result comments, artifacts and base64 thumbnails.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--jobs 300] [--comments 40] [--rounds 20]
+"""
+
+import argparse
+import base64
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.responses import CompressionMiddleware, FastJSONResponse, brotli, orjson
+
+CATEGORIES = ["audio", "grammar", "visual", "technical", "brand"]
+
+
+def make_job(i: int, comments: int, thumbnail_bytes: int) -> dict:
+    created = datetime.now(timezone.utc) - timedelta(hours=i)
+    return {
+        "id": str(uuid.uuid4()),
+        "team_id": "4f1c2a6e-0d3b-4b8e-9c51-2f7a8e6d1b90",
+        "video_url": f"https://storage.example.com/uploads/{uuid.uuid4().hex}/final_cut_v{i % 7}.mp4",
+        "status": "completed",
+        "qc_mode": random.choice(["polisher", "guardian"]),
+        "duration_sec": random.randint(30, 1800),
+        "credits_used": random.randint(30, 3600),
+        "created_at": created.isoformat(),
+        "trace_id": uuid.uuid4().hex,
+        "thumbnail_url": "data:image/jpeg;base64," + base64.b64encode(os.urandom(thumbnail_bytes)).decode()
+        if thumbnail_bytes else None,
+        "artifacts": {
+            "pdf": f"https://storage.example.com/reports/{i}.pdf",
+            "edl": f"https://storage.example.com/reports/{i}.edl",
+        },
+        "qc_result": {
+            "comments": [
+                {
+                    "timestamp": f"00:{c // 60:02d}:{c % 60:02d}",
+                    "timestamp_seconds": c,
+                    "category": random.choice(CATEGORIES),
+                    "severity": random.choice(["low", "medium", "high"]),
+                    "issue": "Audio peaks above -1 dBFS during the voice-over",
+                    "suggestion": "Apply a limiter at -1 dBFS on the dialogue bus and re-export",
+                }
+                for c in range(comments)
+            ],
+            "summary": {"total_issues": comments, "high": comments // 4, "medium": comments // 2},
+        },
+    }
+
+
+def bench(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return (time.perf_counter() - start) / rounds, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--comments", type=int, default=40)
+    parser.add_argument("--thumbnail-kb", type=int, default=12, help="0 to omit thumbnails")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(1)
+    rows = [make_job(i, args.comments, args.thumbnail_kb * 1024) for i in range(args.jobs)]
+
+    default_sec, default_body = bench(lambda: JSONResponse(jsonable_encoder(rows)).body, args.rounds)
+    fast_sec, fast_body = bench(lambda: FastJSONResponse(rows).body, args.rounds)
+
+    print(f"jobs: {args.jobs}, comments/job: {args.comments}, thumbnail: {args.thumbnail_kb} KB, "
+          f"encoder: {'orjson' if orjson else 'json (orjson not installed)'}")
+    print(f"jsonable_encoder + json   {default_sec * 1000:9.2f} ms  {len(default_body) / 1024:9.1f} KB")
+    print(f"FastJSONResponse          {fast_sec * 1000:9.2f} ms  {len(fast_body) / 1024:9.1f} KB  "
+          f"({default_sec / fast_sec:.1f}x faster)")
+
+    middleware = CompressionMiddleware(None)
+    encodings = ["gzip"] + (["br"] if brotli else [])
+    for encoding in encodings:
+        sec, compressed = bench(lambda: middleware.compress(fast_body, encoding), max(1, args.rounds // 4))
+        print(f"{encoding:25} {sec * 1000:9.2f} ms  {len(compressed) / 1024:9.1f} KB  "
+              f"({len(fast_body) / len(compressed):.1f}x smaller)")
+    if not brotli:
+        print("br                        skipped (pip install brotli)")
+
+
+if __name__ == "__main__":
+    main()
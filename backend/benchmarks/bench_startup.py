@@ -0,0 +1,132 @@
+"""
+Cold start benchmark
+
+Measures, in fresh interpreter processes:
+- import: `import app.main` and create_app() (and the slowest modules
+  from -X importtime)
+- lifespan: running the app's startup (worker disabled)
+- first_request: first successful GET /v1/health
+- supabase_client: building the real Supabase client (no network)
+- first_db_request: first successful GET /v1/jobs (in-memory Supabase)
+- total: process start to first successful GET /v1/jobs
+
+Results go to benchmarks/results/ like benchmarks.run, so startup can be
+tracked across commits with --compare.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 5] [--compare benchmarks/results/<file>.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import BENCH_ENV, compare, format_summary, summarize, write_results
+
+PHASES = ("import", "lifespan", "first_request", "supabase_client", "first_db_request", "total")
+
+
+def child() -> None:
+    """One cold start; prints phase durations (seconds) as JSON."""
+    started = float(os.environ["BENCH_STARTED"])
+    phases = {}
+    t = time.perf_counter()
+    from app.main import create_app
+    app = create_app()
+    phases["import"] = time.perf_counter() - t
+
+    import asyncio
+    import httpx
+    from app.core.supabase import get_supabase, set_supabase_client
+    from benchmarks.fakes import FakeSupabase
+
+    async def run():
+        db = FakeSupabase()
+        team = db.seed_team()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+            t = time.perf_counter()
+            async with app.router.lifespan_context(app):
+                phases["lifespan"] = time.perf_counter() - t
+
+                t = time.perf_counter()
+                response = await client.get("/v1/health")
+                response.raise_for_status()
+                phases["first_request"] = time.perf_counter() - t
+
+                t = time.perf_counter()
+                await asyncio.to_thread(get_supabase)
+                phases["supabase_client"] = time.perf_counter() - t
+                set_supabase_client(db)
+
+                t = time.perf_counter()
+                response = await client.get("/v1/jobs", headers={"Authorization": f"Bearer {team['tokens'][0]}"})
+                response.raise_for_status()
+                phases["first_db_request"] = time.perf_counter() - t
+                phases["total"] = time.time() - started
+
+    asyncio.run(run())
+    print(json.dumps(phases))
+
+
+def slowest_imports(env: dict, top: int) -> list:
+    """Top-level modules by cumulative import time (ms) from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                            capture_output=True, text=True, env=env, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            # Only direct imports of app modules / top-level packages
+            depth = (len(name) - len(name.lstrip())) // 2
+            modules.append((int(cumulative), name.strip(), depth))
+        except ValueError:
+            continue
+    shallow = [m for m in modules if m[2] <= 1]
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)}
+            for us, name, _ in sorted(shallow, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    env = {**BENCH_ENV, **os.environ, "RUN_WORKER_IN_API": "false"}
+    samples = {phase: [] for phase in PHASES}
+    for _ in range(args.runs):
+        env["BENCH_STARTED"] = repr(time.time())
+        result = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+                                capture_output=True, text=True, env=env, check=True)
+        phases = json.loads(result.stdout.strip().splitlines()[-1])
+        for phase in PHASES:
+            samples[phase].append(phases[phase])
+
+    results = {phase: summarize(values, sum(values)) for phase, values in samples.items()}
+    results["import"]["slowest_imports"] = slowest_imports(env, args.top)
+    for phase in PHASES:
+        print(format_summary(phase, results[phase]))
+    print("slowest imports:")
+    for item in results["import"]["slowest_imports"]:
+        print(f"  {item['cumulative_ms']:8.1f} ms  {item['module']}")
+
+    path = write_results(results, {"runs": args.runs, "benchmark": "startup"}, args.output)
+    print(f"results: {path}")
+    if args.compare:
+        print(compare(args.compare, results))
+
+
+if __name__ == "__main__":
+    main()
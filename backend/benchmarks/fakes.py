@@ -0,0 +1,769 @@
+"""
+Local stand-ins for Supabase and n8n
+
+- FakeSupabase: in-memory, thread-safe stand-in for the subset of the
+  supabase-py client the app uses (table().select/insert/update/delete/upsert
+  with PostgREST-style filters, embedded "teams(*)" joins, count="exact",
+  rpc(), auth.get_user()). Optional per-call latency models the network.
+  The Postgres functions of the migrations (credit ledger, webhook claims,
+  bulk job transitions) are registered as RPCs with the same semantics.
+- FakeReplica: read replica of a FakeSupabase that copies the primary's
+  tables and WAL position every `lag_sec` (and can be paused), with
+  replica_lag_seconds() measured against the primary's primary_wal_lsn().
+- FakeRedis: in-memory stand-in for the redis-py client subset used by
+  app.core.cache (get/set with px, delete, scan_iter, publish, pubsub)
+- StubN8N: httpx transport handler standing in for the n8n webhook, with
+  configurable latency and sync (results in the response) or async
+  (callback to /v1/callbacks/n8n/complete later) behaviour.
+- WebhookReceiver: httpx transport standing in for customer webhook
+  endpoints; verifies signatures and records event arrival times.
+"""
+
+import asyncio
+import copy
+import fnmatch
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+
+def utcnow_iso() -> str:
+    # Fixed-width so string comparison orders correctly (like timestamptz text)
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+# ============================================
+# Supabase
+# ============================================
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _norm(value: Any) -> Any:
+    """Compare like PostgREST does over the wire: everything as text-ish."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class FakeQuery:
+    """Chainable query builder mirroring postgrest's request builders."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table_name = table
+        self.op = "select"
+        self.columns = "*"
+        self.count_mode = None
+        self.payload: Any = None
+        self.filters: List[Callable[[dict], bool]] = []
+        self.order_by: List[tuple] = []
+        self.limit_n: Optional[int] = None
+        self.offset_n = 0
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self.negate_next = False
+
+    # Operations
+    def select(self, *columns: str, count: Optional[str] = None):
+        self.op = "select" if self.op == "select" else self.op
+        self.columns = ",".join(columns) if columns else "*"
+        self.count_mode = count
+        return self
+
+    def insert(self, payload, **_):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "id", ignore_duplicates: bool = False, **_):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **_):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self, **_):
+        self.op = "delete"
+        return self
+
+    # Filters
+    def _add(self, fn):
+        if self.negate_next:
+            self.negate_next, negated = False, fn
+            fn = lambda row: not negated(row)  # noqa: E731
+        self.filters.append(fn)
+        return self
+
+    @property
+    def not_(self):
+        """Negate the next filter, like postgrest's `.not_.is_(...)`."""
+        self.negate_next = True
+        return self
+
+    def eq(self, column, value):
+        value = _norm(value)
+        return self._add(lambda row: _norm(row.get(column)) == value)
+
+    def neq(self, column, value):
+        value = _norm(value)
+        return self._add(lambda row: _norm(row.get(column)) != value)
+
+    def gt(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def gte(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and row.get(column) >= value)
+
+    def lt(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and row.get(column) < value)
+
+    def lte(self, column, value):
+        return self._add(lambda row: row.get(column) is not None and row.get(column) <= value)
+
+    def in_(self, column, values):
+        values = {_norm(v) for v in values}
+        return self._add(lambda row: _norm(row.get(column)) in values)
+
+    def is_(self, column, value):
+        if value in (None, "null"):
+            return self._add(lambda row: row.get(column) is None)
+        return self._add(lambda row: row.get(column) is value)
+
+    def order(self, column, desc: bool = False, **_):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, n: int, **_):
+        self.limit_n = n
+        return self
+
+    def range(self, start: int, end: int, **_):
+        self.offset_n, self.limit_n = start, end - start + 1
+        return self
+
+    def execute(self) -> FakeResponse:
+        self.db._before_call()
+        with self.db.lock:
+            self.db.calls += 1
+            if self.op != "select":
+                self.db._wrote()
+            return getattr(self, f"_exec_{self.op}")()
+
+    # Execution
+    def _rows(self) -> List[dict]:
+        return self.db.tables.setdefault(self.table_name, [])
+
+    def _matching(self) -> List[dict]:
+        return [row for row in self._rows() if all(f(row) for f in self.filters)]
+
+    def _project(self, row: dict) -> dict:
+        columns = [c.strip() for c in self.columns.split(",") if c.strip()]
+        result = {}
+        for column in columns:
+            if column == "*":
+                result.update(row)
+            elif column.endswith("(*)"):
+                ref = column[:-3]
+                fk = row.get(f"{ref.rstrip('s')}_id")
+                match = next((r for r in self.db.tables.get(ref, []) if r.get("id") == fk), None)
+                result[ref] = copy.deepcopy(match)
+            else:
+                result[column] = row.get(column)
+        return copy.deepcopy(result)
+
+    def _exec_select(self) -> FakeResponse:
+        rows = self._matching()
+        count = len(rows) if self.count_mode else None
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        rows = rows[self.offset_n:]
+        if self.limit_n is not None:
+            rows = rows[:self.limit_n]
+        return FakeResponse([self._project(r) for r in rows], count)
+
+    def _prepare(self, row: dict) -> dict:
+        row = copy.deepcopy(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        row["id"] = _norm(row["id"])
+        row.setdefault("created_at", utcnow_iso())
+        for column, default in self.db.defaults.get(self.table_name, {}).items():
+            row.setdefault(column, copy.deepcopy(default))
+        return row
+
+    def _exec_insert(self) -> FakeResponse:
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        rows = [self._prepare(r) for r in payload]
+        existing = {r["id"] for r in self._rows()}
+        for row in rows:
+            if row["id"] in existing:
+                raise Exception(f'duplicate key value violates unique constraint "{self.table_name}_pkey"')
+        self._rows().extend(rows)
+        return FakeResponse(copy.deepcopy(rows))
+
+    def _exec_upsert(self) -> FakeResponse:
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        keys = [k.strip() for k in self.on_conflict.split(",")]
+        result = []
+        for item in payload:
+            match = next((r for r in self._rows() if all(_norm(r.get(k)) == _norm(item.get(k)) for k in keys)), None)
+            if match is not None:
+                if self.ignore_duplicates:
+                    continue
+                match.update(copy.deepcopy(item))
+                result.append(copy.deepcopy(match))
+            else:
+                row = self._prepare(item)
+                self._rows().append(row)
+                result.append(copy.deepcopy(row))
+        return FakeResponse(result)
+
+    def _exec_update(self) -> FakeResponse:
+        rows = self._matching()
+        for row in rows:
+            row.update(copy.deepcopy(self.payload))
+        return FakeResponse(copy.deepcopy(rows))
+
+    def _exec_delete(self) -> FakeResponse:
+        rows = self._matching()
+        ids = {id(r) for r in rows}
+        self.db.tables[self.table_name] = [r for r in self._rows() if id(r) not in ids]
+        return FakeResponse(copy.deepcopy(rows))
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: dict):
+        self.db, self.name, self.params = db, name, params or {}
+
+    def execute(self) -> FakeResponse:
+        self.db._before_call()
+        if self.name not in self.db.rpcs:
+            raise Exception(f"Could not find the function public.{self.name}")
+        with self.db.lock:
+            self.db.calls += 1
+            if self.name not in _READ_ONLY_RPCS:
+                self.db._wrote()
+            return FakeResponse(self.db.rpcs[self.name](self.db, **self.params))
+
+
+class FakeAuth:
+    def __init__(self, db: "FakeSupabase"):
+        self.db = db
+
+    def get_user(self, token: str):
+        self.db._before_call()
+        user = self.db.auth_users.get(token)
+        if user is None:
+            raise Exception("Invalid JWT")
+        return SimpleNamespace(user=user)
+
+
+# Credit ledger functions (migrations/versions/0003_credit_ledger.sql); RPCs
+# run under the db lock, which stands in for the teams row lock
+
+def _ledger_append(db: "FakeSupabase", team_id: str, kind: str, amount: int,
+                   job_id: Optional[str] = None, reason: Optional[str] = None) -> None:
+    db.tables["credit_ledger"].append({
+        "id": len(db.tables["credit_ledger"]) + 1, "team_id": team_id, "job_id": job_id,
+        "kind": kind, "amount": amount, "reason": reason, "created_at": utcnow_iso(),
+    })
+
+
+def _team_row(db: "FakeSupabase", team_id: str) -> dict:
+    team = next((t for t in db.tables["teams"] if t["id"] == _norm(team_id)), None)
+    if team is None:
+        raise Exception(f"team {team_id} not found")
+    return team
+
+
+def _ledger_entry(db: "FakeSupabase", job_id: str, *kinds: str) -> Optional[dict]:
+    return next((e for e in db.tables["credit_ledger"] if e["job_id"] == job_id and e["kind"] in kinds), None)
+
+
+def _credit_grant(db: "FakeSupabase", p_team_id: str, p_amount: int, p_reason: str) -> int:
+    team = _team_row(db, p_team_id)
+    team["credits"] = (team.get("credits") or 0) + p_amount
+    _ledger_append(db, team["id"], "grant", p_amount, reason=p_reason)
+    return team["credits"]
+
+
+def _credit_reserve(db: "FakeSupabase", p_team_id: str, p_job_id: str, p_amount: int) -> List[dict]:
+    team = _team_row(db, p_team_id)
+    available = team.get("credits") or 0
+    if _ledger_entry(db, p_job_id, "reserve"):
+        return [{"ok": True, "balance": available}]
+    if available < p_amount:
+        return [{"ok": False, "balance": available}]
+    team["credits"] = available - p_amount
+    team["credits_reserved"] = team.get("credits_reserved", 0) + p_amount
+    _ledger_append(db, team["id"], "reserve", p_amount, job_id=p_job_id)
+    return [{"ok": True, "balance": team["credits"]}]
+
+
+def _credit_settle(db: "FakeSupabase", p_job_id: str, kind: str, reason: Optional[str] = None) -> bool:
+    reserve = _ledger_entry(db, p_job_id, "reserve")
+    if reserve is None or _ledger_entry(db, p_job_id, "capture", "release"):
+        return False
+    team = _team_row(db, reserve["team_id"])
+    team["credits_reserved"] -= reserve["amount"]
+    if kind == "release":
+        team["credits"] = (team.get("credits") or 0) + reserve["amount"]
+    _ledger_append(db, team["id"], kind, reserve["amount"], job_id=p_job_id, reason=reason)
+    return True
+
+
+CREDIT_RPCS: Dict[str, Callable] = {
+    "credit_grant": _credit_grant,
+    "credit_reserve": _credit_reserve,
+    "credit_capture": lambda db, p_job_id: _credit_settle(db, p_job_id, "capture"),
+    "credit_release": lambda db, p_job_id, p_reason=None: _credit_settle(db, p_job_id, "release", p_reason),
+}
+
+
+def _webhook_claim_deliveries(db: "FakeSupabase", p_limit: int, p_lease_sec: int) -> List[dict]:
+    """migrations/versions/0006_webhooks.sql: lease up to p_limit due deliveries."""
+    now = utcnow_iso()
+    due = sorted(
+        (row for row in db.tables.setdefault("webhook_outbox", [])
+         if row["status"] == "pending" and (row.get("next_attempt_at") or row["created_at"]) <= now),
+        key=lambda row: row.get("next_attempt_at") or row["created_at"],
+    )[:p_limit]
+    lease = (datetime.now(timezone.utc) + timedelta(seconds=p_lease_sec)).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+    for row in due:
+        row["next_attempt_at"] = lease
+    return copy.deepcopy(due)
+
+
+def _qc_jobs_finish(db: "FakeSupabase", p_status: str, p_jobs: List[dict]) -> List[str]:
+    """migrations/versions/0007_callback_batches.sql: bulk final-state update."""
+    by_id = {_norm(job["id"]): job for job in p_jobs}
+    updated = []
+    for row in db.tables["qc_jobs"]:
+        job = by_id.get(row["id"])
+        if job is None or row["status"] in ("completed", "failed"):
+            continue
+        row["status"] = p_status
+        row["qc_result"] = copy.deepcopy(job.get("qc_result"))
+        if job.get("artifacts") is not None:
+            row["artifacts"] = copy.deepcopy(job["artifacts"])
+        updated.append(row["id"])
+    return updated
+
+
+def _qc_jobs_set_progress(db: "FakeSupabase", p_jobs: List[dict]) -> List[str]:
+    """migrations/versions/0008_job_progress.sql: bulk progress of active jobs."""
+    by_id = {_norm(job["id"]): job for job in p_jobs}
+    updated = []
+    for row in db.tables["qc_jobs"]:
+        job = by_id.get(row["id"])
+        if job is None or row["status"] not in ("pending", "processing"):
+            continue
+        row.update(progress=job["progress"], progress_message=job.get("message"), progress_updated_at=utcnow_iso())
+        updated.append(row["id"])
+    return updated
+
+
+def _onboard_user(db: "FakeSupabase", p_user_id: str, p_email: Optional[str], p_plan_type: str,
+                  p_team_name: str, p_trial_credits: int) -> List[dict]:
+    """migrations/versions/0009_onboarding.sql: create or get a user's profile."""
+    user = next((u for u in db.tables["users"] if u["id"] == _norm(p_user_id)), None)
+    if user is not None:
+        team = next((t for t in db.tables["teams"] if t["id"] == user.get("team_id")), None)
+        return [{"team_id": user.get("team_id"), "plan_type": user.get("plan_type"),
+                 "credits": (team or {}).get("credits") or 0, "is_new_user": False}]
+    team = db.table("teams")._prepare({"name": p_team_name, "credits": 0})
+    db.tables["teams"].append(team)
+    credits = _credit_grant(db, team["id"], p_trial_credits, "TRIAL_CREDITS") if p_trial_credits > 0 else 0
+    db.tables["users"].append(db.table("users")._prepare({
+        "id": p_user_id, "email": p_email, "team_id": team["id"], "plan_type": p_plan_type
+    }))
+    return [{"team_id": team["id"], "plan_type": p_plan_type, "credits": credits, "is_new_user": True}]
+
+
+def ledger_balances(db: "FakeSupabase", team_id: str) -> tuple:
+    """(available, reserved) recomputed from the ledger, like credit_balance_drift."""
+    available = reserved = 0
+    for entry in db.tables["credit_ledger"]:
+        if entry["team_id"] != team_id:
+            continue
+        amount = entry["amount"]
+        if entry["kind"] == "grant":
+            available += amount
+        elif entry["kind"] == "reserve":
+            available -= amount
+            reserved += amount
+        elif entry["kind"] == "capture":
+            reserved -= amount
+        elif entry["kind"] == "release":
+            available += amount
+            reserved -= amount
+    return available, reserved
+
+
+# Replica lag (migrations/versions/0011_replica_lag_primary_lsn.sql). The
+# WAL position is a counter bumped by every write; a replica replays up to
+# the position and commit time of its last sync.
+
+_READ_ONLY_RPCS = {"primary_wal_lsn", "replica_lag_seconds"}
+
+
+def _primary_wal_lsn(db: "FakeSupabase") -> str:
+    return str(db.wal_lsn)
+
+
+def _replica_lag_seconds(db: "FakeReplica", p_primary_lsn: str) -> Optional[float]:
+    if db.replay_lsn >= int(p_primary_lsn):
+        return 0.0
+    if db.replay_timestamp is None:
+        return None
+    return time.time() - db.replay_timestamp
+
+
+class FakeSupabase:
+    """In-memory stand-in for the supabase-py Client."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, List[dict]] = {"teams": [], "users": [], "qc_jobs": [], "credit_ledger": []}
+        self.defaults: Dict[str, Dict[str, Any]] = {
+            "teams": {"credits_reserved": 0},
+            "qc_jobs": {"qc_result": None, "artifacts": None, "thumbnail_url": None},
+            "webhook_subscriptions": {"events": ["job.completed", "job.failed"], "batch_size": 1, "active": True},
+            "webhook_outbox": {"status": "pending", "attempts": 0, "last_error": None, "delivered_at": None},
+        }
+        self.rpcs: Dict[str, Callable] = {
+            **CREDIT_RPCS,
+            "webhook_claim_deliveries": _webhook_claim_deliveries,
+            "qc_jobs_finish": _qc_jobs_finish,
+            "qc_jobs_set_progress": _qc_jobs_set_progress,
+            "onboard_user": _onboard_user,
+            "primary_wal_lsn": _primary_wal_lsn,
+        }
+        self.auth_users: Dict[str, SimpleNamespace] = {}
+        self.auth = FakeAuth(self)
+        self.lock = threading.RLock()
+        self.calls = 0
+        self.wal_lsn = 0
+        self.wal_written_at: Optional[float] = None
+
+    def _before_call(self) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _wrote(self) -> None:
+        self.wal_lsn += 1
+        self.wal_written_at = time.time()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def register_rpc(self, name: str, fn: Callable) -> None:
+        """fn(db, **params) runs under the db lock, i.e. as one transaction."""
+        self.rpcs[name] = fn
+
+    def seed_team(self, credits: int = 1_000_000, users: int = 1) -> dict:
+        """Create a team with `users` members; returns {team, users, tokens}."""
+        team = self.table("teams").insert({"name": "Bench Team", "credits": 0}).execute().data[0]
+        if credits:
+            self.rpc("credit_grant", {"p_team_id": team["id"], "p_amount": credits, "p_reason": "bench"}).execute()
+            team["credits"] = credits
+        members, tokens = [], []
+        for _ in range(users):
+            user_id = str(uuid.uuid4())
+            email = f"{user_id[:8]}@bench.local"
+            member = self.table("users").insert({
+                "id": user_id, "email": email, "team_id": team["id"], "plan_type": "agency"
+            }).execute().data[0]
+            token = f"token-{user_id}"
+            self.auth_users[token] = SimpleNamespace(id=user_id, email=email)
+            members.append(member)
+            tokens.append(token)
+        return {"team": team, "users": members, "tokens": tokens}
+
+
+class FakeReplica(FakeSupabase):
+    """
+    Read replica of `primary`: serves a copy of its tables taken every
+    `lag_sec` by a background thread, so reads are up to lag_sec stale.
+    pause() stops replication (the lag then grows until resume()).
+    """
+
+    def __init__(self, primary: FakeSupabase, lag_sec: float = 0.5, latency_ms: float = 0.0):
+        super().__init__(latency_ms=latency_ms)
+        self.primary = primary
+        self.lag_sec = lag_sec
+        self.auth_users = primary.auth_users
+        self.paused = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.replay_lsn = 0
+        self.replay_timestamp: Optional[float] = None
+        self.register_rpc("replica_lag_seconds", _replica_lag_seconds)
+        self.sync()
+
+    def sync(self) -> None:
+        with self.primary.lock:
+            tables = copy.deepcopy(self.primary.tables)
+            lsn, written_at = self.primary.wal_lsn, self.primary.wal_written_at
+        with self.lock:
+            self.tables = tables
+            self.replay_lsn, self.replay_timestamp = lsn, written_at
+
+    def _replicate(self) -> None:
+        while not self._stop.wait(self.lag_sec):
+            if not self.paused.is_set():
+                self.sync()
+
+    def start(self) -> "FakeReplica":
+        self._thread = threading.Thread(target=self._replicate, name="fake-replica", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def pause(self) -> None:
+        self.paused.set()
+
+    def resume(self) -> None:
+        self.paused.clear()
+
+
+# ============================================
+# Redis
+# ============================================
+
+class FakePubSub:
+    def __init__(self, server: "FakeRedis", ignore_subscribe_messages: bool = False):
+        self.server = server
+        self.channels = set()
+        self.messages: queue.Queue = queue.Queue()
+
+    def subscribe(self, *channels: str) -> None:
+        with self.server.lock:
+            for channel in channels:
+                self.channels.add(channel)
+                self.server.subscribers.setdefault(channel, []).append(self)
+
+    def get_message(self, ignore_subscribe_messages: bool = True, timeout: float = 0.0):
+        try:
+            return self.messages.get(timeout=timeout) if timeout else self.messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        with self.server.lock:
+            for channel in self.channels:
+                subscribers = self.server.subscribers.get(channel, [])
+                if self in subscribers:
+                    subscribers.remove(self)
+        self.channels.clear()
+
+
+class FakeRedis:
+    """
+    In-memory, thread-safe stand-in for a redis.Redis client. Several
+    "processes" (caches, buses) can share one instance to exercise
+    cross-process behaviour.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.data: Dict[str, tuple] = {}  # key -> (value bytes, expires_at or None)
+        self.subscribers: Dict[str, List[FakePubSub]] = {}
+        self.lock = threading.RLock()
+        self.calls = 0
+
+    def _tick(self) -> None:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def get(self, key: str) -> Optional[bytes]:
+        self._tick()
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key: str, value, ex: Optional[float] = None, px: Optional[int] = None) -> bool:
+        self._tick()
+        ttl = px / 1000 if px is not None else ex
+        if isinstance(value, str):
+            value = value.encode()
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        self._tick()
+        with self.lock:
+            return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def scan_iter(self, match: str = "*", count: Optional[int] = None):
+        self._tick()
+        with self.lock:
+            keys = [key for key in self.data if fnmatch.fnmatchcase(key, match)]
+        return iter(keys)
+
+    def publish(self, channel: str, message) -> int:
+        self._tick()
+        if isinstance(message, str):
+            message = message.encode()
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, []))
+        for subscriber in subscribers:
+            subscriber.messages.put({"type": "message", "channel": channel.encode(), "data": message})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> FakePubSub:
+        return FakePubSub(self, ignore_subscribe_messages)
+
+    def close(self) -> None:
+        pass
+
+
+# ============================================
+# n8n
+# ============================================
+
+class StubN8N:
+    """
+    Stand-in for the n8n webhook.
+
+    mode="async": acknowledge immediately, then POST the result to the
+    app's complete callback after `processing_ms`.
+    mode="sync": hold the request for `processing_ms` and return results.
+    processing_ms_per_min adds time per minute of video checked (the
+    segment's start_sec..end_sec, else duration_sec).
+    """
+
+    def __init__(self, app_client: Optional[httpx.AsyncClient], api_key: str,
+                 mode: str = "async", latency_ms: float = 20.0, processing_ms: float = 200.0,
+                 error_rate: float = 0.0):
+        self.app_client = app_client
+        self.api_key = api_key
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.processing_ms = processing_ms
+        self.error_rate = error_rate
+        self.processing_ms_per_min = 0.0
+        self.received = 0
+        self.callbacks_sent = 0
+        self._tasks = set()
+
+    @staticmethod
+    def results_for(job_id: str) -> List[dict]:
+        return [
+            {"timestamp": "00:00:03:00", "text": "Issue Type: AUDIO\nCurrent Observation: Clipping\nRecommendation: Lower gain\nSeverity: HIGH"},
+            {"timestamp": "00:00:12", "text": "Current Text: teh\nCorrection: the\nReason: Typo"},
+        ]
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.received += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            return httpx.Response(503, text="n8n unavailable")
+
+        payload = httpx.Response(200, content=request.content).json()
+        if self.mode == "sync":
+            await asyncio.sleep(self.processing_time(payload))
+            return httpx.Response(200, json=self.results_for(payload["job_id"]))
+
+        task = asyncio.create_task(self._callback(payload))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return httpx.Response(200, text="")
+
+    async def _callback(self, payload: dict) -> None:
+        await asyncio.sleep(self.processing_time(payload))
+        if self.app_client is None:
+            return
+        headers = {"X-API-Key": self.api_key}
+        if payload.get("trace_id"):
+            headers["traceparent"] = f"00-{payload['trace_id']}-{uuid.uuid4().hex[:16]}-01"
+        await self.app_client.post(
+            "/v1/callbacks/n8n/complete",
+            json={"job_id": payload["job_id"], "qc_result": self.results_for(payload["job_id"]),
+                  "trace_id": payload.get("trace_id")},
+            headers=headers,
+        )
+        self.callbacks_sent += 1
+
+    def processing_time(self, payload: dict) -> float:
+        """Seconds the workflow takes for a webhook payload."""
+        if "start_sec" in payload:
+            checked_sec = payload["end_sec"] - payload["start_sec"]
+        else:
+            checked_sec = payload.get("duration_sec") or 0
+        return (self.processing_ms + self.processing_ms_per_min * checked_sec / 60) / 1000
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handler)
+
+
+# ============================================
+# Customer webhook receivers
+# ============================================
+
+class WebhookReceiver:
+    """
+    httpx transport standing in for customer webhook endpoints. Checks each
+    request's signature against the subscription secrets it is given and
+    records when every event id arrived.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.secrets: Dict[str, str] = {}  # url -> secret
+        self.received: Dict[str, float] = {}  # event id -> perf_counter at arrival
+        self.events: Dict[str, dict] = {}
+        self.requests = 0
+        self.bad_signatures = 0
+        self.failed = 0
+
+    def transport(self) -> httpx.MockTransport:
+        from app.services.webhooks import SIGNATURE_HEADER, verify
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(self.latency_ms / 1000)
+            self.requests += 1
+            body = request.content
+            if not verify(self.secrets.get(str(request.url), ""), request.headers.get(SIGNATURE_HEADER, ""), body):
+                self.bad_signatures += 1
+                return httpx.Response(401)
+            if random.random() < self.error_rate:
+                self.failed += 1
+                return httpx.Response(503)
+            now = time.perf_counter()
+            for event in json.loads(body)["events"]:
+                self.received.setdefault(event["id"], now)
+                self.events[event["id"]] = event
+            return httpx.Response(204)
+
+        return httpx.MockTransport(handler)
@@ -0,0 +1,253 @@
+"""
+Benchmark harness
+
+Runs the real FastAPI app in-process (httpx ASGITransport) against the
+local stand-ins from benchmarks.fakes, records per-request latencies and
+writes results tagged with the git commit so runs can be compared.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# The app reads its settings at import time; these make it importable
+# without a .env and keep the pipeline on the n8n stand-in.
+BENCH_ENV = {
+    "SUPABASE_URL": "http://supabase.bench.local",
+    "SUPABASE_ANON_KEY": "bench-anon-key",
+    "SUPABASE_SERVICE_KEY": "bench-service-key",
+    "N8N_WEBHOOK_URL": "http://n8n.bench.local/webhook/qc",
+    "N8N_API_KEY": "bench-n8n-key",
+    "N8N_CALLBACK_BASE_URL": "http://api.bench.local",
+    "USE_N8N_PROCESSING": "true",
+    "N8N_HEALTH_CHECK_INTERVAL_SEC": "0",
+    "PROBE_ENABLED": "false",
+    "RESULT_CACHE_ENABLED": "false",
+    # The *.bench.local hosts don't resolve
+    "OUTBOUND_ALLOWED_HOSTS": '["cdn.bench.local", "hooks.bench.local"]',
+    # Every in-process request comes from the same client address
+    "RATE_LIMIT_ENABLED": "false",
+    "LOG_LEVEL": "WARNING",
+    "TRACE_EXPORT_PATH": os.path.join(tempfile.gettempdir(), "qc-lobby-bench", "spans.jsonl"),
+}
+
+
+def configure_env() -> None:
+    """Apply BENCH_ENV (explicit environment variables win)."""
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+class BenchEnv:
+    """
+    The app wired to a FakeSupabase and a StubN8N.
+
+    Usage:
+        async with BenchEnv(db_latency_ms=5) as env:
+            await env.client.get("/v1/jobs", headers=env.auth(token))
+    """
+
+    def __init__(self, db_latency_ms: float = 0.0, n8n_mode: str = "async",
+                 n8n_latency_ms: float = 20.0, n8n_processing_ms: float = 200.0):
+        configure_env()
+        import httpx
+        from benchmarks.fakes import FakeSupabase, StubN8N
+
+        self.db = FakeSupabase(latency_ms=db_latency_ms)
+        self.client: Optional[httpx.AsyncClient] = None
+        self.n8n = StubN8N(None, os.environ["N8N_API_KEY"], mode=n8n_mode,
+                           latency_ms=n8n_latency_ms, processing_ms=n8n_processing_ms)
+        self._patched: List[tuple] = []
+
+    def _patch(self, target: Any, name: str, value: Any) -> None:
+        self._patched.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    async def __aenter__(self) -> "BenchEnv":
+        import httpx
+        from app.main import create_app
+        from app.core.supabase import set_supabase_client
+        from app.services import n8n as n8n_module
+
+        set_supabase_client(self.db)
+        app = create_app()
+
+        # n8n webhook calls go to the stub instead of the network
+        await n8n_module.n8n_service.aclose()
+        transport = self.n8n.transport()
+        stub_httpx = SimpleNamespace(**vars(httpx))
+        stub_httpx.AsyncClient = lambda *args, **kwargs: httpx.AsyncClient(*args, transport=transport, **kwargs)
+        self._patch(n8n_module, "httpx", stub_httpx)
+
+        self.app = app
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://api.bench.local", timeout=60.0
+        )
+        self.n8n.app_client = self.client
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self.n8n._tasks:
+            await asyncio.gather(*self.n8n._tasks, return_exceptions=True)
+        await self.client.aclose()
+        from app.services.n8n import n8n_service
+        await n8n_service.aclose()
+        for target, name, original in reversed(self._patched):
+            setattr(target, name, original)
+        from app.core.supabase import set_supabase_client
+        set_supabase_client(None)
+
+    @staticmethod
+    def auth(token: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {token}"}
+
+    def callback_headers(self) -> Dict[str, str]:
+        return {"X-API-Key": os.environ["N8N_API_KEY"]}
+
+    def seed_jobs(self, team_id: str, count: int, status: str = "completed", **fields) -> List[dict]:
+        """Insert `count` jobs for a team directly into the fake tables."""
+        rows = [{
+            "team_id": team_id,
+            "video_url": f"https://cdn.bench.local/videos/{random.getrandbits(64):016x}.mp4",
+            "status": status,
+            "qc_mode": random.choice(["polisher", "guardian"]),
+            "duration_sec": 60,
+            "credits_used": 60,
+            "trace_id": f"{random.getrandbits(128):032x}",
+            **fields,
+        } for _ in range(count)]
+        return self.db.table("qc_jobs").insert(rows).execute().data
+
+
+# ============================================
+# Load generation and statistics
+# ============================================
+
+class Recorder:
+    """Collects request latencies (seconds) and outcomes."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+
+    async def timed(self, call: Awaitable) -> Any:
+        start = time.perf_counter()
+        try:
+            response = await call
+        except Exception as e:
+            self.latencies.append(time.perf_counter() - start)
+            self.outcomes[type(e).__name__] += 1
+            return None
+        self.latencies.append(time.perf_counter() - start)
+        self.outcomes[str(getattr(response, "status_code", "ok"))] += 1
+        return response
+
+
+async def run_concurrently(worker: Callable[[int], Awaitable], count: int, concurrency: int) -> float:
+    """Run worker(0..count-1) with at most `concurrency` in flight; returns wall time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(i: int):
+        async with semaphore:
+            await worker(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(count)))
+    return time.perf_counter() - start
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], elapsed: float, outcomes: Optional[Counter] = None, **extra) -> Dict[str, Any]:
+    values = sorted(latencies)
+    summary = {
+        "count": len(values),
+        "elapsed_sec": round(elapsed, 4),
+        "throughput_per_sec": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+    if outcomes is not None:
+        summary["outcomes"] = dict(outcomes)
+    summary.update(extra)
+    return summary
+
+
+# ============================================
+# Results
+# ============================================
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args) -> str:
+        try:
+            return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                                  cwd=Path(__file__).parent).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain"))}
+
+
+def write_results(results: Dict[str, Any], params: Dict[str, Any], path: Optional[str] = None) -> Path:
+    revision = git_revision()
+    document = {
+        **revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "params": params,
+        "scenarios": results,
+    }
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = RESULTS_DIR / f"{stamp}-{revision['commit']}{'-dirty' if revision['dirty'] else ''}.json"
+    path = Path(path)
+    path.write_text(json.dumps(document, indent=2))
+    return path
+
+
+COMPARED_FIELDS = ("throughput_per_sec", "p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(baseline_path: str, results: Dict[str, Any]) -> str:
+    """Table of relative changes against a previous results file."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    lines = [f"vs {baseline.get('commit')} ({baseline.get('timestamp')})"]
+    for scenario, current in results.items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            lines.append(f"  {scenario:20} (not in baseline)")
+            continue
+        cells = []
+        for field in COMPARED_FIELDS:
+            old, new = before.get(field), current.get(field)
+            if old:
+                cells.append(f"{field} {old:g} -> {new:g} ({(new - old) / old * 100:+.1f}%)")
+        lines.append(f"  {scenario:20} " + ", ".join(cells))
+    return "\n".join(lines)
+
+
+def format_summary(name: str, summary: Dict[str, Any]) -> str:
+    return (
+        f"{name:20} n={summary['count']:<6} {summary['throughput_per_sec']:>9.1f}/s  "
+        f"p50={summary['p50_ms']:>8.2f}ms  p95={summary['p95_ms']:>8.2f}ms  "
+        f"p99={summary['p99_ms']:>8.2f}ms  {summary.get('outcomes', '')}"
+    )
@@ -0,0 +1,399 @@
+"""
+Load and benchmark scenarios
+
+Drives the real FastAPI app against in-memory Supabase and n8n stand-ins
+(see benchmarks.fakes) and reports throughput and p50/p95/p99 per scenario.
+Results are written to benchmarks/results/<time>-<commit>.json; pass
+--compare with an earlier file to see the change between commits.
+
+Usage (from backend/):
+    python -m benchmarks.run [--scenarios job_creation_burst,dashboard_polling]
+                             [--db-latency-ms 5] [--compare benchmarks/results/<file>.json]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from benchmarks.harness import (
+    BenchEnv, Recorder, compare, format_summary, percentile, run_concurrently, summarize, write_results
+)
+
+
+async def job_creation_burst(env: BenchEnv, args) -> dict:
+    """Many teams submitting jobs at once (2 per team, the active-job limit)."""
+    teams = [env.db.seed_team() for _ in range(max(1, args.requests // 2))]
+    recorder = Recorder()
+
+    async def submit(i: int):
+        team = teams[i % len(teams)]
+        await recorder.timed(env.client.post(
+            "/v1/jobs",
+            json={"video_url": f"https://cdn.bench.local/{uuid.uuid4().hex}.mp4",
+                  "duration_sec": 60, "qc_mode": random.choice(["polisher", "guardian"])},
+            headers=env.auth(team["tokens"][0]),
+        ))
+
+    elapsed = await run_concurrently(submit, args.requests, args.concurrency)
+    return summarize(recorder.latencies, elapsed, recorder.outcomes, teams=len(teams))
+
+
+async def signup_burst(env: BenchEnv, args) -> dict:
+    """
+    New users onboarding at once (a launch), each then loading the dashboard
+    profile --profile-loads times.
+    """
+    from types import SimpleNamespace
+
+    tokens = []
+    for _ in range(args.requests):
+        user_id = str(uuid.uuid4())
+        token = f"token-{user_id}"
+        env.db.auth_users[token] = SimpleNamespace(id=user_id, email=f"{user_id[:8]}@signup.bench.local")
+        tokens.append(token)
+    recorder = Recorder()
+
+    async def sign_up(i: int):
+        headers = env.auth(tokens[i])
+        await recorder.timed(env.client.post(
+            "/v1/onboard", json={"plan_type": random.choice(["freelancer", "agency"])}, headers=headers
+        ))
+        for _ in range(args.profile_loads):
+            await recorder.timed(env.client.get("/v1/profile", headers=headers))
+
+    elapsed = await run_concurrently(sign_up, args.requests, args.concurrency)
+    return summarize(recorder.latencies, elapsed, recorder.outcomes,
+                     users=args.requests, db_calls_per_user=round(env.db.calls / args.requests, 2))
+
+
+async def dashboard_polling(env: BenchEnv, args) -> dict:
+    """N users polling their job list and a job's detail page."""
+    teams = []
+    for _ in range(max(1, args.users // 5)):
+        team = env.db.seed_team(users=5)
+        team["jobs"] = env.seed_jobs(team["team"]["id"], args.jobs_per_team)
+        teams.append(team)
+    users = [(team, token) for team in teams for token in team["tokens"]][:args.users]
+    recorder = Recorder()
+
+    async def poll(i: int):
+        team, token = users[i % len(users)]
+        if i % 2:
+            job = random.choice(team["jobs"])
+            await recorder.timed(env.client.get(f"/v1/jobs/{job['id']}", headers=env.auth(token)))
+        else:
+            await recorder.timed(env.client.get("/v1/jobs", headers=env.auth(token)))
+
+    elapsed = await run_concurrently(poll, args.requests, args.concurrency)
+    return summarize(recorder.latencies, elapsed, recorder.outcomes,
+                     users=len(users), jobs_per_team=args.jobs_per_team)
+
+
+async def queued_job_polling(env: BenchEnv, args) -> dict:
+    """
+    Users polling the job list and detail of their pending jobs behind a
+    deep queue (every response carries queue ETAs).
+    """
+    from app.services.eta import queue_eta
+    from benchmarks.fakes import utcnow_iso
+
+    teams = [env.db.seed_team() for _ in range(max(1, args.queue_depth // 2))]
+    for team in teams:
+        team["jobs"] = env.seed_jobs(team["team"]["id"], 2, status="pending")
+    env.seed_jobs(teams[0]["team"]["id"], 2, status="processing", started_at=utcnow_iso())
+    # The estimator is a process singleton: load this scenario's queue (the
+    # API's background resync doesn't run without the lifespan)
+    await asyncio.to_thread(queue_eta.resync)
+    recorder = Recorder()
+
+    async def poll(i: int):
+        team = teams[random.randrange(len(teams))]
+        if i % 2:
+            job = random.choice(team["jobs"])
+            await recorder.timed(env.client.get(f"/v1/jobs/{job['id']}", headers=env.auth(team["tokens"][0])))
+        else:
+            await recorder.timed(env.client.get("/v1/jobs", headers=env.auth(team["tokens"][0])))
+
+    elapsed = await run_concurrently(poll, args.requests, args.concurrency)
+    return summarize(recorder.latencies, elapsed, recorder.outcomes, queue_depth=len(teams) * 2)
+
+
+async def callback_storm(env: BenchEnv, args) -> dict:
+    """n8n completing many processing jobs at the same time."""
+    team = env.db.seed_team()
+    jobs = env.seed_jobs(team["team"]["id"], args.requests, status="processing")
+    recorder = Recorder()
+
+    async def complete(i: int):
+        job = jobs[i]
+        await recorder.timed(env.client.post(
+            "/v1/callbacks/n8n/complete",
+            json={"job_id": job["id"], "qc_result": env.n8n.results_for(job["id"]), "trace_id": job["trace_id"]},
+            headers=env.callback_headers(),
+        ))
+
+    elapsed = await run_concurrently(complete, args.requests, args.concurrency)
+    return summarize(recorder.latencies, elapsed, recorder.outcomes)
+
+
+async def progress_storm(env: BenchEnv, args) -> dict:
+    """
+    n8n reporting progress on processing jobs in small steps
+    (--progress-per-job reports each, coalesced before they are written).
+    """
+    from app.services.progress import job_progress
+
+    team = env.db.seed_team()
+    jobs = env.seed_jobs(team["team"]["id"], max(args.requests // args.progress_per_job, 1), status="processing")
+    recorder = Recorder()
+
+    async def report_all(i: int):
+        job = jobs[i]
+        for step in range(1, args.progress_per_job + 1):
+            await recorder.timed(env.client.post(
+                "/v1/callbacks/n8n/progress",
+                json={"job_id": job["id"], "progress": 100 * step // (args.progress_per_job + 1)},
+                headers=env.callback_headers(),
+            ))
+
+    elapsed = await run_concurrently(report_all, len(jobs), args.concurrency)
+    job_progress.flush()
+    result = summarize(recorder.latencies, elapsed, recorder.outcomes)
+    result["db_calls_per_report"] = round(env.db.calls / max(len(recorder.latencies), 1), 2)
+    return result
+
+
+async def worker_throughput(env: BenchEnv, args) -> dict:
+    """
+    Pending jobs drained by the background worker through the n8n stub
+    (async callbacks). Latency is creation to completed.
+    """
+    from app.workers.auto_job_processor import auto_process_jobs
+
+    teams = [env.db.seed_team() for _ in range(max(1, args.worker_jobs // 2))]
+    jobs = []
+    for i in range(args.worker_jobs):
+        jobs.extend(env.seed_jobs(teams[i % len(teams)]["team"]["id"], 1, status="pending"))
+    created = {job["id"]: time.perf_counter() for job in jobs}
+    done = {}
+
+    start = time.perf_counter()
+    worker = asyncio.create_task(auto_process_jobs())
+    deadline = start + args.worker_timeout
+    try:
+        while len(done) < len(jobs) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.02)
+            rows = env.db.table("qc_jobs").select("id, status").in_("status", ["completed", "failed"]).execute().data
+            now = time.perf_counter()
+            for row in rows:
+                if row["id"] in created and row["id"] not in done:
+                    done[row["id"]] = (now, row["status"])
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    outcomes = {}
+    for _, status in done.values():
+        outcomes[status] = outcomes.get(status, 0) + 1
+    outcomes["unfinished"] = len(jobs) - len(done)
+    return summarize([t - created[job_id] for job_id, (t, _) in done.items()], elapsed, outcomes,
+                     n8n_processing_ms=args.n8n_processing_ms)
+
+
+async def long_video_turnaround(env: BenchEnv, args) -> dict:
+    """
+    Hour-long videos through the worker and the n8n stub (processing time
+    proportional to the minutes checked), first as single executions, then
+    segmented. Latency is creation to completed of the segmented run.
+    """
+    from app.core.config import get_settings
+    from app.workers.auto_job_processor import auto_process_jobs
+
+    env.n8n.processing_ms_per_min = args.n8n_ms_per_video_min
+    config = get_settings()
+    segment_enabled = config.SEGMENT_ENABLED
+
+    async def drain(segmented: bool) -> tuple:
+        config.SEGMENT_ENABLED = segmented
+        team = env.db.seed_team()
+        jobs = env.seed_jobs(team["team"]["id"], args.long_jobs, status="pending",
+                             duration_sec=args.long_video_sec)
+        created = {job["id"]: time.perf_counter() for job in jobs}
+        done = {}
+        worker = asyncio.create_task(auto_process_jobs())
+        deadline = time.perf_counter() + args.worker_timeout
+        try:
+            while len(done) < len(jobs) and time.perf_counter() < deadline:
+                await asyncio.sleep(0.02)
+                for job_id in created.keys() - done.keys():
+                    row = env.db.table("qc_jobs").select("status").eq("id", job_id).execute().data[0]
+                    if row["status"] in ("completed", "failed"):
+                        done[job_id] = (time.perf_counter() - created[job_id], row["status"])
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+        return done, len(jobs)
+
+    try:
+        single, _ = await drain(False)
+        start = time.perf_counter()
+        segmented, total = await drain(True)
+        elapsed = time.perf_counter() - start
+    finally:
+        config.SEGMENT_ENABLED = segment_enabled
+
+    outcomes = {}
+    for _, status in segmented.values():
+        outcomes[status] = outcomes.get(status, 0) + 1
+    outcomes["unfinished"] = total - len(segmented)
+    single_latencies = sorted(latency for latency, _ in single.values())
+    return summarize([latency for latency, _ in segmented.values()], elapsed, outcomes,
+                     unsegmented_p50_ms=round(single_latencies[len(single_latencies) // 2] * 1000, 2)
+                     if single_latencies else None,
+                     video_sec=args.long_video_sec)
+
+
+async def webhook_delivery(env: BenchEnv, args) -> dict:
+    """
+    n8n completing jobs of teams with webhook subscriptions (half batched)
+    while the webhook sender runs. Latency is the completion callback
+    returning to the signed event reaching the customer endpoint.
+    """
+    from types import SimpleNamespace
+    import httpx
+    from app.services import webhooks as webhooks_module
+    from app.workers.webhook_sender import deliver_webhooks
+    from benchmarks.fakes import WebhookReceiver
+
+    receiver = WebhookReceiver(latency_ms=args.webhook_latency_ms, error_rate=args.webhook_error_rate)
+    await webhooks_module.webhook_dispatcher.aclose()
+    original_httpx = webhooks_module.httpx
+    stub_httpx = SimpleNamespace(**vars(httpx))
+    transport = receiver.transport()
+    stub_httpx.AsyncClient = lambda *a, **kw: httpx.AsyncClient(*a, transport=transport, **kw)
+    webhooks_module.httpx = stub_httpx
+
+    teams, jobs = [], []
+    for i in range(args.webhook_teams):
+        team = env.db.seed_team()
+        response = await env.client.post(
+            "/v1/webhooks",
+            json={"url": f"https://hooks.bench.local/{i}", "batch_size": 10 if i % 2 else 1},
+            headers=env.auth(team["tokens"][0]),
+        )
+        subscription = response.json()
+        receiver.secrets[subscription["url"]] = subscription["secret"]
+        teams.append(team)
+    for i in range(args.requests):
+        jobs.extend(env.seed_jobs(teams[i % len(teams)]["team"]["id"], 1, status="processing"))
+
+    completed_at = {}
+    recorder = Recorder()
+
+    async def complete(i: int):
+        job = jobs[i]
+        await recorder.timed(env.client.post(
+            "/v1/callbacks/n8n/complete",
+            json={"job_id": job["id"], "qc_result": env.n8n.results_for(job["id"])},
+            headers=env.callback_headers(),
+        ))
+        completed_at[webhooks_module.event_payload("job.completed", job)["id"]] = time.perf_counter()
+
+    stop = asyncio.Event()
+    sender = asyncio.create_task(deliver_webhooks(stop))
+    start = time.perf_counter()
+    try:
+        await run_concurrently(complete, len(jobs), args.concurrency)
+        deadline = time.perf_counter() + args.worker_timeout
+        while len(receiver.received) < len(completed_at) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.02)
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        await asyncio.gather(sender, return_exceptions=True)
+        await webhooks_module.webhook_dispatcher.aclose()
+        webhooks_module.httpx = original_httpx
+
+    latencies = [receiver.received[event_id] - t for event_id, t in completed_at.items() if event_id in receiver.received]
+    outcomes = {
+        "delivered": len(latencies),
+        "missing": len(completed_at) - len(latencies),
+        "bad_signature": receiver.bad_signatures,
+    }
+    return summarize(latencies, elapsed, outcomes, webhook_requests=receiver.requests,
+                     callback_p50_ms=round(percentile(sorted(recorder.latencies), 50) * 1000, 3))
+
+
+SCENARIOS = {
+    "job_creation_burst": job_creation_burst,
+    "signup_burst": signup_burst,
+    "dashboard_polling": dashboard_polling,
+    "queued_job_polling": queued_job_polling,
+    "callback_storm": callback_storm,
+    "progress_storm": progress_storm,
+    "worker_throughput": worker_throughput,
+    "long_video_turnaround": long_video_turnaround,
+    "webhook_delivery": webhook_delivery,
+}
+
+
+async def run(args) -> dict:
+    results = {}
+    for name in args.scenarios:
+        # Fresh tables per scenario so runs don't influence each other
+        async with BenchEnv(db_latency_ms=args.db_latency_ms, n8n_mode=args.n8n_mode,
+                            n8n_latency_ms=args.n8n_latency_ms,
+                            n8n_processing_ms=args.n8n_processing_ms) as env:
+            results[name] = await SCENARIOS[name](env, args)
+            results[name]["db_calls"] = env.db.calls
+        print(format_summary(name, results[name]), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda s: [x for x in s.split(",") if x])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--profile-loads", type=int, default=5, help="profile reads per user (signup_burst)")
+    parser.add_argument("--jobs-per-team", type=int, default=50)
+    parser.add_argument("--worker-jobs", type=int, default=10)
+    parser.add_argument("--worker-timeout", type=float, default=120.0)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--n8n-mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--n8n-latency-ms", type=float, default=20.0)
+    parser.add_argument("--n8n-processing-ms", type=float, default=200.0)
+    parser.add_argument("--n8n-ms-per-video-min", type=float, default=50.0,
+                        help="stub n8n processing time per minute of video (long_video_turnaround)")
+    parser.add_argument("--queue-depth", type=int, default=2000, help="pending jobs (queued_job_polling)")
+    parser.add_argument("--webhook-teams", type=int, default=20)
+    parser.add_argument("--webhook-latency-ms", type=float, default=50.0)
+    parser.add_argument("--webhook-error-rate", type=float, default=0.0,
+                        help="share of webhook requests the receivers reject with 503")
+    parser.add_argument("--progress-per-job", type=int, default=20, help="reports per job (progress_storm)")
+    parser.add_argument("--long-jobs", type=int, default=2)
+    parser.add_argument("--long-video-sec", type=int, default=3600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    random.seed(args.seed)
+    results = asyncio.run(run(args))
+    path = write_results(results, {k: v for k, v in vars(args).items() if k not in ("output", "compare")}, args.output)
+    print(f"results: {path}")
+    if args.compare:
+        print(compare(args.compare, results))
+
+
+if __name__ == "__main__":
+    main()
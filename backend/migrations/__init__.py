@@ -0,0 +1,111 @@
+"""
+Schema migrations
+
+Versioned SQL files in migrations/versions (NNNN_name.sql), applied in
+order by `python -m migrations`. Applied versions and their checksums are
+recorded in public.schema_migrations; each migration runs in its own
+transaction.
+
+Needs psycopg 3 (pip install "psycopg[binary]") and DATABASE_URL (or
+--database-url) pointing at the Postgres database, e.g. the Supabase
+direct connection string.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+VERSIONS_DIR = Path(__file__).resolve().parent / "versions"
+
+_FILENAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Serializes concurrent runners (e.g. several instances deploying at once)
+_LOCK_ID = 7_204_311
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: Path
+
+    @property
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+    @property
+    def checksum(self) -> str:
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+
+def discover() -> List[Migration]:
+    """All migrations in version order."""
+    migrations = []
+    for path in VERSIONS_DIR.glob("*.sql"):
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise ValueError(f"Unexpected migration file name: {path.name}")
+        migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions")
+    return migrations
+
+
+def connect(database_url: str):
+    try:
+        import psycopg
+    except ImportError as e:
+        raise RuntimeError('Migrations need psycopg 3: pip install "psycopg[binary]"') from e
+    return psycopg.connect(database_url, autocommit=True)
+
+
+def applied(conn) -> Dict[int, str]:
+    """Applied versions and the checksums they were applied with."""
+    conn.execute("""
+        create table if not exists public.schema_migrations (
+            version integer primary key,
+            name text not null,
+            checksum text not null,
+            applied_at timestamptz not null default now()
+        )
+    """)
+    return dict(conn.execute("select version, checksum from public.schema_migrations").fetchall())
+
+
+def upgrade(conn, target: Optional[int] = None, log: Callable[[str], None] = print) -> List[Migration]:
+    """
+    Apply pending migrations up to `target` (default: all).
+
+    Raises:
+        RuntimeError: an applied migration file was edited afterwards
+    """
+    conn.execute("select pg_advisory_lock(%s)", (_LOCK_ID,))
+    try:
+        done = applied(conn)
+        pending = []
+        for migration in discover():
+            if migration.version in done:
+                if done[migration.version] != migration.checksum:
+                    raise RuntimeError(
+                        f"Migration {migration.path.name} changed after it was applied; "
+                        "add a new migration instead"
+                    )
+                continue
+            if target is None or migration.version <= target:
+                pending.append(migration)
+
+        for migration in pending:
+            log(f"Applying {migration.path.name}")
+            with conn.transaction():
+                conn.execute(migration.sql)
+                conn.execute(
+                    "insert into public.schema_migrations (version, name, checksum) values (%s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum),
+                )
+        return pending
+    finally:
+        conn.execute("select pg_advisory_unlock(%s)", (_LOCK_ID,))
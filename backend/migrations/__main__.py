@@ -0,0 +1,41 @@
+"""
+Usage (from backend/):
+    python -m migrations status  [--database-url postgresql://...]
+    python -m migrations upgrade [--target 3] [--database-url postgresql://...]
+"""
+
+import argparse
+import os
+import sys
+
+from migrations import applied, connect, discover, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migrations")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--target", type=int, default=None, help="Highest version to apply")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("set DATABASE_URL or pass --database-url")
+
+    with connect(args.database_url) as conn:
+        if args.command == "upgrade":
+            done = upgrade(conn, args.target)
+            print(f"Applied {len(done)} migration(s)")
+            return
+
+        done = applied(conn)
+        changed = False
+        for migration in discover():
+            state = "applied" if migration.version in done else "pending"
+            if migration.version in done and done[migration.version] != migration.checksum:
+                state, changed = "CHANGED", True
+            print(f"{migration.version:04d}  {state:8} {migration.name}")
+        if changed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Hot query plan check
+
+Applies the migrations to a scratch Postgres database, then EXPLAINs each
+hot query with sequential scans disabled. The planner still picks a
+sequential scan when no index can serve a query, so any Seq Scan on our
+tables means an index is missing. Exits non-zero on failure (use in CI).
+tests/test_indexes.py runs the same check under pytest.
+
+Usage (from backend/):
+    python -m migrations.check_indexes --database-url postgresql://localhost/qc_lobby_check
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+from migrations import connect, upgrade
+
+TEAM_ID = "00000000-0000-0000-0000-000000000001"
+JOB_ID = "00000000-0000-0000-0000-000000000002"
+USER_ID = "00000000-0000-0000-0000-000000000003"
+
+# name -> (query, tables that must not be sequentially scanned)
+HOT_QUERIES = {
+    "worker_next_pending": (
+        "select * from qc_jobs where status = 'pending' order by created_at asc limit 1",
+        {"qc_jobs"},
+    ),
+    "worker_processing_count": (
+        "select count(id) from qc_jobs where status = 'processing' and parent_job_id is null",
+        {"qc_jobs"},
+    ),
+    "list_jobs": (
+        f"select * from qc_jobs where team_id = '{TEAM_ID}' and parent_job_id is null order by created_at desc",
+        {"qc_jobs"},
+    ),
+    "create_job_active_count": (
+        f"select count(id) from qc_jobs where team_id = '{TEAM_ID}' and status = 'pending' and parent_job_id is null",
+        {"qc_jobs"},
+    ),
+    "get_job": (
+        f"select * from qc_jobs where id = '{JOB_ID}' and team_id = '{TEAM_ID}' limit 1",
+        {"qc_jobs"},
+    ),
+    "archivable_jobs": (
+        "select * from qc_jobs where status in ('completed', 'failed') "
+        "and created_at < now() - interval '30 days' order by created_at asc limit 500",
+        {"qc_jobs"},
+    ),
+    "user_team": (
+        f"select team_id from users where id = '{USER_ID}'",
+        {"users"},
+    ),
+    "job_segments": (
+        f"select * from qc_jobs where parent_job_id = '{JOB_ID}' order by segment_index",
+        {"qc_jobs"},
+    ),
+    "eta_rate_history": (
+        "select duration_sec, started_at, finished_at from qc_jobs where qc_mode = 'polisher' "
+        "and status = 'completed' and parent_job_id is null and started_at is not null "
+        "order by finished_at desc limit 200",
+        {"qc_jobs"},
+    ),
+    "webhook_due_deliveries": (
+        "select id from webhook_outbox where status = 'pending' and next_attempt_at <= now() "
+        "order by next_attempt_at limit 200",
+        {"webhook_outbox"},
+    ),
+    "webhook_team_subscriptions": (
+        f"select id, events from webhook_subscriptions where team_id = '{TEAM_ID}' and active",
+        {"webhook_subscriptions"},
+    ),
+    "credit_reserve_lookup": (
+        f"select * from credit_ledger where job_id = '{JOB_ID}' and kind = 'reserve'",
+        {"credit_ledger"},
+    ),
+}
+
+
+def seq_scans(plan: dict) -> List[str]:
+    """Relations sequentially scanned anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def plan_seq_scans(conn) -> Dict[str, List[str]]:
+    """Each hot query's sequentially scanned tables (with sequential scans disabled)."""
+    scans = {}
+    with conn.transaction():
+        conn.execute("set local enable_seqscan = off")
+        for name, (query, tables) in HOT_QUERIES.items():
+            plan = conn.execute(f"explain (format json) {query}").fetchone()[0][0]["Plan"]
+            scans[name] = sorted(set(seq_scans(plan)) & tables)
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("set DATABASE_URL or pass --database-url")
+
+    with connect(args.database_url) as conn:
+        upgrade(conn)
+        scans = plan_seq_scans(conn)
+
+    failures = [name for name, scanned in scans.items() if scanned]
+    for name, scanned in scans.items():
+        print(f"{'SEQ SCAN' if scanned else 'ok':8}  {name}" + (f" ({', '.join(scanned)})" if scanned else ""))
+
+    if failures:
+        print(f"FAILED: sequential scans in {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+-- Base schema: teams, users, qc_jobs
+--
+-- Written to also adopt an existing Supabase project: tables are only
+-- created when missing, and columns added to qc_jobs after the first
+-- release are added when missing.
+
+create extension if not exists pgcrypto;  -- gen_random_uuid() on Postgres < 13
+
+create table if not exists public.teams (
+    id uuid primary key default gen_random_uuid(),
+    name text not null,
+    credits integer not null default 0,
+    created_at timestamptz not null default now()
+);
+
+-- users.id is the Supabase auth user id
+create table if not exists public.users (
+    id uuid primary key,
+    email text,
+    team_id uuid references public.teams(id) on delete set null,
+    plan_type text check (plan_type in ('freelancer', 'agency')),
+    created_at timestamptz not null default now()
+);
+
+create table if not exists public.qc_jobs (
+    id uuid primary key default gen_random_uuid(),
+    team_id uuid not null references public.teams(id) on delete cascade,
+    video_url text not null,
+    status text not null default 'pending'
+        check (status in ('pending', 'processing', 'completed', 'failed')),
+    qc_mode text not null check (qc_mode in ('polisher', 'guardian')),
+    duration_sec integer not null check (duration_sec > 0),
+    qc_result jsonb,
+    created_at timestamptz not null default now()
+);
+
+-- Columns added since the first release
+alter table public.qc_jobs
+    add column if not exists credits_used integer,
+    add column if not exists thumbnail_url text,          -- Base64 thumbnail
+    add column if not exists artifacts jsonb,              -- PDF/XML/EDL URLs from n8n
+    add column if not exists video_metadata jsonb,         -- Probe results
+    add column if not exists content_fingerprint text,     -- Result cache key
+    add column if not exists dispatch_attempts integer not null default 0,
+    add column if not exists trace_id text;
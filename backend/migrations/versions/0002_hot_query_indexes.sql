@@ -0,0 +1,32 @@
+-- Indexes for the hot queries (checked by python -m migrations.check_indexes)
+--
+--   worker:      status = 'pending' order by created_at limit 1
+--                count(*) where status = 'processing'
+--   list_jobs:   team_id = ? order by created_at desc
+--   create_job:  count(*) where team_id = ? and status = ?
+--   archiver:    status in ('completed', 'failed') and created_at < ? order by created_at
+--   every route: users where id = ? (primary key)
+--
+-- The worker's indexes are partial: pending/processing are a handful of rows
+-- in a table of mostly finished jobs, so they stay tiny.
+
+create index if not exists qc_jobs_pending_created_at
+    on public.qc_jobs (created_at)
+    where status = 'pending';
+
+create index if not exists qc_jobs_processing
+    on public.qc_jobs (id)
+    where status = 'processing';
+
+create index if not exists qc_jobs_team_created_at
+    on public.qc_jobs (team_id, created_at desc);
+
+create index if not exists qc_jobs_team_status
+    on public.qc_jobs (team_id, status);
+
+create index if not exists qc_jobs_final_created_at
+    on public.qc_jobs (created_at)
+    where status in ('completed', 'failed');
+
+create index if not exists users_team_id
+    on public.users (team_id);
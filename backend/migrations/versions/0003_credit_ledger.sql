@@ -0,0 +1,205 @@
+-- Credit ledger
+--
+-- Every credit movement is an append-only row in credit_ledger; teams.credits
+-- (available) and teams.credits_reserved are the materialized balances,
+-- updated in the same transaction as the ledger row so balance reads stay a
+-- single-row lookup.
+--
+--   grant    credits += amount                      (trial credits, top-ups)
+--   reserve  credits -= amount, reserved += amount  (job created)
+--   capture  reserved -= amount                     (job completed)
+--   release  reserved -= amount, credits += amount  (job failed: refund)
+--
+-- All balance changes of a team lock its teams row, so concurrent requests
+-- are serialized instead of losing updates. reserve/capture/release are
+-- idempotent per job, so API retries never double-charge or double-refund.
+
+create table if not exists public.credit_ledger (
+    id bigserial primary key,
+    team_id uuid not null references public.teams(id) on delete cascade,
+    job_id uuid,  -- No FK: the reserve is written before the job row exists
+    kind text not null check (kind in ('grant', 'reserve', 'capture', 'release')),
+    amount integer not null check (amount > 0),
+    reason text,
+    created_at timestamptz not null default now()
+);
+
+-- At most one reserve and one settlement (capture or release) per job
+create unique index if not exists credit_ledger_job_reserve
+    on public.credit_ledger (job_id) where kind = 'reserve';
+create unique index if not exists credit_ledger_job_settlement
+    on public.credit_ledger (job_id) where kind in ('capture', 'release');
+create index if not exists credit_ledger_team_created
+    on public.credit_ledger (team_id, created_at desc);
+
+alter table public.teams
+    add column if not exists credits_reserved integer not null default 0;
+
+-- Opening balances, so the ledger sums to teams.credits from day one
+insert into public.credit_ledger (team_id, kind, amount, reason)
+select t.id, 'grant', t.credits, 'opening balance'
+from public.teams t
+where t.credits > 0
+  and not exists (select 1 from public.credit_ledger l where l.team_id = t.id);
+
+
+create or replace function public.credit_grant(p_team_id uuid, p_amount integer, p_reason text)
+returns integer
+language plpgsql
+security definer
+as $$
+declare
+    v_credits integer;
+begin
+    update public.teams
+       set credits = coalesce(credits, 0) + p_amount
+     where id = p_team_id
+    returning credits into v_credits;
+    if not found then
+        raise exception 'team % not found', p_team_id using errcode = 'P0002';
+    end if;
+
+    insert into public.credit_ledger (team_id, kind, amount, reason)
+    values (p_team_id, 'grant', p_amount, p_reason);
+    return v_credits;
+end;
+$$;
+
+
+-- Returns (ok, balance): ok is false when the team can't afford p_amount
+create or replace function public.credit_reserve(p_team_id uuid, p_job_id uuid, p_amount integer)
+returns table (ok boolean, balance integer)
+language plpgsql
+security definer
+as $$
+declare
+    v_credits integer;
+begin
+    select coalesce(credits, 0) into v_credits
+      from public.teams
+     where id = p_team_id
+       for update;
+    if not found then
+        raise exception 'team % not found', p_team_id using errcode = 'P0002';
+    end if;
+
+    -- Retried request: already reserved
+    if exists (select 1 from public.credit_ledger where job_id = p_job_id and kind = 'reserve') then
+        return query select true, v_credits;
+        return;
+    end if;
+
+    if v_credits < p_amount then
+        return query select false, v_credits;
+        return;
+    end if;
+
+    update public.teams
+       set credits = v_credits - p_amount,
+           credits_reserved = credits_reserved + p_amount
+     where id = p_team_id
+    returning credits into v_credits;
+
+    insert into public.credit_ledger (team_id, job_id, kind, amount)
+    values (p_team_id, p_job_id, 'reserve', p_amount);
+    return query select true, v_credits;
+end;
+$$;
+
+
+-- Settle a job's reserve: 'capture' (charge) or 'release' (refund).
+-- Returns false when there is nothing to settle (no reserve, or already settled).
+create or replace function public.credit_settle(p_job_id uuid, p_kind text, p_reason text default null)
+returns boolean
+language plpgsql
+security definer
+as $$
+declare
+    v_reserve public.credit_ledger%rowtype;
+begin
+    if p_kind not in ('capture', 'release') then
+        raise exception 'invalid settlement kind %', p_kind using errcode = '22023';
+    end if;
+
+    select * into v_reserve
+      from public.credit_ledger
+     where job_id = p_job_id and kind = 'reserve';
+    if not found then
+        return false;  -- Job created before the ledger, or never reserved
+    end if;
+
+    perform 1 from public.teams where id = v_reserve.team_id for update;
+    if exists (
+        select 1 from public.credit_ledger
+         where job_id = p_job_id and kind in ('capture', 'release')
+    ) then
+        return false;
+    end if;
+
+    update public.teams
+       set credits_reserved = credits_reserved - v_reserve.amount,
+           credits = coalesce(credits, 0) + case when p_kind = 'release' then v_reserve.amount else 0 end
+     where id = v_reserve.team_id;
+
+    insert into public.credit_ledger (team_id, job_id, kind, amount, reason)
+    values (v_reserve.team_id, p_job_id, p_kind, v_reserve.amount, p_reason);
+    return true;
+end;
+$$;
+
+
+create or replace function public.credit_capture(p_job_id uuid)
+returns boolean
+language sql
+security definer
+as $$ select public.credit_settle(p_job_id, 'capture') $$;
+
+
+create or replace function public.credit_release(p_job_id uuid, p_reason text default null)
+returns boolean
+language sql
+security definer
+as $$ select public.credit_settle(p_job_id, 'release', p_reason) $$;
+
+
+-- Teams whose materialized balances disagree with the ledger (should be empty)
+create or replace view public.credit_balance_drift as
+select *
+from (
+    select t.id as team_id,
+           coalesce(t.credits, 0) as credits,
+           t.credits_reserved,
+           coalesce(sum(case l.kind when 'grant' then l.amount
+                                    when 'reserve' then -l.amount
+                                    when 'release' then l.amount
+                                    else 0 end), 0) as ledger_credits,
+           coalesce(sum(case l.kind when 'reserve' then l.amount
+                                    when 'capture' then -l.amount
+                                    when 'release' then -l.amount
+                                    else 0 end), 0) as ledger_reserved
+    from public.teams t
+    left join public.credit_ledger l on l.team_id = t.id
+    group by t.id
+) balances
+where credits <> ledger_credits or credits_reserved <> ledger_reserved;
+
+-- Only the service role (the API) may touch the ledger. The anon and
+-- authenticated roles exist on Supabase only.
+revoke execute on function public.credit_grant(uuid, integer, text) from public;
+revoke execute on function public.credit_reserve(uuid, uuid, integer) from public;
+revoke execute on function public.credit_settle(uuid, text, text) from public;
+revoke execute on function public.credit_capture(uuid) from public;
+revoke execute on function public.credit_release(uuid, text) from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke all on public.credit_ledger from anon, authenticated;
+        revoke execute on function public.credit_grant(uuid, integer, text) from anon, authenticated;
+        revoke execute on function public.credit_reserve(uuid, uuid, integer) from anon, authenticated;
+        revoke execute on function public.credit_settle(uuid, text, text) from anon, authenticated;
+        revoke execute on function public.credit_capture(uuid) from anon, authenticated;
+        revoke execute on function public.credit_release(uuid, text) from anon, authenticated;
+    end if;
+end
+$$;
@@ -0,0 +1,22 @@
+-- Segmented jobs (app.services.segmenter)
+--
+-- Long videos are split into time-range sub-jobs: qc_jobs rows with a
+-- parent_job_id. Segments are dispatched directly (never pending) and don't
+-- count towards the worker's concurrency limit or the team's active jobs;
+-- their parent holds the slot.
+
+alter table public.qc_jobs
+    add column if not exists parent_job_id uuid references public.qc_jobs(id) on delete cascade,
+    add column if not exists segment_index integer,
+    add column if not exists segment_start_sec integer,
+    add column if not exists segment_end_sec integer;
+
+create index if not exists qc_jobs_parent_job_id
+    on public.qc_jobs (parent_job_id, segment_index)
+    where parent_job_id is not null;
+
+-- The worker now counts top-level processing jobs only
+drop index if exists public.qc_jobs_processing;
+create index if not exists qc_jobs_processing_top_level
+    on public.qc_jobs (id)
+    where status = 'processing' and parent_job_id is null;
@@ -0,0 +1,32 @@
+-- Processing timestamps for queue ETAs (app.services.eta)
+--
+-- started_at is written by the worker's claim. finished_at is set here, on
+-- every transition to a final state, so the callbacks, backends and manual
+-- status updates don't each have to remember it.
+
+alter table public.qc_jobs
+    add column if not exists started_at timestamptz,
+    add column if not exists finished_at timestamptz;
+
+create or replace function public.qc_jobs_set_finished_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.status in ('completed', 'failed') and old.status not in ('completed', 'failed') then
+        new.finished_at := now();
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists qc_jobs_set_finished_at on public.qc_jobs;
+create trigger qc_jobs_set_finished_at
+    before update of status on public.qc_jobs
+    for each row execute function public.qc_jobs_set_finished_at();
+
+-- The estimator warms its processing rates from the latest completed
+-- top-level jobs per qc_mode
+create index if not exists qc_jobs_rate_history
+    on public.qc_jobs (qc_mode, finished_at desc)
+    where status = 'completed' and parent_job_id is null and started_at is not null;
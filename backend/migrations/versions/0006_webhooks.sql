@@ -0,0 +1,81 @@
+-- Customer webhooks (app.services.webhooks)
+--
+-- Teams subscribe a URL to job events. Events are written to an outbox in
+-- the request that finishes the job; the webhook dispatcher claims due
+-- deliveries, POSTs them (signed with the subscription's secret) and
+-- reschedules failures with backoff until WEBHOOK_MAX_ATTEMPTS.
+
+create table if not exists public.webhook_subscriptions (
+    id uuid primary key default gen_random_uuid(),
+    team_id uuid not null references public.teams(id) on delete cascade,
+    url text not null,
+    secret text not null,
+    events text[] not null default array['job.completed', 'job.failed'],
+    batch_size integer not null default 1 check (batch_size between 1 and 100),
+    active boolean not null default true,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists webhook_subscriptions_team_id
+    on public.webhook_subscriptions (team_id)
+    where active;
+
+create table if not exists public.webhook_outbox (
+    id uuid primary key default gen_random_uuid(),
+    subscription_id uuid not null references public.webhook_subscriptions(id) on delete cascade,
+    team_id uuid not null,
+    event text not null,
+    payload jsonb not null,
+    status text not null default 'pending' check (status in ('pending', 'delivered', 'dead')),
+    attempts integer not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    last_error text,
+    created_at timestamptz not null default now(),
+    delivered_at timestamptz
+);
+
+-- Due deliveries (the dispatcher's poll) stay a small partial index
+create index if not exists webhook_outbox_due
+    on public.webhook_outbox (next_attempt_at)
+    where status = 'pending';
+
+create index if not exists webhook_outbox_subscription_created_at
+    on public.webhook_outbox (subscription_id, created_at desc);
+
+-- Claim up to p_limit due deliveries. Claimed rows are leased for
+-- p_lease_sec (next_attempt_at moves forward), so a dispatcher that dies
+-- mid-delivery only delays them, and concurrent dispatchers skip each
+-- other's rows.
+create or replace function public.webhook_claim_deliveries(p_limit integer, p_lease_sec integer)
+returns setof public.webhook_outbox
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    return query
+    update public.webhook_outbox o
+    set next_attempt_at = now() + make_interval(secs => p_lease_sec)
+    where o.id in (
+        select id from public.webhook_outbox
+        where status = 'pending' and next_attempt_at <= now()
+        order by next_attempt_at
+        limit p_limit
+        for update skip locked
+    )
+    returning o.*;
+end;
+$$;
+
+-- Secrets and deliveries are only read through the API (service role)
+revoke execute on function public.webhook_claim_deliveries(integer, integer) from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke all on public.webhook_subscriptions from anon, authenticated;
+        revoke all on public.webhook_outbox from anon, authenticated;
+        revoke execute on function public.webhook_claim_deliveries(integer, integer) from anon, authenticated;
+    end if;
+end
+$$;
@@ -0,0 +1,39 @@
+-- Batched n8n callbacks (POST /v1/callbacks/n8n/batch)
+--
+-- Moves a set of jobs to a final state in one statement. Each job carries
+-- its own qc_result/artifacts, which PostgREST can't express as a single
+-- update. Jobs already completed or failed are left alone (a duplicate or
+-- late callback), and only the ids actually updated are returned.
+
+create or replace function public.qc_jobs_finish(p_status text, p_jobs jsonb)
+returns setof uuid
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if p_status not in ('completed', 'failed') then
+        raise exception 'qc_jobs_finish: invalid status %', p_status;
+    end if;
+
+    return query
+    update public.qc_jobs j
+    set status = p_status,
+        qc_result = e.qc_result,
+        artifacts = coalesce(e.artifacts, j.artifacts)
+    from jsonb_to_recordset(p_jobs) as e(id uuid, qc_result jsonb, artifacts jsonb)
+    where j.id = e.id
+      and j.status not in ('completed', 'failed')
+    returning j.id;
+end;
+$$;
+
+revoke execute on function public.qc_jobs_finish(text, jsonb) from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke execute on function public.qc_jobs_finish(text, jsonb) from anon, authenticated;
+    end if;
+end
+$$;
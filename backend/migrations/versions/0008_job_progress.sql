@@ -0,0 +1,56 @@
+-- Persisted job progress (app.services.progress)
+--
+-- n8n progress callbacks are coalesced in memory and written in bulk with
+-- qc_jobs_set_progress(). Only active jobs are updated, so a late flush
+-- can't overwrite a finished job. Completion sets progress to 100 in the
+-- finished_at trigger from 0005.
+
+alter table public.qc_jobs
+    add column if not exists progress smallint check (progress between 0 and 100),
+    add column if not exists progress_message text,
+    add column if not exists progress_updated_at timestamptz;
+
+create or replace function public.qc_jobs_set_progress(p_jobs jsonb)
+returns setof uuid
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    return query
+    update public.qc_jobs j
+    set progress = e.progress,
+        progress_message = e.message,
+        progress_updated_at = now()
+    from jsonb_to_recordset(p_jobs) as e(id uuid, progress smallint, message text)
+    where j.id = e.id
+      and j.status in ('pending', 'processing')
+    returning j.id;
+end;
+$$;
+
+create or replace function public.qc_jobs_set_finished_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.status in ('completed', 'failed') and old.status not in ('completed', 'failed') then
+        new.finished_at := now();
+        if new.status = 'completed' then
+            new.progress := 100;
+            new.progress_updated_at := now();
+        end if;
+    end if;
+    return new;
+end;
+$$;
+
+revoke execute on function public.qc_jobs_set_progress(jsonb) from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke execute on function public.qc_jobs_set_progress(jsonb) from anon, authenticated;
+    end if;
+end
+$$;
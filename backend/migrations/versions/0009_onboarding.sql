@@ -0,0 +1,60 @@
+-- Onboarding in one round trip
+--
+-- onboard_user creates a user's profile, their team and the trial credit
+-- grant in one transaction, or returns the existing profile. The users row
+-- is inserted first: a concurrent call for the same user waits on its
+-- primary key, then finds the profile instead of creating a second team.
+
+create or replace function public.onboard_user(
+    p_user_id uuid,
+    p_email text,
+    p_plan_type text,
+    p_team_name text,
+    p_trial_credits integer
+)
+returns table (team_id uuid, plan_type text, credits integer, is_new_user boolean)
+language plpgsql
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+declare
+    v_team_id uuid;
+    v_credits integer;
+begin
+    insert into public.users (id, email, plan_type)
+    values (p_user_id, p_email, p_plan_type)
+    on conflict (id) do nothing;
+
+    if not found then
+        return query
+            select u.team_id, u.plan_type, coalesce(t.credits, 0), false
+              from public.users u
+              left join public.teams t on t.id = u.team_id
+             where u.id = p_user_id;
+        return;
+    end if;
+
+    insert into public.teams (name, credits)
+    values (p_team_name, 0)
+    returning id into v_team_id;
+
+    v_credits := 0;
+    if p_trial_credits > 0 then
+        v_credits := public.credit_grant(v_team_id, p_trial_credits, 'TRIAL_CREDITS');
+    end if;
+
+    update public.users set team_id = v_team_id where id = p_user_id;
+    return query select v_team_id, p_plan_type, v_credits, true;
+end;
+$$;
+
+revoke execute on function public.onboard_user(uuid, text, text, text, integer) from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke execute on function public.onboard_user(uuid, text, text, text, integer) from anon, authenticated;
+    end if;
+end
+$$;
@@ -0,0 +1,27 @@
+-- Read replica lag (app.core.db_router)
+--
+-- Seconds the replica is behind its primary: 0 on the primary, and on a
+-- replica that has replayed everything it received (an idle primary
+-- doesn't make it look behind).
+
+create or replace function public.replica_lag_seconds()
+returns double precision
+language sql
+stable
+as $$
+    select case
+        when not pg_is_in_recovery() then 0
+        when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0
+        else coalesce(extract(epoch from now() - pg_last_xact_replay_timestamp()), 0)
+    end::double precision
+$$;
+
+revoke execute on function public.replica_lag_seconds() from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke execute on function public.replica_lag_seconds() from anon, authenticated;
+    end if;
+end
+$$;
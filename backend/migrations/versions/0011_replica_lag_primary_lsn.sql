@@ -0,0 +1,40 @@
+-- Read replica lag against the primary's WAL position (app.core.db_router)
+--
+-- 0010's replica_lag_seconds() reported 0 whenever a replica had replayed
+-- everything it received, which is also true of a replica that stopped
+-- receiving. The router now reads primary_wal_lsn() on the primary first
+-- and passes it in: a replica that has replayed up to that position is
+-- current (0), any other one is as far behind as its last replayed
+-- transaction is old, and null (unusable) if it never replayed one.
+
+create or replace function public.primary_wal_lsn()
+returns text
+language sql
+volatile
+as $$
+    select pg_current_wal_lsn()::text
+$$;
+
+create or replace function public.replica_lag_seconds(p_primary_lsn text)
+returns double precision
+language sql
+stable
+as $$
+    select case
+        when not pg_is_in_recovery() then 0
+        when pg_last_wal_replay_lsn() >= p_primary_lsn::pg_lsn then 0
+        else extract(epoch from now() - pg_last_xact_replay_timestamp())
+    end::double precision
+$$;
+
+revoke execute on function public.primary_wal_lsn() from public;
+revoke execute on function public.replica_lag_seconds(text) from public;
+
+do $$
+begin
+    if exists (select 1 from pg_roles where rolname = 'anon') then
+        revoke execute on function public.primary_wal_lsn() from anon, authenticated;
+        revoke execute on function public.replica_lag_seconds(text) from anon, authenticated;
+    end if;
+end
+$$;
@@ -0,0 +1,107 @@
+"""
+Credit ledger functions (migrations/versions/0003_credit_ledger.sql) under
+concurrency, against a real Postgres.
+
+Applies the migrations to DATABASE_URL, so point it at a scratch database.
+Skipped when DATABASE_URL is not set.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://localhost/qc_lobby_check python -m pytest tests/test_credit_ledger.py
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+
+GRANTED = 500
+JOB_COST = 10
+JOBS = 80  # Asks for more than the grant: some reserves must be refused
+THREADS = 16
+
+
+@pytest.fixture(scope="module")
+def migrated():
+    pytest.importorskip("psycopg")
+    from migrations import connect, upgrade
+
+    with connect(DATABASE_URL) as conn:
+        upgrade(conn)
+    return connect
+
+
+@pytest.fixture
+def team_id(migrated):
+    with migrated(DATABASE_URL) as conn:
+        team_id = conn.execute(
+            "insert into public.teams (name) values ('Ledger Test') returning id"
+        ).fetchone()[0]
+        conn.execute("select public.credit_grant(%s, %s, 'test')", (team_id, GRANTED))
+    yield team_id
+    with migrated(DATABASE_URL) as conn:
+        conn.execute("delete from public.teams where id = %s", (team_id,))
+
+
+def _run_concurrently(connect, calls):
+    """Run (sql, params) calls on THREADS connections at once; returns each first column."""
+    local = threading.local()
+    connections = []
+
+    def run(call):
+        if not hasattr(local, "conn"):
+            local.conn = connect(DATABASE_URL)
+            connections.append(local.conn)
+        sql, params = call
+        return local.conn.execute(sql, params).fetchone()[0]
+
+    try:
+        with ThreadPoolExecutor(THREADS) as pool:
+            return list(pool.map(run, calls))
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def test_concurrent_reserves_and_settlements_reconcile(migrated, team_id):
+    job_ids = [uuid.uuid4() for _ in range(JOBS)]
+
+    # Every reserve is sent twice, like a retried request
+    reserve = "select ok from public.credit_reserve(%s, %s, %s)"
+    oks = _run_concurrently(migrated, [(reserve, (team_id, job_id, JOB_COST)) for job_id in job_ids * 2])
+    reserved = [job_id for job_id, ok in zip(job_ids, oks[:JOBS]) if ok]
+    assert oks[:JOBS] == oks[JOBS:]
+    assert len(reserved) == GRANTED // JOB_COST
+
+    # Each reserved job gets a capture and a release at once: one of them wins
+    calls = []
+    for job_id in reserved:
+        calls.append(("select public.credit_capture(%s)", (job_id,)))
+        calls.append(("select public.credit_release(%s, 'test')", (job_id,)))
+    settled = _run_concurrently(migrated, calls)
+    captured = sum(1 for i in range(0, len(settled), 2) if settled[i])
+    assert all(capture != release for capture, release in zip(settled[::2], settled[1::2]))
+
+    with migrated(DATABASE_URL) as conn:
+        credits, credits_reserved = conn.execute(
+            "select credits, credits_reserved from public.teams where id = %s", (team_id,)
+        ).fetchone()
+        ledger = conn.execute(
+            """
+            select coalesce(sum(case kind when 'grant' then amount when 'capture' then -amount else 0 end), 0)
+            from public.credit_ledger where team_id = %s
+            """,
+            (team_id,),
+        ).fetchone()[0]
+        drift = conn.execute(
+            "select count(*) from public.credit_balance_drift where team_id = %s", (team_id,)
+        ).fetchone()[0]
+
+    assert credits_reserved == 0
+    assert credits + credits_reserved == GRANTED - captured * JOB_COST == ledger
+    assert drift == 0
@@ -0,0 +1,88 @@
+"""
+Replica lag checks of app.core.db_router.
+
+The router tests run against the in-memory stand-ins of benchmarks.fakes,
+which implement primary_wal_lsn() and replica_lag_seconds() the way
+migrations/versions/0011_replica_lag_primary_lsn.sql does. The SQL test
+applies the migrations to DATABASE_URL (a scratch database) and is skipped
+without it.
+
+Usage (from backend/):
+    python -m pytest tests/test_db_router.py
+"""
+
+import os
+
+import pytest
+
+from benchmarks.harness import configure_env
+
+configure_env()
+
+from app.core.db_router import db_router  # noqa: E402
+from app.core.supabase import set_supabase_client  # noqa: E402
+from benchmarks.fakes import FakeReplica, FakeSupabase  # noqa: E402
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+
+@pytest.fixture
+def primary():
+    db = FakeSupabase()
+    set_supabase_client(db)
+    yield db
+    db_router.set_replica_clients(None)
+    set_supabase_client(None)
+
+
+def _write(db: FakeSupabase) -> None:
+    db.table("teams").insert({"name": "Test Team", "credits": 0}).execute()
+
+
+def _lag(replica: FakeReplica):
+    db_router.set_replica_clients([replica])
+    db_router.check_lag()
+    return db_router.snapshot()[0]["lag_sec"]
+
+
+def test_caught_up_replica_has_no_lag(primary):
+    _write(primary)
+    assert _lag(FakeReplica(primary)) == 0.0
+
+
+def test_idle_disconnected_replica_has_no_lag(primary):
+    replica = FakeReplica(primary)
+    replica.pause()
+    assert _lag(replica) == 0.0
+
+
+def test_disconnected_replica_lags_once_the_primary_writes(primary):
+    _write(primary)
+    replica = FakeReplica(primary)
+    replica.replay_timestamp -= 60  # Last replayed a minute ago
+    replica.pause()
+    _write(primary)
+    assert _lag(replica) >= 60
+
+
+def test_replica_that_never_replayed_is_unusable(primary):
+    replica = FakeReplica(primary)
+    _write(primary)
+    assert _lag(replica) is None
+
+
+def test_unknown_primary_position_makes_replicas_unusable(primary):
+    replica = FakeReplica(primary)
+    primary.rpcs.pop("primary_wal_lsn")
+    assert _lag(replica) is None
+
+
+@pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+def test_primary_reports_no_lag():
+    pytest.importorskip("psycopg")
+    from migrations import connect, upgrade
+
+    with connect(DATABASE_URL) as conn:
+        upgrade(conn)
+        lag = conn.execute("select public.replica_lag_seconds(public.primary_wal_lsn())").fetchone()[0]
+    assert lag == 0
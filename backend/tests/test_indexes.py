@@ -0,0 +1,34 @@
+"""
+Hot query plans (migrations/check_indexes.py) against a real Postgres.
+
+Applies the migrations to DATABASE_URL, so point it at a scratch database.
+Skipped when DATABASE_URL is not set.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://localhost/qc_lobby_check python -m pytest tests/test_indexes.py
+"""
+
+import os
+
+import pytest
+
+from migrations.check_indexes import HOT_QUERIES, plan_seq_scans
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set")
+
+
+@pytest.fixture(scope="module")
+def seq_scans():
+    pytest.importorskip("psycopg")
+    from migrations import connect, upgrade
+
+    with connect(DATABASE_URL) as conn:
+        upgrade(conn)
+        return plan_seq_scans(conn)
+
+
+@pytest.mark.parametrize("query", sorted(HOT_QUERIES))
+def test_hot_query_uses_an_index(seq_scans, query):
+    assert seq_scans[query] == [], f"{query} sequentially scans {', '.join(seq_scans[query])}"
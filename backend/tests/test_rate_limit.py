@@ -0,0 +1,53 @@
+"""
+Rate limit keys of app.core.rate_limit.
+
+Drives RateLimitMiddleware directly with a trivial ASGI app, so no
+settings or database are needed.
+
+Usage (from backend/):
+    python -m pytest tests/test_rate_limit.py
+"""
+
+import asyncio
+import uuid
+
+from app.core.rate_limit import MemoryStore, RateLimiter, RateLimitMiddleware, Rule
+
+N8N_API_KEY = "test-n8n-key"
+BURST = 3
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+def statuses(api_keys):
+    limiter = RateLimiter([], Rule(name="default", rate=0.001, burst=BURST), MemoryStore(),
+                          n8n_api_key=N8N_API_KEY)
+    app = RateLimitMiddleware(ok_app, limiter)
+
+    async def run():
+        result = []
+        for api_key in api_keys:
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "GET", "path": "/v1/jobs",
+                     "headers": [(b"x-api-key", api_key.encode())], "client": ("203.0.113.7", 40000)}
+            await app(scope, None, send)
+            result.append(sent[0]["status"])
+        return result
+
+    return asyncio.run(run())
+
+
+def test_random_api_keys_share_the_client_ip_bucket():
+    assert statuses([str(uuid.uuid4()) for _ in range(BURST + 1)]) == [200] * BURST + [429]
+
+
+def test_n8n_api_key_has_its_own_bucket():
+    keys = [str(uuid.uuid4()) for _ in range(BURST)] + [N8N_API_KEY]
+    assert statuses(keys) == [200] * (BURST + 1)
@@ -0,0 +1,26 @@
+"""
+Import-time work of app.main.
+
+Importing the app must not read settings or build clients, so it works in
+a process without any of the required environment variables (the app is
+built by create_app, see the Procfile).
+
+Usage (from backend/):
+    python -m pytest tests/test_startup.py
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def test_import_needs_no_environment():
+    env = {name: os.environ[name] for name in ("PATH", "HOME", "SYSTEMROOT") if name in os.environ}
+    result = subprocess.run(
+        [sys.executable, "-c", "import app.main, app.workers.runner"],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr